@@ -1,7 +1,15 @@
 import os
-from groq import Groq
+import asyncio
+import hashlib
 import logging
+from typing import Dict, List, Optional, Tuple
 from dotenv import load_dotenv
+from feedback.audio_ingest import get_artifact, ingest_audio, ingest_settings
+from feedback.segmentation import seam_overlaps, stitch_transcripts
+from feedback.fillers import HESITATION_MARKERS
+from feedback.llm_client import get_client
+from feedback.llm_scheduler import llm_scheduler
+from transcriptCache import transcript_cache, transcript_cache_key
 
 # Load environment variables
 load_dotenv()
@@ -10,8 +18,20 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize the Groq client with API key from environment variable
-client = Groq(api_key=os.getenv("Grok_API_KEY"))
+TRANSCRIPTION_MODEL = "whisper-large-v3"
+
+# Segment requests in flight at once, across all recordings on this worker
+TRANSCRIBE_CONCURRENCY = int(os.getenv("TRANSCRIBE_CONCURRENCY", "4"))
+# Extra attempts for a segment whose request fails
+TRANSCRIBE_RETRIES = int(os.getenv("TRANSCRIBE_RETRIES", "2"))
+
+# Seconds allowed for one upload or segment to be transcribed
+TRANSCRIBE_TIMEOUT = float(os.getenv("TRANSCRIBE_TIMEOUT", "120"))
+
+# "word", "segment" or "none": timestamp detail requested alongside the transcript
+TRANSCRIBE_TIMESTAMPS = os.getenv("TRANSCRIBE_TIMESTAMPS", "word").lower()
+
+_transcription_slots = asyncio.Semaphore(TRANSCRIBE_CONCURRENCY)
 
 # Language mapping for Whisper model
 LANGUAGE_CODES = {
@@ -29,38 +49,167 @@ LANGUAGE_CODES = {
     "Odia": "or"
 }
 
-PROMPTS = {
-    "English": "Dont correct grammatical mistakes and make grammatical mistakes as much as possible and Strictly use hesitation markers like 'hmm', 'um', 'uh', 'aaa', 'aa', 'mmm', 'mm', 'ah', 'er', 'erm', 'uhm', 'uhmm', 'uhhuh', 'uhuh'  as much as possible",
+# Transcription prompts asking Whisper to keep hesitations; {markers} lists the language's HESITATION_MARKERS
+PROMPT_TEMPLATES = {
+    "English": "Dont correct grammatical mistakes and make grammatical mistakes as much as possible and Strictly use hesitation markers like {markers}  as much as possible",
 
-    "Hindi": "वाक्यों को सही न करें और हिचकिचाहट के संकेत जैसे 'हम्म', 'उम्', 'उह', 'आआ', 'आ', 'मम्म', 'मम', 'आह', 'एर', 'एर्म', 'उहम', 'उहमम', 'उहुँ', 'उहुह' शामिल करें।",
+    "Hindi": "वाक्यों को सही न करें और हिचकिचाहट के संकेत जैसे {markers} शामिल करें।",
 
-    "Bengali": "বাক্য ঠিক করবেন না এবং 'হুম', 'উম', 'উহ', 'আআ', 'আ', 'ম্ম', 'ম', 'আহ', 'এর', 'এর্ম', 'উহম', 'উহমম', 'উহুহ', 'উহু' এর মতো দ্বিধার সূচক অন্তর্ভুক্ত করুন।",
+    "Bengali": "বাক্য ঠিক করবেন না এবং {markers} এর মতো দ্বিধার সূচক অন্তর্ভুক্ত করুন।",
 
-    "Gujarati": "વાક્યોને ઠીક કરશો નહીં અને 'હમ્મ', 'ઉમ', 'ઉહ', 'આઆ', 'આ', 'મ્મ', 'મ', 'આહ', 'એર', 'એર્મ', 'ઉહમ', 'ઉહમમ', 'ઉહુહ', 'ઉહુ' જેવા સંકોચના ચિહ્નો ઉમેરો।",
+    "Gujarati": "વાક્યોને ઠીક કરશો નહીં અને {markers} જેવા સંકોચના ચિહ્નો ઉમેરો।",
 
-    "Kannada": "ವಾಕ್ಯಗಳನ್ನು ಸರಿಪಡಿಸಬೇಡಿ ಮತ್ತು 'ಹುಮ್', 'ಉಮ್', 'ಉಹ್', 'ಆಆ', 'ಆ', 'ಮ್ಮೆ', 'ಮ್', 'ಆಹ್', 'ಎರ್', 'ಎರ್ಮ್', 'ಉಹಮ್', 'ಉಹ್ಮ್ಮ್', 'ಉಹುಹ್', 'ಉಹು' ಎಂಬ ತಡಕಿದ ಸೂಚನೆಗಳನ್ನು ಸೇರಿಸಿ.",
+    "Kannada": "ವಾಕ್ಯಗಳನ್ನು ಸರಿಪಡಿಸಬೇಡಿ ಮತ್ತು {markers} ಎಂಬ ತಡಕಿದ ಸೂಚನೆಗಳನ್ನು ಸೇರಿಸಿ.",
 
-    "Malayalam": "വാക്യങ്ങൾ ശരിയാക്കരുത്, 'ഹം', 'ഉം', 'ഉഹ്', 'ആആ', 'ആ', 'മ്മ്', 'മ്', 'ആഹ്', 'എർ', 'എർം', 'ഉഹ്‌ം', 'ഉഹ്മ്മ്', 'ഉഹുഹ്', 'ഉഹു' പോലുള്ള മടിച്ച ചിഹ്നങ്ങൾ ഉൾപ്പെടുത്തുക.",
+    "Malayalam": "വാക്യങ്ങൾ ശരിയാക്കരുത്, {markers} പോലുള്ള മടിച്ച ചിഹ്നങ്ങൾ ഉൾപ്പെടുത്തുക.",
 
-    "Marathi": "वाक्ये सुधारू नका आणि 'हम्म', 'उम्', 'उह', 'आआ', 'आ', 'म्म', 'म', 'आह', 'एर', 'एर्म', 'उहम', 'उहम्म', 'उहुँ', 'उहु' असे संकोचाचे चिन्ह समाविष्ट करा.",
+    "Marathi": "वाक्ये सुधारू नका आणि {markers} असे संकोचाचे चिन्ह समाविष्ट करा.",
 
-    "Punjabi": "ਵਾਕਿਆਂ ਨੂੰ ਠੀਕ ਨਾ ਕਰੋ ਅਤੇ 'ਹਮਮ', 'ਉਮ', 'ਉਹ', 'ਆਆ', 'ਆ', 'ਮਮਮ', 'ਮਮ', 'ਆਹ', 'ਏਰ', 'ਏਰਮ', 'ਉਹਮ', 'ਉਹਮਮ', 'ਉਹੁਹ', 'ਉਹੁ' ਵਰਗੇ ਝਿਜਕ ਦੇ ਚਿੰਨ੍ਹ ਸ਼ਾਮਲ ਕਰੋ।",
+    "Punjabi": "ਵਾਕਿਆਂ ਨੂੰ ਠੀਕ ਨਾ ਕਰੋ ਅਤੇ {markers} ਵਰਗੇ ਝਿਜਕ ਦੇ ਚਿੰਨ੍ਹ ਸ਼ਾਮਲ ਕਰੋ।",
 
-    "Tamil": "வாக்கியங்களைச் சரிசெய்ய வேண்டாம் மற்றும் 'ஹும்', 'உம்', 'உஹ்', 'ஆஆ', 'ஆ', 'ம்', 'ம', 'ஆஹ்', 'ஏர்', 'ஏர்ம்', 'உஹம்', 'உஹ்ம்ம்', 'உஹுஹ்', 'உஹு' போன்ற தயக்கச் சின்னங்களைச் சேர்க்கவும்.",
+    "Tamil": "வாக்கியங்களைச் சரிசெய்ய வேண்டாம் மற்றும் {markers} போன்ற தயக்கச் சின்னங்களைச் சேர்க்கவும்.",
 
-    "Telugu": "వాక్యాలను సరిచేయకండి మరియు 'హమ్', 'ఉమ్', 'ఉహ్', 'ఆఆ', 'ఆ', 'మ్మ్', 'మ్', 'ఆహ్', 'ఎర్', 'ఎర్మ్', 'ఉహమ్', 'ఉహ్మ్మ్', 'ఉహుహ్', 'ఉహు' వంటి సందిగ్ధత సూచనలను చేర్చండి.",
+    "Telugu": "వాక్యాలను సరిచేయకండి మరియు {markers} వంటి సందిగ్ధత సూచనలను చేర్చండి.",
 
-    "Assamese": "বাক্যবোৰ সলনি নকৰিব আৰু 'হুম', 'উম', 'উহ', 'আআ', 'আ', 'ম্ম', 'ম', 'আহ', 'এৰ', 'এৰ্ম', 'উহম', 'উহম্ম', 'উহুহ', 'উহু' যেনে সন্দেহ সূচকবোৰ সন্নিৱিষ্ট কৰক।",
+    "Assamese": "বাক্যবোৰ সলনি নকৰিব আৰু {markers} যেনে সন্দেহ সূচকবোৰ সন্নিৱিষ্ট কৰক।",
 
 }
 
-async def process_audio_file(file_path: str, language: str = "English") -> dict:
+PROMPTS = {
+    language: template.format(markers=", ".join(f"'{marker}'" for marker in HESITATION_MARKERS[language]))
+    for language, template in PROMPT_TEMPLATES.items()
+}
+
+def _field(item, name):
+    # verbose_json entries arrive as dicts or as model objects depending on the SDK version
+    return item.get(name) if isinstance(item, dict) else getattr(item, name, None)
+
+async def _transcribe_bytes(filename: str, audio_bytes: bytes, language: str, language_code: str) -> Dict:
+    """
+    Transcribe one upload or segment.
+
+    Returns:
+        dict: text, plus words as [word, start, end] and segments as
+        [start, end, text] relative to the submitted audio when timestamps
+        are enabled
+    """
+    options = {}
+    if TRANSCRIBE_TIMESTAMPS != "none":
+        options["timestamp_granularities"] = ["word", "segment"] if TRANSCRIBE_TIMESTAMPS == "word" else ["segment"]
+
+    async def request():
+        return await get_client().audio.transcriptions.create(
+            file=(filename, audio_bytes),
+            model=TRANSCRIPTION_MODEL,
+            prompt=PROMPTS.get(language) ,
+            response_format="verbose_json" if options else "json",
+            language=language_code,
+            temperature=0,
+            timeout=TRANSCRIBE_TIMEOUT,
+            **options
+        )
+
+    # The scheduler applies the model's rate budget and waits out 429s; other
+    # failures are retried per segment by _transcribe_with_retry
+    transcription = await llm_scheduler.call(TRANSCRIPTION_MODEL, request, max_retries=0)
+
+    words = [
+        [_field(word, "word").strip(), _field(word, "start"), _field(word, "end")]
+        for word in (getattr(transcription, "words", None) or [])
+    ]
+    segments = [
+        [_field(segment, "start"), _field(segment, "end"), _field(segment, "text").strip()]
+        for segment in (getattr(transcription, "segments", None) or [])
+    ]
+    return {"text": transcription.text, "words": words, "segments": segments}
+
+async def _transcribe_with_retry(filename: str, audio_bytes: bytes, language: str, language_code: str) -> Dict:
+    """Transcribe one upload or segment, retrying it on its own with backoff."""
+    for attempt in range(TRANSCRIBE_RETRIES + 1):
+        try:
+            async with _transcription_slots:
+                return await _transcribe_bytes(filename, audio_bytes, language, language_code)
+        except Exception as e:
+            if attempt == TRANSCRIBE_RETRIES:
+                raise
+            logger.warning(f"Transcription of {filename} failed (attempt {attempt + 1}): {str(e)}")
+            await asyncio.sleep(0.5 * 2 ** attempt)
+
+def _merge_timing(results: List[Dict], segments: List, time_map, repeated: List[int]) -> Optional[Dict]:
+    """
+    Shift per-segment timestamps onto the original recording's timeline.
+
+    Times are offset by each segment's start in the upload, then mapped
+    through the VAD time map. The first ``repeated[i]`` words of segment i,
+    the ones stitch_transcripts drops from its text, are dropped here too so
+    the timings stay word for word with the transcript. Times are rounded to
+    milliseconds to keep the stored form small.
+    """
+    if TRANSCRIBE_TIMESTAMPS == "none":
+        return None
+
+    to_original = time_map.to_original if time_map is not None else (lambda seconds: seconds)
+    words, spans = [], []
+    for result, (start, _, _), skip in zip(results, segments, repeated):
+        for word, word_start, word_end in result["words"][skip:]:
+            words.append([word, round(to_original(start + word_start), 3), round(to_original(start + word_end), 3)])
+        for span_start, span_end, span_text in result["segments"]:
+            spans.append([round(to_original(start + span_start), 3), round(to_original(start + span_end), 3), span_text])
+
+    return {"words": words, "segments": spans}
+
+async def transcribe_artifact(artifact, language: str, language_code: str) -> Tuple[str, Optional[Dict]]:
+    """
+    Transcribe an ingested recording.
+
+    Long recordings were split at pauses during ingest; their segments are
+    transcribed concurrently and stitched back together in order.
+
+    Returns:
+        tuple: The transcript and, when timestamps are enabled, its word and
+        segment timings on the original recording's timeline
+    """
+    if not artifact.upload_segments:
+        result = await _transcribe_with_retry(artifact.upload_filename, artifact.upload_bytes, language, language_code)
+        return result["text"], _merge_timing(
+            [result], [(0.0, artifact.upload_duration, False)], artifact.time_map, [0]
+        )
+
+    base_name, extension = os.path.splitext(artifact.upload_filename)
+    results = await asyncio.gather(*(
+        _transcribe_with_retry(f"{base_name}_{index}{extension}", segment_bytes, language, language_code)
+        for index, (_, _, _, segment_bytes) in enumerate(artifact.upload_segments)
+    ))
+    logger.info(f"Transcribed {len(results)} segments of {artifact.upload_filename}")
+
+    segments = [(start, end, overlaps) for start, end, overlaps, _ in artifact.upload_segments]
+    texts = [result["text"] for result in results]
+    overlaps_previous = [overlaps for _, _, overlaps in segments]
+    text = stitch_transcripts(texts, overlaps_previous)
+    return text, _merge_timing(results, segments, artifact.time_map, seam_overlaps(texts, overlaps_previous))
+
+def _file_hash(file_path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+async def process_audio_file(file_path: str, language: str = "English", recording_id: str = None,
+                             content_hash: Optional[str] = None) -> dict:
     """
     Process an audio file and return its transcription and fluency analysis.
+
+    The transcript cache is checked first, keyed by the hash of the raw
+    upload, so a repeated upload skips decoding as well as transcription.
+    On a miss the decoded artifact from ingest_audio is reused when present;
+    otherwise the file is ingested here.
     
     Args:
         file_path (str): Path to the audio file
         language (str): Language name (default: "English")
+        recording_id (str): Key of the cached artifact, defaults to the file path
+        content_hash (str): SHA-256 of the upload, computed from the file if not given
     
     Returns:
         dict: Dictionary containing transcription result, fluency analysis, and status
@@ -75,23 +224,41 @@ async def process_audio_file(file_path: str, language: str = "English") -> dict:
         language_code = LANGUAGE_CODES.get(language, "en")
         logger.info(f"Processing audio in {language} (code: {language_code})")
 
-        # Open and process the audio file
-        with open(file_path, "rb") as file:
-            transcription = client.audio.transcriptions.create(
-                file=(os.path.basename(file_path), file.read()),
-                model="whisper-large-v3",
-                prompt=PROMPTS.get(language) ,
-                response_format="json",
-                language=language_code,
-                temperature=0
-            )
+        # Retries and duplicate uploads of the same audio skip ingest and the backend entirely
+        content_hash = content_hash or await asyncio.to_thread(_file_hash, file_path)
+        cache_key = transcript_cache_key(
+            content_hash, language_code, PROMPTS.get(language), TRANSCRIPTION_MODEL, TRANSCRIBE_TIMESTAMPS,
+            ingest_settings()
+        )
+        cached = await asyncio.to_thread(transcript_cache.get, cache_key)
 
+        if cached is not None:
+            logger.info(f"Transcript cache hit for {content_hash[:12]}")
+        else:
+            artifact = get_artifact(recording_id or file_path) or await ingest_audio(file_path, recording_id)
+            # Send the decoded PCM rather than re-reading the original container
+            text, timing = await transcribe_artifact(artifact, language, language_code)
+            entry = {
+                "text": text,
+                "timing": timing,
+                "pauses": artifact.pause_analysis,
+                "time_map": artifact.time_map.to_dict() if artifact.time_map else None,
+                "ingest": artifact.ingest_report()
+            }
+            await asyncio.to_thread(transcript_cache.put, cache_key, entry)
+
+        result = cached or entry
         return {
             "status": "success",
-            "text": transcription.text,
+            "text": result["text"],
+            "cached": cached is not None,
             "filename": os.path.basename(file_path),
             "language": language,
-            "language_code": language_code
+            "language_code": language_code,
+            "ingest": result.get("ingest"),
+            "timing": result.get("timing"),
+            "pauses": result.get("pauses"),
+            "time_map": result.get("time_map")
         }
 
     except Exception as e:
@@ -101,4 +268,4 @@ async def process_audio_file(file_path: str, language: str = "English") -> dict:
             "message": f"Error processing audio: {str(e)}",
             "filename": os.path.basename(file_path),
             "language": language
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,146 @@
+"""
+Startup benchmark for the API.
+
+Measures, each in a fresh interpreter so nothing is already imported:
+  - import time: how long ``import main`` takes
+  - first request: from launching uvicorn until ``GET /`` answers
+
+    python bench_startup.py --runs 5
+    python bench_startup.py --runs 5 --save startup_baseline.json
+    python bench_startup.py --runs 5 --baseline startup_baseline.json --tolerance 0.25
+
+With --baseline the script exits with status 1 when a median is more than
+``tolerance`` slower than the saved one, so it can gate CI.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+from urllib.error import URLError
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Modules that should not be loaded by importing the app
+HEAVY_MODULES = ["librosa", "scipy", "numpy", "soundfile", "groq"]
+
+IMPORT_PROBE = f"""
+import sys, time, json
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    # The client is created lazily, so any value lets the app import without credentials
+    env.setdefault("Grok_API_KEY", "benchmark")
+    return env
+
+
+def measure_import() -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE],
+        cwd=HERE, env=_env(), capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_request(timeout: float = 60.0) -> float:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=HERE, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (URLError, ConnectionError, socket.timeout):
+                time.sleep(0.01)
+        raise TimeoutError(f"No response from {url} after {timeout}s")
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def run(runs: int) -> dict:
+    imports = [measure_import() for _ in range(runs)]
+    first_requests = [measure_first_request() for _ in range(runs)]
+    import_seconds = [result["seconds"] for result in imports]
+    return {
+        "runs": runs,
+        "python": sys.version.split()[0],
+        "import_seconds": {
+            "median": round(statistics.median(import_seconds), 4),
+            "min": round(min(import_seconds), 4),
+            "max": round(max(import_seconds), 4)
+        },
+        "first_request_seconds": {
+            "median": round(statistics.median(first_requests), 4),
+            "min": round(min(first_requests), 4),
+            "max": round(max(first_requests), 4)
+        },
+        "heavy_modules_at_import": sorted({name for result in imports for name in result["heavy"]})
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for metric in ("import_seconds", "first_request_seconds"):
+        current, previous = result[metric]["median"], baseline[metric]["median"]
+        if current > previous * (1 + tolerance):
+            regressions.append(f"{metric}: {current:.3f}s vs baseline {previous:.3f}s")
+    new_heavy = set(result["heavy_modules_at_import"]) - set(baseline.get("heavy_modules_at_import", []))
+    if new_heavy:
+        regressions.append(f"newly imported at startup: {', '.join(sorted(new_heavy))}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure API import time and time to first request")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--save", help="Write the result to this JSON file")
+    parser.add_argument("--baseline", help="Compare against a result saved earlier")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown, as a fraction")
+    args = parser.parse_args()
+
+    result = run(args.runs)
+    print(json.dumps(result, indent=2))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
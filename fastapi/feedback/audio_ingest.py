@@ -0,0 +1,224 @@
+import io
+import os
+import json
+import logging
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from .dsp_executor import dsp_executor
+
+# The DSP stack is imported inside the functions that run on the DSP pool, so
+# the web process only pays for it when it unpickles an artifact
+if TYPE_CHECKING:
+    import numpy as np
+    from .vad import TimeMap
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Whisper works on 16 kHz mono internally, so anything above that is wasted upload.
+# Only the upload is resampled: pause detection stays at the native rate its thresholds were tuned at.
+INGEST_SAMPLE_RATE = int(os.getenv("INGEST_SAMPLE_RATE", "16000"))
+INGEST_ENCODING = os.getenv("INGEST_ENCODING", "flac").lower()
+
+# Bumped when ingest changes what it produces for the same settings, so older cached results are not reused
+INGEST_VERSION = 2
+
+# Other settings that change the audio sent for transcription; cached transcripts are keyed by them too
+INGEST_SETTING_NAMES = (
+    "VAD_ENABLED", "VAD_MIN_SILENCE_SECONDS", "VAD_KEEP_SECONDS", "VAD_ENERGY_FLOOR_DB",
+    "TRANSCRIBE_SEGMENT_SECONDS", "TRANSCRIBE_OVERLAP_SECONDS"
+)
+
+# soundfile (format, subtype, extension) for each supported upload encoding
+UPLOAD_ENCODINGS = {
+    "wav": ("WAV", "PCM_16", ".wav"),
+    "flac": ("FLAC", "PCM_16", ".flac"),
+    "ogg": ("OGG", "VORBIS", ".ogg"),
+}
+
+
+def _encode_upload(samples: "np.ndarray", sample_rate: int, encoding: str) -> bytes:
+    import soundfile as sf
+
+    file_format, subtype, _ = UPLOAD_ENCODINGS[encoding]
+    buffer = io.BytesIO()
+    sf.write(buffer, samples, sample_rate, format=file_format, subtype=subtype)
+    return buffer.getvalue()
+
+
+def ingest_settings() -> str:
+    """Everything besides the upload itself that decides what ingest sends for transcription."""
+    return json.dumps(
+        [INGEST_VERSION, INGEST_SAMPLE_RATE, INGEST_ENCODING] + [os.getenv(name) for name in INGEST_SETTING_NAMES]
+    )
+
+
+class AudioArtifact:
+    """
+    A recording decoded once into mono float32 PCM.
+
+    The samples, at the upload's native rate, feed the local pause
+    analysis, and ``upload_bytes`` is the audio resampled to
+    ``upload_sample_rate`` and encoded for the transcription backend, so
+    neither consumer has to reopen or decode the original upload. When
+    silence has been compressed out of the upload, ``time_map`` maps upload
+    times back to ``samples``.
+    Long uploads are also split at pauses into ``upload_segments`` that can
+    be transcribed in parallel.
+    """
+
+    def __init__(self, recording_id: str, samples: "np.ndarray", sample_rate: int, source_path: str,
+                 encoding: str = INGEST_ENCODING, upload_samples: Optional["np.ndarray"] = None,
+                 time_map: Optional["TimeMap"] = None, pause_analysis: Optional[Dict] = None,
+                 segment_plan: Optional[List] = None, upload_sample_rate: Optional[int] = None):
+        if encoding not in UPLOAD_ENCODINGS:
+            raise ValueError(f"Unsupported ingest encoding: {encoding}")
+
+        self.recording_id = recording_id
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.source_path = source_path
+        self.source_bytes = os.path.getsize(source_path)
+        self.encoding = encoding
+        self.time_map = time_map
+        self.pause_analysis = pause_analysis
+
+        if upload_samples is None:
+            upload_samples = samples
+        self.upload_sample_rate = upload_sample_rate or sample_rate
+        self.upload_duration = len(upload_samples) / self.upload_sample_rate
+
+        extension = UPLOAD_ENCODINGS[encoding][2]
+        self.upload_bytes = _encode_upload(upload_samples, self.upload_sample_rate, encoding)
+        self.upload_filename = os.path.splitext(os.path.basename(source_path))[0] + extension
+
+        # (start, end, overlaps_previous, bytes) on the upload timeline
+        self.upload_segments = []
+        if segment_plan and len(segment_plan) > 1:
+            for start, end, overlaps_previous in segment_plan:
+                segment = upload_samples[int(start * self.upload_sample_rate):int(end * self.upload_sample_rate)]
+                self.upload_segments.append(
+                    (start, end, overlaps_previous, _encode_upload(segment, self.upload_sample_rate, encoding))
+                )
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.sample_rate
+
+    def ingest_report(self) -> Dict:
+        """Size of the original upload against what is sent for transcription."""
+        upload_size = len(self.upload_bytes)
+        return {
+            "source_bytes": self.source_bytes,
+            "upload_bytes": upload_size,
+            "bytes_saved": self.source_bytes - upload_size,
+            "compression_ratio": round(self.source_bytes / max(1, upload_size), 2),
+            "sample_rate": self.sample_rate,
+            "upload_sample_rate": self.upload_sample_rate,
+            "encoding": self.encoding,
+            "duration": round(self.duration, 2),
+            "upload_duration": round(self.upload_duration, 2),
+            "silence_removed": round(self.duration - self.upload_duration, 2),
+            "segments": max(1, len(self.upload_segments))
+        }
+
+
+# Artifacts for recordings that are still being processed, keyed by recording id
+_artifacts: Dict[str, AudioArtifact] = {}
+
+
+def decode_audio(file_path: str, recording_id: Optional[str] = None) -> AudioArtifact:
+    """
+    Decode an uploaded file into an AudioArtifact.
+
+    Only the audio track is decoded, downmixed to mono at its native rate.
+    The onset envelope is computed once here: it gives the pause analysis
+    and, with VAD enabled, the non-speech spans that are compressed out of
+    the upload. Pause detection runs at the native rate, which its onset and
+    amplitude thresholds were tuned at; only the upload is resampled down to
+    INGEST_SAMPLE_RATE, the smallest signal Whisper needs. Runs inside the
+    DSP worker processes.
+
+    Args:
+        file_path (str): Path to the uploaded audio or video file
+        recording_id (str): Cache key, defaults to the file path
+
+    Returns:
+        AudioArtifact: The decoded recording
+    """
+    import librosa
+
+    from .get_pause import onset_envelope, detect_pauses, HOP_LENGTH
+    from .vad import VAD_ENABLED, compress_silence
+    from .segmentation import plan_segments
+
+    samples, sample_rate = librosa.load(file_path, sr=None, mono=True)
+
+    audio_envelope = onset_envelope(samples, sample_rate)
+    pause_analysis = detect_pauses(audio_envelope, sample_rate, hop_length=HOP_LENGTH)
+
+    upload_samples, time_map = samples, None
+    if VAD_ENABLED:
+        upload_samples, time_map = compress_silence(samples, sample_rate, audio_envelope)
+
+    # Pause midpoints (and VAD seams) are where long uploads can be split cleanly
+    cut_points = [(pause['start'] + pause['end']) / 2 for pause in pause_analysis['pause_details']]
+    if time_map is not None:
+        cut_points = [time_map.to_compressed(point) for point in cut_points] + time_map.seams
+    segment_plan = plan_segments(len(upload_samples) / sample_rate, cut_points)
+
+    upload_sample_rate = min(sample_rate, INGEST_SAMPLE_RATE)
+    if upload_sample_rate != sample_rate:
+        upload_samples = librosa.resample(upload_samples, orig_sr=sample_rate, target_sr=upload_sample_rate)
+
+    return AudioArtifact(
+        recording_id or file_path,
+        samples,
+        sample_rate,
+        file_path,
+        upload_samples=upload_samples,
+        time_map=time_map,
+        pause_analysis=pause_analysis,
+        segment_plan=segment_plan,
+        upload_sample_rate=upload_sample_rate
+    )
+
+
+async def ingest_audio(file_path: str, recording_id: Optional[str] = None) -> AudioArtifact:
+    """
+    Decode an uploaded file once on the DSP pool and cache the artifact.
+
+    Args:
+        file_path (str): Path to the uploaded audio or video file
+        recording_id (str): Cache key, defaults to the file path
+
+    Returns:
+        AudioArtifact: The decoded recording
+    """
+    artifact = await dsp_executor.run(decode_audio, file_path, recording_id)
+    _artifacts[artifact.recording_id] = artifact
+
+    report = artifact.ingest_report()
+    logger.info(
+        f"Ingested {file_path}: {report['duration']}s at {artifact.sample_rate} Hz "
+        f"(uploaded at {artifact.upload_sample_rate} Hz), "
+        f"{report['source_bytes']} -> {report['upload_bytes']} bytes "
+        f"({report['bytes_saved']} saved, {report['compression_ratio']}x)"
+    )
+    return artifact
+
+
+def get_artifact(recording_id: str) -> Optional[AudioArtifact]:
+    return _artifacts.get(recording_id)
+
+
+def release_artifact(recording_id: str) -> None:
+    _artifacts.pop(recording_id, None)
+
+
+def prune_artifacts(is_live) -> int:
+    """Drop cached artifacts whose recording is no longer live; returns how many."""
+    stale = [recording_id for recording_id in _artifacts if not is_live(recording_id)]
+    for recording_id in stale:
+        release_artifact(recording_id)
+    return len(stale)
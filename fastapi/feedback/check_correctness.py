@@ -1,15 +1,10 @@
-from typing import Dict, Tuple
-import os
-from groq import Groq
+from typing import Dict
 from dotenv import load_dotenv
+from .structured_output import CorrectnessScores, structured_completion
 
 load_dotenv()
 
-client = Groq(
-    api_key=os.getenv("Grok_API_KEY"),
-)
-
-def analyze_response(question: str, answer: str) -> Tuple[float, str]:
+async def analyze_response(question: str, answer: str) -> Dict:
     # Count words in the answer
     # word_count = len(answer.split())
     
@@ -50,7 +45,7 @@ def analyze_response(question: str, answer: str) -> Tuple[float, str]:
 
 
 
-        response = client.chat.completions.create(
+        analysis = await structured_completion(
             messages=[
                 {
                     "role": "system",
@@ -62,20 +57,20 @@ def analyze_response(question: str, answer: str) -> Tuple[float, str]:
                 }
             ],
             model="llama-3.2-3b-preview",
+            schema=CorrectnessScores,
             temperature=0.0,
         )
         
-        # Parse the response
-        analysis = eval(response.choices[0].message.content)
-        relevance_score = float(analysis['relevance_score'])
-        quality_score = float(analysis['quality_score'])
+        # Scores arrive validated and clamped to 0-50
+        relevance_score = analysis.relevance_score
+        quality_score = analysis.quality_score
 
         detailed_feedback['relevance_score'] = relevance_score
         detailed_feedback['quality_score'] = quality_score
         
         # Add detailed feedback
-        detailed_feedback["Relevance"] = analysis['relevance_feedback']
-        detailed_feedback["Quality"] = analysis['quality_feedback']
+        detailed_feedback["Relevance"] = analysis.relevance_feedback
+        detailed_feedback["Quality"] = analysis.quality_feedback
         
     
         # If answer is completely irrelevant (relevance_score < 5), zero out the total score
@@ -95,11 +90,32 @@ def analyze_response(question: str, answer: str) -> Tuple[float, str]:
     
     return detailed_feedback
 
-def check_answer_correctness(question: str, answer: str) -> Dict:
+def correctness_from_analysis(analysis: Dict) -> Dict:
+    """
+    Shape relevance and quality scores the way check_answer_correctness does.
+
+    Used when the scores come from the combined rubric request instead of
+    analyze_response.
+
+    Raises:
+        KeyError, TypeError, ValueError: A score or feedback field is missing or not a number
+    """
+    relevance_score = float(analysis['relevance_score'])
+    quality_score = float(analysis['quality_score'])
+    return {
+        "score": relevance_score + quality_score,
+        "relevance_score": relevance_score,
+        "quality_score": quality_score,
+        "Relevance": analysis['relevance_feedback'],
+        "Quality": analysis['quality_feedback'],
+        "remark": "Scores calculated based on relevance and quality analysis.",
+    }
+
+async def check_answer_correctness(question: str, answer: str) -> Dict:
     """
     Main function to check answer correctness and provide feedback
     """
-    detailedFeedback = analyze_response(question, answer)
+    detailedFeedback = await analyze_response(question, answer)
 
     if detailedFeedback.get('error'):
         return {
@@ -0,0 +1,134 @@
+import os
+import time
+import logging
+from collections import deque
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Recent calls per breaker that error rate and p95 are computed over
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+# Calls needed in the window before the breaker may trip
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+# Trip when this share of recent calls failed or ran out of time
+BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+# Trip when the 95th percentile of recent call times exceeds this many seconds
+BREAKER_P95_SECONDS = float(os.getenv("BREAKER_P95_SECONDS", "10"))
+# Seconds a tripped breaker stays open before letting one probe call through
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Stops calling a dependency that keeps failing or slowing down.
+
+    Tracks the outcome and duration of the last ``window`` calls. Once at
+    least ``min_calls`` are recorded and either the error rate reaches
+    ``error_rate`` or the p95 duration exceeds ``p95_seconds``, the breaker
+    opens and ``allow()`` refuses calls. After ``open_seconds`` it lets a
+    single probe through (half-open): success closes it with a fresh
+    window, failure opens it again.
+    """
+
+    def __init__(self, name: str, window: int = BREAKER_WINDOW, min_calls: int = BREAKER_MIN_CALLS,
+                 error_rate: float = BREAKER_ERROR_RATE, p95_seconds: float = BREAKER_P95_SECONDS,
+                 open_seconds: float = BREAKER_OPEN_SECONDS):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.p95_seconds = p95_seconds
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.rejected = 0
+        self.trips = 0
+        self._calls = deque(maxlen=window)
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now; every allowed call must be followed by record() or abandon()."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+            logger.info(f"Circuit {self.name} half-open, probing")
+        if self.state == HALF_OPEN and not self.probing:
+            self.probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record(self, ok: bool, seconds: float) -> None:
+        """Record the outcome of an allowed call."""
+        if self.state == HALF_OPEN and self.probing:
+            self.probing = False
+            if ok:
+                self.state = CLOSED
+                self._calls.clear()
+                logger.info(f"Circuit {self.name} closed after a successful probe")
+            else:
+                self._open()
+            return
+
+        self._calls.append((ok, seconds))
+        if self.state == CLOSED and self._tripped():
+            self._open()
+
+    def abandon(self) -> None:
+        """Forget an allowed call that was cancelled before it finished."""
+        if self.state == HALF_OPEN:
+            self.probing = False
+
+    def _tripped(self) -> bool:
+        if len(self._calls) < self.min_calls:
+            return False
+        return self._failure_rate() >= self.error_rate or self._p95() > self.p95_seconds
+
+    def _failure_rate(self) -> float:
+        return sum(1 for ok, _ in self._calls if not ok) / len(self._calls) if self._calls else 0.0
+
+    def _p95(self) -> float:
+        durations = sorted(seconds for _, seconds in self._calls)
+        return durations[min(len(durations) - 1, int(0.95 * len(durations)))] if durations else 0.0
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.trips += 1
+        logger.warning(
+            f"Circuit {self.name} opened: error rate {self._failure_rate():.0%}, p95 {self._p95():.2f}s"
+        )
+
+    def stats(self) -> Dict:
+        return {
+            "state": self.state,
+            "calls": len(self._calls),
+            "error_rate": round(self._failure_rate(), 3),
+            "p95_seconds": round(self._p95(), 3),
+            "rejected": self.rejected,
+            "trips": self.trips
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """The breaker for ``name`` on this worker, created on first use."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(name)
+    return breaker
+
+
+def breaker_stats() -> Dict[str, Dict]:
+    return {name: breaker.stats() for name, breaker in _breakers.items()}
@@ -0,0 +1,131 @@
+import os
+import asyncio
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+from functools import partial
+from typing import Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Number of worker processes; 0 runs DSP work on the default thread pool instead
+DSP_WORKERS = int(os.getenv("DSP_WORKERS", "2"))
+# Tasks allowed to be queued or running before new work is rejected
+DSP_MAX_PENDING = int(os.getenv("DSP_MAX_PENDING", "16"))
+# Seconds a request waits for one task before giving up on it
+DSP_TASK_TIMEOUT = float(os.getenv("DSP_TASK_TIMEOUT", "60"))
+
+
+class DSPBusyError(RuntimeError):
+    """Raised when the DSP queue is full and a task cannot be accepted."""
+
+
+def _warm_worker():
+    """Import the heavy DSP stack once per worker so the first task does not pay for it."""
+    import librosa
+    import scipy.signal  # noqa: F401
+
+    librosa.filters.mel(sr=16000, n_fft=2048)
+
+
+def _ping():
+    return os.getpid()
+
+
+class DSPExecutor:
+    """
+    Process pool for librosa/scipy work called from async endpoints.
+
+    Decoding, STFT and onset analysis hold the GIL for their whole duration,
+    so running them in the event loop stalls every other request on the
+    worker. Endpoints await ``run`` instead; the pool bounds how much work can
+    be queued and how long a request waits for its result.
+    """
+
+    def __init__(self, max_workers: int = DSP_WORKERS, max_pending: int = DSP_MAX_PENDING,
+                 task_timeout: float = DSP_TASK_TIMEOUT):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.task_timeout = task_timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._ready = []
+        self._pending = 0
+
+    def start(self, wait_ready: bool = True) -> None:
+        """
+        Create the pool and spawn every worker up front.
+
+        Safe to call from the warm-up thread and the event loop at once; only
+        the first call creates the pool.
+
+        Args:
+            wait_ready (bool): Block until every worker has imported the DSP stack
+        """
+        if self.max_workers <= 0:
+            return
+
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn rather than fork: the parent already runs an event loop and threads
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_worker,
+                )
+                self._ready = [self._pool.submit(_ping) for _ in range(self.max_workers)]
+            ready = self._ready
+
+        if wait_ready:
+            wait(ready)
+            logger.info(f"Started {self.max_workers} DSP workers")
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _release(self, _future) -> None:
+        self._pending -= 1
+
+    async def run(self, fn, *args, timeout: Optional[float] = None, **kwargs):
+        """
+        Run ``fn(*args, **kwargs)`` off the event loop and await its result.
+
+        Args:
+            fn: A picklable, module-level function
+            timeout (float): Seconds to wait, defaults to the executor's task timeout
+
+        Returns:
+            The function's return value
+
+        Raises:
+            DSPBusyError: The queue already holds ``max_pending`` tasks
+            asyncio.TimeoutError: The task did not finish in time
+        """
+        if self._pending >= self.max_pending:
+            raise DSPBusyError(f"DSP queue is full ({self._pending} tasks pending)")
+
+        loop = asyncio.get_running_loop()
+        call = partial(fn, *args, **kwargs)
+        if self.max_workers <= 0:
+            future = loop.run_in_executor(None, call)
+        else:
+            self.start(wait_ready=False)
+            future = loop.run_in_executor(self._pool, call)
+
+        # The slot is freed when the task really finishes, not when the caller
+        # stops waiting, so timed-out work still counts against the bound.
+        self._pending += 1
+        future.add_done_callback(self._release)
+
+        return await asyncio.wait_for(asyncio.shield(future), timeout or self.task_timeout)
+
+
+dsp_executor = DSPExecutor()
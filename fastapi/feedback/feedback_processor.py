@@ -1,22 +1,38 @@
 import os
-import json
-import re
-from groq import Groq
-from typing import Dict, List, Optional
+import time
+import bisect
+import asyncio
+from typing import AsyncIterator, Dict, Optional, Tuple
 from dotenv import load_dotenv
-from .check_correctness import check_answer_correctness
-from .vocab_check import analyze_vocabulary
-from .get_pause import get_pause_count
+from .check_correctness import check_answer_correctness, correctness_from_analysis
+from .vocab_check import analyze_vocabulary, load_vocabulary_index_async
+from .audio_ingest import get_artifact
+from .dsp_executor import dsp_executor, DSP_TASK_TIMEOUT
+from .stage_graph import Stage, StageDegraded, StageGraph
+from .circuit_breaker import CircuitBreaker, get_breaker
+from .text_chunks import chunk_text, merge_chunk_errors
+from .fillers import get_filler_matcher, tokenize as tokenize_words
+from .structured_output import (
+    CorrectnessScores, GrammarReport, PronunciationReport, structured_completion,
+    validate_section
+)
 
 # Load environment variables
 load_dotenv()
 
+# "split" asks for grammar, pronunciation and correctness in three requests; "combined" in one
+FEEDBACK_LLM_MODE = os.getenv("FEEDBACK_LLM_MODE", "split").lower()
+
+# Seconds analyze_text may take; LLM stages still running then are marked degraded. 0 disables it.
+FEEDBACK_LATENCY_BUDGET = float(os.getenv("FEEDBACK_LATENCY_BUDGET", "12"))
+# Largest latency_budget a client may ask for; larger requests are capped to it
+MAX_LATENCY_BUDGET = float(os.getenv("MAX_LATENCY_BUDGET", "30"))
+
+# Stages whose results are feedback sections; analyze_text_stream sends each one when it finishes
+FEEDBACK_SECTIONS = ("fluency", "vocabulary", "pauses", "timing", "grammar", "pronunciation", "correctness")
+
 class FeedbackProcessor:
     def __init__(self):
-        self.client = Groq(
-            api_key=os.getenv("Grok_API_KEY"),
-        )
-
         self.grammar_prompt = """You are a grammar expert. Analyze the given text for grammatical errors, focusing ONLY on:
         - Incorrect verb tenses (e.g., "I goes" instead of "I go")
         - Subject-verb agreement errors
@@ -68,38 +84,77 @@ class FeedbackProcessor:
         
         Return ONLY the JSON object, no additional text."""
 
-    def analyze_fluency(self, text: str) -> Dict:
+        self.rubric_prompt = """You are an English assessment expert. Assess the user's answer to the question in three parts.
+
+        1. grammar: grammatical errors, focusing ONLY on incorrect verb tenses, subject-verb agreement,
+           incorrect pronouns, incorrect word usage or word choice, run-on sentences or fragments,
+           incorrect prepositions and spelling errors. DO NOT count capitalization, missing final
+           periods or stylistic choices.
+        2. pronunciation: words likely to be hard to pronounce for non-native speakers, such as silent
+           letters, complex phonetic combinations, stress patterns in multi-syllable words, commonly
+           mispronounced words and easily confused sound pairs (e.g. "th" vs "d").
+        3. correctness: relevance of the answer to the question (0-50 points) and quality of the
+           explanation, meaning clarity, depth and coherence (0-50 points). Do not judge strictly: give
+           25-35 points if the answer is somewhat related and 40-50 if it is good enough.
+
+        Format your response as a JSON object with exactly this structure:
+        {
+            "grammar": {
+                "error_count": number,
+                "errors": [
+                    {
+                        "word": "incorrect_phrase_or_word",
+                        "suggestion": "correct_phrase_or_word",
+                        "explanation": "brief explanation of the error"
+                    }
+                ]
+            },
+            "pronunciation": {
+                "error_count": number,
+                "errors": [
+                    {
+                        "word": "challenging_word",
+                        "phonetic": "phonetic_representation",
+                        "explanation": "brief explanation of the pronunciation challenge"
+                    }
+                ]
+            },
+            "correctness": {
+                "relevance_score": number,
+                "quality_score": number,
+                "relevance_feedback": "short explanation of relevance score",
+                "quality_feedback": "short explanation of quality score"
+            }
+        }
+
+        Return ONLY the JSON object, no additional text."""
+
+    def analyze_fluency(self, text: str, language: Optional[str] = None) -> Dict:
         """
         Analyze text for fluency by detecting filler words and hesitations.
+
+        Fillers are found in one pass by the precompiled matcher for the
+        answer's language: its hesitation markers plus the English fillers.
+        Without a known language every supported language's markers are used.
         Returns a dictionary containing fluency metrics.
         """
-        # List of common filler words and hesitation sounds
-        filler_patterns = [
-            r'\b(hmm+|um+|uh+|aaa+|aa+|mmm+|mm+|ah+|er+|erm+|uhm+|uhmm+|uhhuh|uhuh)\b',
-            r'\b(like|you know|basically|actually|literally|sort of|kind of)\b'
-        ]
-
-        # Combine patterns into one regex
-        combined_pattern = '|'.join(filler_patterns)
-        
-        # Find all matches
-        matches = re.finditer(combined_pattern, text.lower())
-        
+        tokens = tokenize_words(text)
+
         # Store all filler words with their positions
         filler_words = []
         total_count = 0
-        
-        for match in matches:
+
+        for start, end in get_filler_matcher(language).find(tokens, text):
             filler_words.append({
-                "word": match.group(),
-                "position": match.start(),
-                "context": text[max(0, match.start()-20):min(len(text), match.end()+20)]
+                "word": text[start:end].lower(),
+                "position": start,
+                "context": text[max(0, start-20):min(len(text), end+20)]
             })
             total_count += 1
 
         # Calculate fluency score (100 - deductions)
         # Deduct points based on the frequency of filler words
-        words_in_text = len(text.split())
+        words_in_text = len(tokens)
         filler_ratio = total_count / max(1, words_in_text)
         fluency_score = max(0, min(100, 100 - (filler_ratio * 200)))  # Deduct more points for higher filler word density
 
@@ -109,9 +164,14 @@ class FeedbackProcessor:
             "filler_words": filler_words,
             "words_analyzed": words_in_text,
             "filler_ratio": round(filler_ratio * 100, 1),
+            "language": language,
             "feedback": self._generate_fluency_feedback(total_count, words_in_text, fluency_score)
         }
 
+    async def _vocabulary(self, text: str) -> Dict:
+        # A request that beats the warm-up to the index never builds it on the event loop
+        return analyze_vocabulary(text, await load_vocabulary_index_async())
+
     def _generate_fluency_feedback(self, filler_count: int, total_words: int, fluency_score: float) -> str:
         """Generate feedback message based on fluency analysis."""
         if fluency_score >= 90:
@@ -128,23 +188,7 @@ class FeedbackProcessor:
         Analyze text for grammar mistakes using Groq LLM.
         """
         try:
-            response = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": self.grammar_prompt,
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Analyze this text: {text}",
-                    }
-                ],
-                model="llama-3.2-3b-preview",
-                temperature=0.1,
-            )
-            
-            analysis = response.choices[0].message.content
-            return self._parse_grammar_response(analysis)
+            return await self._grammar_report(text)
         except Exception as e:
             print(f"Error in analyze_grammar: {str(e)}")
             return {
@@ -152,28 +196,16 @@ class FeedbackProcessor:
                 "errors": []
             }
 
+    async def _grammar_report(self, text: str) -> Dict:
+        """analyze_grammar without the fallback: errors are raised."""
+        return await self._chunked_report(text, self.grammar_prompt, GrammarReport, "suggestion")
+
     async def analyze_pronunciation(self, text: str) -> Dict:
         """
         Analyze text for pronunciation challenges using Groq LLM.
         """
         try:
-            response = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": self.pronunciation_prompt,
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Analyze this text: {text}",
-                    }
-                ],
-                model="llama-3.2-3b-preview",
-                temperature=0.1,
-            )
-            
-            analysis = response.choices[0].message.content
-            return self._parse_pronunciation_response(analysis)
+            return await self._pronunciation_report(text)
         except Exception as e:
             print(f"Error in analyze_pronunciation: {str(e)}")
             return {
@@ -181,15 +213,161 @@ class FeedbackProcessor:
                 "errors": []
             }
 
-        
-    async def analyze_pauses(self, text: str, tempFileName: str) -> Dict:
+    async def _pronunciation_report(self, text: str) -> Dict:
+        """analyze_pronunciation without the fallback: errors are raised."""
+        return await self._chunked_report(text, self.pronunciation_prompt, PronunciationReport, "phonetic")
+
+    async def _chunked_report(self, text: str, prompt: str, schema, detail_field: str) -> Dict:
+        """
+        Run an error analysis over a transcript split into sentence-aligned chunks.
+
+        Chunks are analyzed concurrently, so a long answer takes about as long
+        as a short one and no single response grows long enough to be cut
+        off. Errors are merged with positions in the full text and duplicates
+        removed. A failed chunk only loses its own errors and marks the
+        report truncated; the call raises when every chunk failed.
+        """
+        chunks = chunk_text(text)
+        reports = await asyncio.gather(
+            *(self._chunk_errors(chunk, prompt, schema) for _, chunk in chunks),
+            return_exceptions=True
+        )
+        failures = [report for report in reports if isinstance(report, Exception)]
+        if len(failures) == len(reports):
+            raise failures[0]
+        if failures:
+            print(f"{len(failures)} of {len(chunks)} chunks failed: {str(failures[0])}")
+
+        return merge_chunk_errors(
+            chunks, [None if isinstance(report, Exception) else report for report in reports], detail_field
+        )
+
+    async def _chunk_errors(self, chunk: str, prompt: str, schema) -> Dict:
+        analysis = await structured_completion(
+            messages=[
+                {
+                    "role": "system",
+                    "content": prompt,
+                },
+                {
+                    "role": "user",
+                    "content": f"Analyze this text: {chunk}",
+                }
+            ],
+            model="llama-3.2-3b-preview",
+            schema=schema,
+            temperature=0.1,
+        )
+
+        return analysis.model_dump()
+
+
+    async def analyze_rubric(self, text: str, question: Optional[str]) -> Optional[Dict]:
+        """
+        Get grammar, pronunciation and correctness from a single LLM request.
+        Returns the parsed sections, or None if no JSON object could be recovered.
+        """
+        try:
+            return await self._rubric_request(text, question)
+        except Exception as e:
+            print(f"Error in analyze_rubric: {str(e)}")
+            return None
+
+    async def _rubric_request(self, text: str, question: Optional[str]) -> Dict:
+        """analyze_rubric without the fallback: errors are raised."""
+        return await structured_completion(
+            messages=[
+                {
+                    "role": "system",
+                    "content": self.rubric_prompt,
+                },
+                {
+                    "role": "user",
+                    "content": f"Question: {question or ''}\nUser Answer: {text}",
+                }
+            ],
+            model="llama-3.2-3b-preview",
+            temperature=0.1,
+        )
+
+    async def _behind_breaker(self, breaker: CircuitBreaker, call) -> Dict:
+        """Await ``call()`` if ``breaker`` allows it, recording the outcome; degrade the stage if not."""
+        if not breaker.allow():
+            raise StageDegraded("circuit_open")
+        started = time.perf_counter()
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            breaker.abandon()
+            raise
+        except Exception:
+            breaker.record(False, time.perf_counter() - started)
+            raise
+        breaker.record(True, time.perf_counter() - started)
+        return result
+
+    async def _rubric_errors(self, rubric: Optional[Dict], section: str, text: str) -> Dict:
+        """
+        Take grammar or pronunciation from the rubric.
+
+        A rubric that never arrived (breaker open, over budget, timed out,
+        failed or unparseable) degrades this stage too. Only a section missing
+        from a rubric that did parse is asked for separately, behind the
+        rubric's breaker.
+        """
+        if rubric is None:
+            raise StageDegraded("rubric_unavailable")
+        schema = GrammarReport if section == "grammar" else PronunciationReport
+        report = validate_section(rubric.get(section), schema)
+        if report is not None:
+            # A cut-off rubric may have lost the end of this section's errors
+            report.truncated = report.truncated or bool(rubric.get("truncated"))
+            return report.model_dump()
+        request = self._grammar_report if section == "grammar" else self._pronunciation_report
+        return await self._behind_breaker(get_breaker("feedback.rubric"), lambda: request(text))
+
+    async def _rubric_correctness(self, rubric: Optional[Dict], question: Optional[str], text: str) -> Dict:
+        """Take correctness from the rubric; missing sections are handled as in _rubric_errors."""
+        if rubric is None:
+            raise StageDegraded("rubric_unavailable")
+        scores = validate_section(rubric.get("correctness"), CorrectnessScores)
+        if scores is not None:
+            return correctness_from_analysis(scores.model_dump())
+        return await self._behind_breaker(
+            get_breaker("feedback.rubric"), lambda: self._checked_correctness(question, text)
+        )
+
+    async def _checked_correctness(self, question: Optional[str], text: str) -> Dict:
+        """check_answer_correctness, raising instead of returning its error result."""
+        correctness = await check_answer_correctness(question, text)
+        if correctness.get("error"):
+            raise RuntimeError(correctness["error"])
+        return correctness
+
+    async def analyze_pauses(self, text: str, tempFileName: str, recording_id: Optional[str] = None,
+                             pause_analysis: Optional[Dict] = None) -> Dict:
         """
         Analyze text for pauses using the pause count from the audio file.
+        Pauses found at ingest time are reused; otherwise the DSP work runs on
+        the process pool so the event loop stays free.
         Returns a dictionary containing pause analysis.
         """
+        # Only loaded when pauses were not found at ingest; librosa is slow to import
+        from .get_pause import get_pause_count, get_pause_count_from_signal
+
         try:
+            if pause_analysis is not None:
+                return pause_analysis
+
+            # Reuse the recording decoded at upload time when this worker has it
+            artifact = get_artifact(recording_id or tempFileName)
+            if artifact is not None:
+                if artifact.pause_analysis is not None:
+                    return artifact.pause_analysis
+                return await dsp_executor.run(get_pause_count_from_signal, artifact.samples, artifact.sample_rate)
+
             # Get the pause analysis from the audio file
-            pause_analysis = get_pause_count(tempFileName)
+            pause_analysis = await dsp_executor.run(get_pause_count, tempFileName)
             return pause_analysis
         except Exception as e:
             print(f"Error in analyze_pauses: {str(e)}")
@@ -199,63 +377,187 @@ class FeedbackProcessor:
                 "total_pause_duration": 0
             }
 
-    def _parse_grammar_response(self, response: str) -> Dict:
+    def analyze_timing(self, timing: Optional[Dict], pause_analysis: Dict) -> Optional[Dict]:
         """
-        Parse the LLM response for grammar analysis.
+        Compute speaking rates from word timestamps and align pauses to words.
+
+        Speech rate counts words over the whole speaking time; articulation
+        rate leaves out the pauses inside it. The result's "pause_details"
+        are copies of the pauses in ``pause_analysis`` with the words spoken
+        just before and just after each; ``pause_analysis`` itself may be
+        shared with a cached artifact or session and is left untouched.
+        Returns None when the transcript has no word timings.
         """
-        try:
-            # Parse the JSON response
-            data = json.loads(response)
-            return {
-                "error_count": data.get("error_count", 0),
-                "errors": data.get("errors", [])
-            }
-        except Exception as e:
-            print(f"Error parsing grammar response: {str(e)}")
-            return {
-                "error_count": 0,
-                "errors": []
-            }
+        words = (timing or {}).get("words") or []
+        if not words:
+            return None
+
+        speaking_start, speaking_end = words[0][1], words[-1][2]
+        speaking_time = max(0.0, speaking_end - speaking_start)
 
-    def _parse_pronunciation_response(self, response: str) -> Dict:
+        # Only pause time between the first and last word slows articulation
+        pause_time = sum(
+            max(0.0, min(pause['end'], speaking_end) - max(pause['start'], speaking_start))
+            for pause in pause_analysis.get("pause_details", [])
+        )
+        articulation_time = max(0.0, speaking_time - pause_time)
+
+        word_ends = [end for _, _, end in words]
+        word_starts = [start for _, start, _ in words]
+        # Word boundaries from the transcriber and pause edges from the envelope rarely line up exactly
+        tolerance = 0.15
+        pause_details = []
+        for pause in pause_analysis.get("pause_details", []):
+            before = bisect.bisect_right(word_ends, pause['start'] + tolerance) - 1
+            after = bisect.bisect_left(word_starts, pause['end'] - tolerance)
+            pause_details.append({
+                **pause,
+                'previous_word': words[before][0] if before >= 0 else None,
+                'next_word': words[after][0] if after < len(words) else None
+            })
+
+        return {
+            "word_count": len(words),
+            "speaking_time": round(speaking_time, 2),
+            "speech_rate_wpm": round(len(words) / speaking_time * 60, 1) if speaking_time else 0.0,
+            "articulation_rate_wpm": round(len(words) / articulation_time * 60, 1) if articulation_time else 0.0,
+            "pause_details": pause_details
+        }
+
+    async def analyze_text(self, text: str, question: Optional[str] = None, tempFileName: str = '',
+                           recording_id: Optional[str] = None, pause_analysis: Optional[Dict] = None,
+                           timing: Optional[Dict] = None, latency_budget: Optional[float] = None,
+                           language: Optional[str] = None) -> Dict:
         """
-        Parse the LLM response for pronunciation analysis.
+        Analyze text for grammar, pronunciation, vocabulary, fluency and answer correctness.
+
+        The analyses run as a stage graph: the LLM calls, the local text
+        analyses and the pause analysis all start at once, and timing waits
+        only for pauses. A stage that fails or times out contributes its
+        fallback result. Per-stage timings are returned under "stages".
+        With FEEDBACK_LLM_MODE=combined, grammar, pronunciation and
+        correctness come from one rubric request instead of three.
+
+        The whole analysis returns within ``latency_budget`` seconds
+        (FEEDBACK_LATENCY_BUDGET by default). Each LLM stage has a circuit
+        breaker; a stage whose breaker is open, or that is still running when
+        the budget runs out, is listed under "degraded" and its section holds
+        the fallback result, while the local analyses are returned as usual.
         """
-        try:
-            # Parse the JSON response
-            data = json.loads(response)
-            return {
-                "error_count": data.get("error_count", 0),
-                "errors": data.get("errors", [])
-            }
-        except Exception as e:
-            print(f"Error parsing pronunciation response: {str(e)}")
-            return {
-                "error_count": 0,
-                "errors": []
-            }
+        results, stage_report = await self.analysis_graph(
+            text, question, tempFileName, recording_id, pause_analysis, timing, latency_budget, language
+        ).run()
+        return self._feedback(results, text, stage_report)
 
-    async def analyze_text(self, text: str, question: Optional[str] = None, tempFileName: str = '') -> Dict:
+    async def analyze_text_stream(self, text: str, question: Optional[str] = None, tempFileName: str = '',
+                                  recording_id: Optional[str] = None, pause_analysis: Optional[Dict] = None,
+                                  timing: Optional[Dict] = None,
+                                  latency_budget: Optional[float] = None,
+                                  language: Optional[str] = None) -> AsyncIterator[Tuple[str, Dict]]:
         """
-        Analyze text for grammar, pronunciation, vocabulary, fluency and answer correctness.
+        Analyze text like analyze_text, yielding each section as soon as it is ready.
+
+        Yields (section, result) for every entry of FEEDBACK_SECTIONS in the
+        order they finish, so the local analyses arrive without waiting for
+        the LLM calls. The last item is ("summary", feedback) with the same
+        feedback dict analyze_text returns.
         """
-        grammar_analysis = await self.analyze_grammar(text)
-        pronunciation_analysis = await self.analyze_pronunciation(text)
-        vocabulary_analysis = analyze_vocabulary(text)
-        fluency_analysis = self.analyze_fluency(text)
+        graph = self.analysis_graph(
+            text, question, tempFileName, recording_id, pause_analysis, timing, latency_budget, language
+        )
+        results = {}
+        async for name, result in graph.stream():
+            results[name] = result
+            if name in FEEDBACK_SECTIONS:
+                yield name, result
+        yield "summary", self._feedback(results, text, graph.report)
 
-        pause_analysis = await self.analyze_pauses(text, tempFileName)
-        correctness_analysis = check_answer_correctness(question, text)
-   
+    def _feedback(self, results: Dict, text: str, stage_report: Dict) -> Dict:
+        """Assemble the feedback response from the stage graph results."""
+        stage_report["llm_mode"] = FEEDBACK_LLM_MODE
 
         feedback = {
-            "grammar": grammar_analysis,
-            "pronunciation": pronunciation_analysis,
-            "vocabulary": vocabulary_analysis,
-            "fluency": fluency_analysis,
-            "pauses": pause_analysis,  # Now returning the complete pause analysis
-            "correctness": correctness_analysis,
-            "text": text
+            "grammar": results["grammar"],
+            "pronunciation": results["pronunciation"],
+            "vocabulary": results["vocabulary"],
+            "fluency": results["fluency"],
+            "pauses": results["pauses"],  # Now returning the complete pause analysis
+            "timing": results["timing"],
+            "correctness": results["correctness"],
+            "text": text,
+            "degraded": [name for name, stage in stage_report["stages"].items() if stage["status"] == "degraded"],
+            "stages": stage_report
         }
 
-        return feedback
\ No newline at end of file
+        return feedback
+
+    def analysis_graph(self, text: str, question: Optional[str] = None, tempFileName: str = '',
+                       recording_id: Optional[str] = None, pause_analysis: Optional[Dict] = None,
+                       timing: Optional[Dict] = None, latency_budget: Optional[float] = None,
+                       language: Optional[str] = None) -> StageGraph:
+        """Build the stage graph behind analyze_text for one answer."""
+        no_errors = lambda: {"error_count": 0, "errors": []}
+        no_pauses = lambda: {"total_pauses": 0, "pause_details": [], "total_pause_duration": 0}
+        no_correctness = lambda: {"error": "Answer check did not complete"}
+
+        if FEEDBACK_LLM_MODE == "combined":
+            # One request; the three sections are split out of its result. When the rubric is
+            # degraded its sections are too, rather than falling back to three more requests.
+            llm_stages = [
+                Stage(
+                    "rubric",
+                    lambda: self._rubric_request(text, question),
+                    breaker=get_breaker("feedback.rubric")
+                ),
+                Stage(
+                    "grammar",
+                    lambda rubric: self._rubric_errors(rubric, "grammar", text),
+                    deps=["rubric"],
+                    fallback=no_errors
+                ),
+                Stage(
+                    "pronunciation",
+                    lambda rubric: self._rubric_errors(rubric, "pronunciation", text),
+                    deps=["rubric"],
+                    fallback=no_errors
+                ),
+                Stage(
+                    "correctness",
+                    lambda rubric: self._rubric_correctness(rubric, question, text),
+                    deps=["rubric"],
+                    fallback=no_correctness
+                ),
+            ]
+        else:
+            llm_stages = [
+                Stage(
+                    "grammar",
+                    lambda: self._grammar_report(text),
+                    fallback=no_errors,
+                    breaker=get_breaker("feedback.grammar")
+                ),
+                Stage(
+                    "pronunciation",
+                    lambda: self._pronunciation_report(text),
+                    fallback=no_errors,
+                    breaker=get_breaker("feedback.pronunciation")
+                ),
+                Stage(
+                    "correctness",
+                    lambda: self._checked_correctness(question, text),
+                    fallback=no_correctness,
+                    breaker=get_breaker("feedback.correctness")
+                ),
+            ]
+
+        return StageGraph(llm_stages + [
+            Stage("vocabulary", lambda: self._vocabulary(text)),
+            Stage("fluency", lambda: self.analyze_fluency(text, language)),
+            Stage(
+                "pauses",
+                lambda: self.analyze_pauses(text, tempFileName, recording_id, pause_analysis),
+                timeout=DSP_TASK_TIMEOUT,
+                fallback=no_pauses
+            ),
+            Stage("timing", lambda pauses: self.analyze_timing(timing, pauses), deps=["pauses"]),
+        ], budget=float(latency_budget or FEEDBACK_LATENCY_BUDGET) or None)
\ No newline at end of file
@@ -0,0 +1,203 @@
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Hesitation markers per language. The transcription prompts in audioProcessor ask
+# Whisper to keep exactly these, so they are what fluency analysis looks for.
+HESITATION_MARKERS = {
+    "English": ("hmm", "um", "uh", "aaa", "aa", "mmm", "mm", "ah", "er", "erm", "uhm", "uhmm", "uhhuh", "uhuh"),
+    "Hindi": ("हम्म", "उम्", "उह", "आआ", "आ", "मम्म", "मम", "आह", "एर", "एर्म", "उहम", "उहमम", "उहुँ", "उहुह"),
+    "Bengali": ("হুম", "উম", "উহ", "আআ", "আ", "ম্ম", "ম", "আহ", "এর", "এর্ম", "উহম", "উহমম", "উহুহ", "উহু"),
+    "Gujarati": ("હમ્મ", "ઉમ", "ઉહ", "આઆ", "આ", "મ્મ", "મ", "આહ", "એર", "એર્મ", "ઉહમ", "ઉહમમ", "ઉહુહ", "ઉહુ"),
+    "Kannada": ("ಹುಮ್", "ಉಮ್", "ಉಹ್", "ಆಆ", "ಆ", "ಮ್ಮೆ", "ಮ್", "ಆಹ್", "ಎರ್", "ಎರ್ಮ್", "ಉಹಮ್", "ಉಹ್ಮ್ಮ್", "ಉಹುಹ್", "ಉಹು"),
+    "Malayalam": ("ഹം", "ഉം", "ഉഹ്", "ആആ", "ആ", "മ്മ്", "മ്", "ആഹ്", "എർ", "എർം", "ഉഹ്\u200cം", "ഉഹ്മ്മ്", "ഉഹുഹ്", "ഉഹു"),
+    "Marathi": ("हम्म", "उम्", "उह", "आआ", "आ", "म्म", "म", "आह", "एर", "एर्म", "उहम", "उहम्म", "उहुँ", "उहु"),
+    "Punjabi": ("ਹਮਮ", "ਉਮ", "ਉਹ", "ਆਆ", "ਆ", "ਮਮਮ", "ਮਮ", "ਆਹ", "ਏਰ", "ਏਰਮ", "ਉਹਮ", "ਉਹਮਮ", "ਉਹੁਹ", "ਉਹੁ"),
+    "Tamil": ("ஹும்", "உம்", "உஹ்", "ஆஆ", "ஆ", "ம்", "ம", "ஆஹ்", "ஏர்", "ஏர்ம்", "உஹம்", "உஹ்ம்ம்", "உஹுஹ்", "உஹு"),
+    "Telugu": ("హమ్", "ఉమ్", "ఉహ్", "ఆఆ", "ఆ", "మ్మ్", "మ్", "ఆహ్", "ఎర్", "ఎర్మ్", "ఉహమ్", "ఉహ్మ్మ్", "ఉహుహ్", "ఉహు"),
+    "Assamese": ("হুম", "উম", "উহ", "আআ", "আ", "ম্ম", "ম", "আহ", "এৰ", "এৰ্ম", "উহম", "উহম্ম", "উহুহ", "উহু"),
+}
+
+# English filler words and phrases; answers in every language are checked for
+# these too, since English fillers are common in code-mixed speech
+DISCOURSE_FILLERS = ("like", "you know", "basically", "actually", "literally", "sort of", "kind of")
+
+# Joiners Indic transcripts use inconsistently inside otherwise identical words
+ZERO_WIDTH = {"\u200c", "\u200d"}
+APOSTROPHES = {"'", "’"}
+# Punctuation transcripts use for a pause; a one-letter marker only counts set off by these
+PAUSE_MARKS = set(",.;:!?…-–—।॥")
+
+
+def _is_word_char(char: str) -> bool:
+    # Letters, digits and combining marks: Indic vowel signs and viramas are marks, not letters
+    return char in ZERO_WIDTH or unicodedata.category(char)[0] in "LMN"
+
+
+def _normalize(word: str) -> str:
+    word = unicodedata.normalize("NFC", word).casefold()
+    return "".join(char for char in word if char not in ZERO_WIDTH).replace("’", "'")
+
+
+def _collapse(word: str) -> str:
+    """Fold a drawn-out ending to one character, so "ummm" and "um" share a key."""
+    end = len(word)
+    while end > 1 and word[end - 2] == word[-1]:
+        end -= 1
+    return word[:end]
+
+
+def _is_single_letter(word: str) -> bool:
+    # One base letter plus its vowel signs or virama: "आ", "ம்"
+    return bool(word) and unicodedata.category(word[0])[0] == "L" and all(
+        unicodedata.category(char)[0] == "M" for char in word[1:]
+    )
+
+
+def tokenize(text: str) -> List[Tuple[int, int, str]]:
+    """
+    Split text into words in one pass, returning (start, end, normalized word).
+
+    Works across scripts: combining marks and zero-width joiners stay inside
+    the word they belong to, and an apostrophe between letters does too.
+    Words are NFC-normalized and casefolded with joiners removed.
+    """
+    tokens = []
+    start = None
+    length = len(text)
+    for index, char in enumerate(text):
+        if _is_word_char(char) or (
+            char in APOSTROPHES and start is not None and index + 1 < length and _is_word_char(text[index + 1])
+        ):
+            if start is None:
+                start = index
+        elif start is not None:
+            tokens.append((start, index, _normalize(text[start:index])))
+            start = None
+    if start is not None:
+        tokens.append((start, length, _normalize(text[start:])))
+    return tokens
+
+
+class FillerMatcher:
+    """
+    Matcher for a fixed set of hesitation markers and filler phrases.
+
+    Hesitation markers are single words, and a drawn-out ending matches
+    its marker as long as the word is at least as long as the marker, so
+    "ummm" matches "um" while "a" never matches "aa". A marker that is a
+    single letter ("आ", "ম") is also an ordinary word in its language, so
+    it only counts when drawn out, repeated, or set off by pause
+    punctuation on both sides. Phrases ("you know", "like") must match
+    word for word and go through an Aho-Corasick automaton over words.
+    ``find`` walks the words once and returns leftmost-longest,
+    non-overlapping matches.
+    """
+
+    def __init__(self, hesitations: Iterable[str], phrases: Iterable[str] = ()):
+        phrases = list(phrases)
+        # Shortest marker for each drawn-out-ending key
+        self._markers: Dict[str, str] = {}
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Word counts of the phrases ending at each state
+        self._output: List[Tuple[int, ...]] = [()]
+
+        for marker in hesitations:
+            word = _normalize(marker)
+            if len(word.split()) > 1:
+                phrases.append(marker)
+                continue
+            key = _collapse(word)
+            if key not in self._markers or len(word) < len(self._markers[key]):
+                self._markers[key] = word
+
+        for phrase in phrases:
+            words = [_normalize(word) for word in phrase.split()]
+            state = 0
+            for word in words:
+                if word not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                    self._goto[state][word] = len(self._goto) - 1
+                state = self._goto[state][word]
+            self._output[state] += (len(words),)
+
+        # Breadth-first, so each state's fallback is final before its children need it
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for word, child in self._goto[state].items():
+                queue.append(child)
+                if state == 0:
+                    continue
+                fallback = self._fail[state]
+                while fallback and word not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(word, 0)
+                self._output[child] += self._output[self._fail[child]]
+
+    def _is_hesitation(self, tokens: List[Tuple[int, int, str]], index: int, text: Optional[str]) -> bool:
+        word = tokens[index][2]
+        marker = self._markers.get(_collapse(word))
+        if marker is None or len(word) < len(marker):
+            return False
+        if len(word) > len(marker) or not _is_single_letter(marker):
+            return True
+        repeated = any(0 <= other < len(tokens) and tokens[other][2] == word for other in (index - 1, index + 1))
+        return repeated or (text is not None and self._set_off(tokens, index, text))
+
+    @staticmethod
+    def _set_off(tokens: List[Tuple[int, int, str]], index: int, text: str) -> bool:
+        """Whether pause punctuation (or the start or end of the text) is on both sides of a token."""
+        start, end, _ = tokens[index]
+        before = text[tokens[index - 1][1]:start] if index > 0 else None
+        after = text[end:tokens[index + 1][0]] if index + 1 < len(tokens) else None
+        return all(gap is None or any(char in PAUSE_MARKS for char in gap) for gap in (before, after))
+
+    def find(self, tokens: List[Tuple[int, int, str]], text: Optional[str] = None) -> List[Tuple[int, int]]:
+        """
+        Character spans of the fillers among ``tokens`` (from tokenize), in text order.
+
+        ``text`` is the string the tokens came from; without it a one-letter
+        marker only counts when drawn out or repeated.
+        """
+        matches = []
+        state = 0
+        for index, (_, _, word) in enumerate(tokens):
+            if self._is_hesitation(tokens, index, text):
+                matches.append((index, index))
+            while state and word not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(word, 0)
+            for words in self._output[state]:
+                matches.append((index - words + 1, index))
+
+        spans = []
+        next_free = 0
+        for first, last in sorted(matches, key=lambda match: (match[0], match[0] - match[1])):
+            if first >= next_free:
+                spans.append((tokens[first][0], tokens[last][1]))
+                next_free = last + 1
+        return spans
+
+
+def _build_matchers() -> Dict[str, FillerMatcher]:
+    english = HESITATION_MARKERS["English"]
+    matchers = {
+        language: FillerMatcher(english + (markers if language != "English" else ()), DISCOURSE_FILLERS)
+        for language, markers in HESITATION_MARKERS.items()
+    }
+    # Unknown or unset languages get every lexicon; markers of other scripts simply never match
+    matchers[None] = FillerMatcher(english + tuple(
+        marker for language, markers in HESITATION_MARKERS.items() if language != "English" for marker in markers
+    ), DISCOURSE_FILLERS)
+    return matchers
+
+
+# Built once at import
+FILLER_MATCHERS = _build_matchers()
+
+
+def get_filler_matcher(language: Optional[str] = None) -> FillerMatcher:
+    """The matcher for ``language``: its hesitation markers plus the English fillers."""
+    return FILLER_MATCHERS.get(language, FILLER_MATCHERS[None])
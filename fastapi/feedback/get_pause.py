@@ -1,66 +1,336 @@
-import os 
+import os
 import logging
-import librosa
 import numpy as np
-from scipy.signal import butter, filtfilt
+
+# librosa and soundfile are imported inside the functions that decode audio:
+# importing librosa takes about a second and the pause maths here needs only numpy
 
 logging.basicConfig(level=logging.INFO)
 
+HOP_LENGTH = 512
+N_FFT = 2048
 
+# Streaming decodes this many envelope frames worth of samples per block
+STREAM_BLOCK_FRAMES = int(os.getenv("PAUSE_STREAM_BLOCK_FRAMES", "256"))
+STREAM_PAUSES = os.getenv("PAUSE_STREAMING", "false").lower() == "true"
 
-def get_pause_count(audio_path, threshold_seconds=0.8, amplitude_threshold=0.015):
-    # Load the audio file
-    audio, sample_rate = librosa.load(audio_path, sr=None)
 
-    logging.info(f"Loaded audio file with sample rate {audio_path}")
-    
-    # Calculate the time resolution
-    hop_length = 512
-    
-    # Extract the envelope (amplitude) of the audio signal
-    audio_envelope = librosa.onset.onset_strength(y=audio, sr=sample_rate, hop_length=hop_length)
-    
-    # Convert envelope to time in seconds
-    times = librosa.times_like(audio_envelope, sr=sample_rate, hop_length=hop_length)
-    
-    # Detect periods of silence
-    pauses = []
-    in_pause = False
-    pause_start = 0
-    
-    for i in range(len(audio_envelope)):
-        # Check if current segment is below amplitude threshold
-        logging.info(f"Amplitude: {audio_envelope[i]}")
-        if audio_envelope[i] < amplitude_threshold:
-            if not in_pause:
-                # Start of a pause
-                pause_start = times[i]
-                in_pause = True
-        else:
-            if in_pause:
-                # End of a pause
-                pause_duration = times[i] - pause_start
-                if pause_duration >= threshold_seconds:
-                    pauses.append({
-                        'start': pause_start,
-                        'end': times[i],
-                        'duration': pause_duration
-                    })
-                in_pause = False
-    
-    # If the audio ends while in a pause
-    if in_pause:
-        pause_duration = times[-1] - pause_start
-        if pause_duration >= threshold_seconds:
-            pauses.append({
-                'start': pause_start,
-                'end': times[-1],
-                'duration': pause_duration
-            })
-    
+def _find_pause_runs(mask):
+    """
+    Locate runs of below-threshold frames with array ops.
+
+    Args:
+        mask (np.ndarray): Boolean array, 1-D for one recording or 2-D
+            (recordings x frames) for a batch of equal-length envelopes
+
+    Returns:
+        tuple: (rows, starts, ends) index arrays; ``ends`` is exclusive
+    """
+    mask = np.atleast_2d(mask).astype(np.int8)
+    padded = np.pad(mask, ((0, 0), (1, 1)))
+    edges = np.diff(padded, axis=1)
+
+    # np.nonzero walks row-major, so starts and ends pair up row by row
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return rows, starts, ends
+
+
+def _runs_to_pauses(starts, ends, n_frames, sample_rate, hop_length, threshold_seconds):
+    """Convert frame runs into the pause dictionaries returned by get_pause_count."""
+    if n_frames == 0:
+        return []
+
+    frame_seconds = hop_length / sample_rate
+    start_times = starts * frame_seconds
+    # A run that reaches the end of the audio is closed at the last frame time
+    end_times = np.minimum(ends, n_frames - 1) * frame_seconds
+    durations = end_times - start_times
+
+    keep = durations >= threshold_seconds
+    return [
+        {
+            'start': float(start),
+            'end': float(end),
+            'duration': float(duration)
+        }
+        for start, end, duration in zip(start_times[keep], end_times[keep], durations[keep])
+    ]
+
+
+def _summarize_pauses(pauses):
     return {
         'total_pauses': len(pauses),
         'pause_details': pauses,
         'total_pause_duration': sum(pause['duration'] for pause in pauses)
     }
 
+
+def detect_pauses(audio_envelope, sample_rate, hop_length=HOP_LENGTH, threshold_seconds=0.8, amplitude_threshold=0.015):
+    """
+    Detect pauses in a single onset-strength envelope.
+
+    Args:
+        audio_envelope (np.ndarray): Onset strength, one value per frame
+        sample_rate (int): Sample rate the envelope was computed at
+        hop_length (int): Samples between envelope frames
+        threshold_seconds (float): Minimum duration to count as a pause
+        amplitude_threshold (float): Envelope value below which a frame is silent
+
+    Returns:
+        dict: total_pauses, pause_details and total_pause_duration
+    """
+    audio_envelope = np.asarray(audio_envelope)
+    _, starts, ends = _find_pause_runs(audio_envelope < amplitude_threshold)
+    pauses = _runs_to_pauses(starts, ends, len(audio_envelope), sample_rate, hop_length, threshold_seconds)
+    return _summarize_pauses(pauses)
+
+
+def detect_pauses_batch(audio_envelopes, sample_rate, hop_length=HOP_LENGTH, threshold_seconds=0.8, amplitude_threshold=0.015):
+    """
+    Detect pauses for many recordings in one call.
+
+    Equal-length envelopes (or a 2-D array) are scored with a single set of
+    array ops; ragged lists are padded with loud frames so the padding never
+    opens a pause, and each run is clipped back to its own recording length.
+
+    Args:
+        audio_envelopes (list | np.ndarray): Envelopes, one per recording
+        sample_rate (int): Sample rate shared by all envelopes
+        hop_length (int): Samples between envelope frames
+        threshold_seconds (float): Minimum duration to count as a pause
+        amplitude_threshold (float): Envelope value below which a frame is silent
+
+    Returns:
+        list: One get_pause_count style dict per recording, in input order
+    """
+    envelopes = [np.asarray(envelope) for envelope in audio_envelopes]
+    if not envelopes:
+        return []
+
+    lengths = np.array([len(envelope) for envelope in envelopes])
+    mask = np.zeros((len(envelopes), lengths.max()), dtype=bool)
+    for row, envelope in enumerate(envelopes):
+        mask[row, :len(envelope)] = envelope < amplitude_threshold
+
+    rows, starts, ends = _find_pause_runs(mask)
+
+    results = []
+    for row, n_frames in enumerate(lengths):
+        in_row = rows == row
+        pauses = _runs_to_pauses(starts[in_row], ends[in_row], n_frames, sample_rate, hop_length, threshold_seconds)
+        results.append(_summarize_pauses(pauses))
+    return results
+
+
+def _frame_mel_power(buffer, window, mel_basis, hop_length):
+    """
+    Compute mel power for every full frame in ``buffer``.
+
+    Returns the (frames x mels) power and the unconsumed tail of the buffer,
+    which overlaps the next block by ``n_fft - hop_length`` samples.
+    """
+    n_fft = len(window)
+    if len(buffer) < n_fft:
+        return np.empty((0, mel_basis.shape[0]), dtype=np.float32), buffer
+
+    n_frames = 1 + (len(buffer) - n_fft) // hop_length
+    frames = np.lib.stride_tricks.sliding_window_view(buffer, n_fft)[::hop_length][:n_frames]
+    spectrum = np.fft.rfft(frames * window, axis=1).astype(np.complex64)
+    power = np.abs(spectrum) ** 2
+    return power @ mel_basis.T, buffer[n_frames * hop_length:]
+
+
+def _stream_mel_power(sound_file, block_frames, hop_length=HOP_LENGTH, n_fft=N_FFT):
+    """
+    Yield mel power blocks for a file decoded ``block_frames`` hops at a time.
+
+    Framing mirrors librosa's centred STFT: the signal is zero padded by
+    ``n_fft // 2`` samples on both sides, so the frame grid is identical to
+    the whole-file path.
+    """
+    import librosa
+
+    sample_rate = sound_file.samplerate
+    window = librosa.filters.get_window('hann', n_fft, fftbins=True)
+    mel_basis = librosa.filters.mel(sr=sample_rate, n_fft=n_fft)
+
+    buffer = np.zeros(n_fft // 2, dtype=np.float32)
+    sound_file.seek(0)
+    for block in sound_file.blocks(blocksize=block_frames * hop_length, dtype='float32', always_2d=True):
+        buffer = np.concatenate([buffer, block.mean(axis=1)])
+        mel_power, buffer = _frame_mel_power(buffer, window, mel_basis, hop_length)
+        if len(mel_power):
+            yield mel_power
+
+    buffer = np.concatenate([buffer, np.zeros(n_fft // 2, dtype=np.float32)])
+    mel_power, _ = _frame_mel_power(buffer, window, mel_basis, hop_length)
+    if len(mel_power):
+        yield mel_power
+
+
+def _stream_onset_envelope(sound_file, block_frames, hop_length=HOP_LENGTH, n_fft=N_FFT, top_db=80.0, amin=1e-10):
+    """
+    Yield the librosa onset-strength envelope of a file in blocks.
+
+    librosa.power_to_db clips every bin to ``top_db`` below the loudest bin of
+    the whole recording, so a first pass over the blocks only tracks that peak. The
+    second pass emits the spectral flux, delayed by the same
+    ``1 + n_fft // (2 * hop_length)`` frames librosa pads with, and drops the
+    trailing values librosa trims.
+    """
+    peak = 0.0
+    for mel_power in _stream_mel_power(sound_file, block_frames, hop_length, n_fft):
+        peak = max(peak, float(mel_power.max()))
+    floor_db = 10.0 * np.log10(max(amin, peak)) - top_db
+
+    pending = np.zeros(1 + n_fft // (2 * hop_length), dtype=np.float32)
+    previous = None
+    frames_seen = 0
+    emitted = 0
+    for mel_power in _stream_mel_power(sound_file, block_frames, hop_length, n_fft):
+        log_mel = np.maximum(10.0 * np.log10(np.maximum(amin, mel_power)), floor_db)
+        if previous is not None:
+            log_mel_with_previous = np.vstack([previous, log_mel])
+        else:
+            log_mel_with_previous = log_mel
+        flux = np.maximum(0.0, np.diff(log_mel_with_previous, axis=0)).mean(axis=1)
+        previous = log_mel[-1:]
+
+        pending = np.concatenate([pending, flux])
+        frames_seen += len(log_mel)
+        ready = frames_seen - emitted
+        if ready > 0:
+            yield pending[:ready]
+            pending = pending[ready:]
+            emitted += ready
+
+
+class _PauseTracker:
+    """Carry an open pause across envelope blocks and emit pauses as they close."""
+
+    def __init__(self, sample_rate, hop_length, threshold_seconds, amplitude_threshold):
+        self.sample_rate = sample_rate
+        self.hop_length = hop_length
+        self.threshold_seconds = threshold_seconds
+        self.amplitude_threshold = amplitude_threshold
+        self.open_start = None
+        self.frames_seen = 0
+
+    def _closed(self, start, end):
+        return _runs_to_pauses(
+            np.array([start]), np.array([end]), end + 1,
+            self.sample_rate, self.hop_length, self.threshold_seconds
+        )
+
+    def feed(self, audio_envelope):
+        offset = self.frames_seen
+        self.frames_seen += len(audio_envelope)
+        _, starts, ends = _find_pause_runs(audio_envelope < self.amplitude_threshold)
+
+        pauses = []
+        if self.open_start is not None and (len(starts) == 0 or starts[0] != 0):
+            # The block opens on a loud frame, so the carried pause ends here
+            pauses.extend(self._closed(self.open_start, offset))
+            self.open_start = None
+
+        for start, end in zip(starts + offset, ends + offset):
+            if self.open_start is not None:
+                start = self.open_start
+                self.open_start = None
+            if end == self.frames_seen:
+                self.open_start = start
+            else:
+                pauses.extend(self._closed(start, end))
+        return pauses
+
+    def finish(self):
+        if self.open_start is None:
+            return []
+        pauses = _runs_to_pauses(
+            np.array([self.open_start]), np.array([self.frames_seen]), self.frames_seen,
+            self.sample_rate, self.hop_length, self.threshold_seconds
+        )
+        self.open_start = None
+        return pauses
+
+
+def iter_pauses(audio_path, threshold_seconds=0.8, amplitude_threshold=0.015, block_frames=STREAM_BLOCK_FRAMES):
+    """
+    Stream pauses from an audio file without decoding it all at once.
+
+    The file is read ``block_frames * HOP_LENGTH`` samples at a time, so
+    peak memory depends on the block size rather than the recording length.
+    Pauses are yielded as soon as they close and match get_pause_count's
+    whole-file results.
+
+    Args:
+        audio_path (str): Path to a file readable by soundfile (wav, flac, ogg)
+        threshold_seconds (float): Minimum duration to count as a pause
+        amplitude_threshold (float): Envelope value below which a frame is silent
+        block_frames (int): Envelope frames decoded per block
+
+    Yields:
+        dict: Pause with start, end and duration in seconds
+    """
+    import soundfile as sf
+
+    with sf.SoundFile(audio_path) as sound_file:
+        tracker = _PauseTracker(sound_file.samplerate, HOP_LENGTH, threshold_seconds, amplitude_threshold)
+        for audio_envelope in _stream_onset_envelope(sound_file, block_frames):
+            yield from tracker.feed(audio_envelope)
+        yield from tracker.finish()
+
+
+def get_pause_count(audio_path, threshold_seconds=0.8, amplitude_threshold=0.015, streaming=None):
+    import librosa
+    import soundfile as sf
+
+    if streaming is None:
+        streaming = STREAM_PAUSES
+
+    if streaming:
+        try:
+            return _summarize_pauses(list(iter_pauses(audio_path, threshold_seconds, amplitude_threshold)))
+        except sf.LibsndfileError as e:
+            # Containers such as mp4 need audioread, which cannot be read in blocks
+            logging.info(f"Streaming not supported for {audio_path} ({e}), decoding whole file")
+
+    # Load the audio file
+    audio, sample_rate = librosa.load(audio_path, sr=None)
+
+    logging.info(f"Loaded audio file with sample rate {audio_path}")
+
+    return get_pause_count_from_signal(audio, sample_rate, threshold_seconds, amplitude_threshold)
+
+
+def onset_envelope(audio, sample_rate):
+    """Onset-strength envelope on the frame grid used for pause detection."""
+    import librosa
+
+    return librosa.onset.onset_strength(y=audio, sr=sample_rate, hop_length=HOP_LENGTH, n_fft=N_FFT)
+
+
+def get_pause_count_from_signal(audio, sample_rate, threshold_seconds=0.8, amplitude_threshold=0.015):
+    """
+    Detect pauses in audio that has already been decoded.
+
+    Args:
+        audio (np.ndarray): Mono samples
+        sample_rate (int): Sample rate of ``audio``
+        threshold_seconds (float): Minimum duration to count as a pause
+        amplitude_threshold (float): Envelope value below which a frame is silent
+
+    Returns:
+        dict: total_pauses, pause_details and total_pause_duration
+    """
+    # Extract the envelope (amplitude) of the audio signal
+    audio_envelope = onset_envelope(audio, sample_rate)
+
+    return detect_pauses(
+        audio_envelope,
+        sample_rate,
+        hop_length=HOP_LENGTH,
+        threshold_seconds=threshold_seconds,
+        amplitude_threshold=amplitude_threshold
+    )
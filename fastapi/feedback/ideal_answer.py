@@ -1,46 +1,57 @@
-import os
-from groq import Groq
-from typing import Dict, Optional
+from typing import AsyncIterator, Dict, Optional, Tuple
 from fastapi import HTTPException
-import unicodedata
+import re
 import json
+import hashlib
+import unicodedata
 import logging
+from .llm_cache import LLM_CACHE_ENABLED, llm_cache, normalize_content
+from .llm_client import chat_completion_stream
+from .structured_output import IdealAnswer, structured_completion
 
 logging.basicConfig(level=logging.INFO)
 
+# Headings the streamed answer is written under, and the IdealAnswer field each one fills
+STREAM_SECTIONS = {
+    "ideal answer": "ideal_answer",
+    "user strengths": "user_strengths",
+    "areas for improvement": "areas_for_improvement",
+}
+# A heading starts a line and either ends it or is followed by a colon and, possibly, its content
+SECTION_PATTERN = re.compile(
+    r'^[ \t#*]*(' + '|'.join(STREAM_SECTIONS) + r')[ \t*]*(?::[ \t*]*|$)', re.IGNORECASE | re.MULTILINE
+)
+
+
+def ideal_answer_key(question: str, user_answer: str) -> str:
+    """Key a finished ideal answer by the normalized question and answer it was written for."""
+    key_source = json.dumps(
+        ["ideal_answer", normalize_content(question), normalize_content(user_answer)], ensure_ascii=False
+    )
+    return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+
+def parse_streamed_answer(text: str) -> IdealAnswer:
+    """
+    Split a streamed answer into its sections.
+
+    Text without headings is all ideal answer, and so is text before the
+    first heading when the model left out the "Ideal Answer" heading itself.
+    """
+    matches = list(SECTION_PATTERN.finditer(text))
+    if not matches:
+        return IdealAnswer(ideal_answer=text.strip())
+
+    sections = {"ideal_answer": text[:matches[0].start()].strip()}
+    for match, following in zip(matches, matches[1:] + [None]):
+        end = following.start() if following is not None else len(text)
+        sections[STREAM_SECTIONS[match.group(1).lower()]] = text[match.end():end].strip()
+    return IdealAnswer(**sections)
+
 class IdealAnswerGenerator:
     def __init__(self):
-        api_key = os.environ.get("Grok_API_KEY")
-        if not api_key:
-            raise ValueError("GROQ_API_KEY environment variable is not set")
-        self.client = Groq(api_key=api_key)
         self.model = "llama-3.2-3b-preview"
 
-    def parse_llm_response(response: str) -> Dict:
-        """Parse and validate LLM response with unicode support."""
-        # Normalize unicode characters
-        normalized_response = unicodedata.normalize('NFKC', response)
-        
-        try:
-            # Parse JSON with ensure_ascii=False to handle non-ASCII characters
-            parsed = json.loads(normalized_response)
-            
-            # Validate required fields
-            required_fields = ['ideal_answer', 'user_strengths', 
-                            'areas_for_improvement', 'improvement_suggestions']
-            
-            if not all(field in parsed for field in required_fields):
-                raise ValueError("Missing required fields in response")
-                
-            return parsed
-            
-        except json.JSONDecodeError as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to parse response: {str(e)}"
-            )
-
-
     async def generate_ideal_answer(self, question: str, user_answer: str) -> Dict:
         """
         Generate an grammatically correct answer and comparison with user's answer.
@@ -50,8 +61,13 @@ class IdealAnswerGenerator:
             user_answer (str): The user's answer to analyze
             
         Returns:
-            Dict: Contains grammatically correct answer and analysis of user's answer
+            Dict: status, and under "data" the ideal answer, user strengths and
+            areas for improvement as an object
         """
+        cached = await self._cached(question, user_answer)
+        if cached is not None:
+            return cached
+
         try:
             prompt = f"""
             Question: {question}
@@ -71,7 +87,7 @@ class IdealAnswerGenerator:
 
             """
 
-            chat_completion = self.client.chat.completions.create(
+            answer = await structured_completion(
                 messages=[
                     {
                         "role": "system",
@@ -84,24 +100,12 @@ class IdealAnswerGenerator:
                 ],
                 temperature=0.1,
                 model=self.model,
-            )            
-    
-            response = chat_completion.choices[0].message.content
+                schema=IdealAnswer,
+            )
 
-            logging.info(f"LLM response: {response}")
-            
-            # Add JSON parsing with error handling
-            try:
-                
-                return {
-                    "status": "success",
-                    "data": response
-                }
-            except json.JSONDecodeError:
-                raise HTTPException(
-                    status_code=500,
-                    detail="Failed to parse LLM response as JSON"
-                )
+            logging.info(f"LLM response: {answer}")
+
+            return await self._store(question, user_answer, answer)
 
         except Exception as e:
             raise HTTPException(
@@ -109,5 +113,76 @@ class IdealAnswerGenerator:
                 detail=f"Failed to generate ideal answer: {str(e)}"
             )
 
+    async def stream_ideal_answer(self, question: str, user_answer: str) -> AsyncIterator[Tuple[str, Dict]]:
+        """
+        Generate the same analysis as generate_ideal_answer, streaming it as it is written.
+
+        Yields ("token", {"text": ...}) for each piece of model output, then
+        ("done", result) with the dict generate_ideal_answer returns. A stored
+        answer for this question and answer is sent as "done" straight away.
+        """
+        cached = await self._cached(question, user_answer)
+        if cached is not None:
+            yield "done", cached
+            return
+
+        # Plain text under headings streams readably; the JSON format would not
+        prompt = f"""
+        Question: {question}
+        User's Answer: {user_answer}
+
+        Please provide, in the same language as the question, under exactly these headings:
+
+        Ideal Answer:
+        A corrected grammatical answer to this question
+
+        User Strengths:
+        What the user did well
+
+        Areas for Improvement:
+        Where the user's answer could be improved
+
+        Do not add any other headings or text."""
+
+        parts = []
+        async for token in chat_completion_stream(
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are a grammatical assessment expert.",
+                },
+                {
+                    "role": "user",
+                    "content": prompt,
+                }
+            ],
+            temperature=0.1,
+            model=self.model,
+        ):
+            parts.append(token)
+            yield "token", {"text": token}
+
+        yield "done", await self._store(question, user_answer, parse_streamed_answer("".join(parts)))
+
+    async def _cached(self, question: str, user_answer: str) -> Optional[Dict]:
+        if not LLM_CACHE_ENABLED:
+            return None
+        cached = await llm_cache.get(ideal_answer_key(question, user_answer))
+        return json.loads(cached) if cached is not None else None
+
+    async def _store(self, question: str, user_answer: str, answer: IdealAnswer) -> Dict:
+        # Parsed and validated here, so clients no longer parse the model's text
+        result = {
+            "status": "success",
+            "data": {
+                # NFKC folds compatibility characters the model sometimes emits in Indic scripts
+                field: unicodedata.normalize('NFKC', value)
+                for field, value in answer.model_dump(exclude_none=True).items()
+            }
+        }
+        if LLM_CACHE_ENABLED and result["data"]["ideal_answer"]:
+            await llm_cache.put(ideal_answer_key(question, user_answer), json.dumps(result, ensure_ascii=False))
+        return result
+
 # Create a singleton instance
 # ideal_answer_generator = IdealAnswerGenerator()
\ No newline at end of file
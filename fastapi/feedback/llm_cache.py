@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+# Seconds a response is served from cache after it was first stored
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+# Responses kept in process memory, most recently used first
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "1024"))
+# Shared on-disk tier; an empty path keeps the cache in memory only
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join("cache", "llm_responses.sqlite3"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(20 * 1024 * 1024)))
+
+
+def normalize_content(text: str) -> str:
+    """Fold whitespace and case so trivially different resubmissions share a key."""
+    return " ".join(str(text).split()).casefold()
+
+
+def llm_cache_key(model: str, messages: List[Dict], **params) -> str:
+    """
+    Key a chat completion by model, exact system prompt, normalized user
+    content and the generation parameters that change the output.
+    """
+    key_source = json.dumps(
+        [
+            model,
+            [
+                [message["role"], message["content"] if message["role"] == "system" else normalize_content(message["content"])]
+                for message in messages
+            ],
+            sorted(params.items())
+        ],
+        ensure_ascii=False,
+        default=str
+    )
+    return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Two-tier, time-limited cache of chat completion responses.
+
+    Lookups go to an in-process LRU first and then to SQLite, which is
+    shared by every worker on the host and bounded to ``max_bytes`` with
+    least recently used entries evicted first. Entries older than
+    ``ttl_seconds`` are never served. Hit and miss counters are per process.
+    The database is created on first use, and ``get`` and ``put`` run its
+    I/O on a thread so the event loop never waits on the disk.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, memory_entries: int = LLM_CACHE_MEMORY_ENTRIES,
+                 max_bytes: int = LLM_CACHE_MAX_BYTES, ttl_seconds: int = LLM_CACHE_TTL_SECONDS):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._created = False
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _create(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with sqlite3.connect(self.path, timeout=5) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._created = True
+
+    @contextmanager
+    def _connect(self):
+        if not self._created:
+            self._create()
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _remember(self, key: str, created_at: float, value: str) -> None:
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _read(self, key: str, now: float) -> Optional[tuple]:
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT value, created_at FROM responses WHERE key = ? AND created_at >= ?",
+                    (key, now - self.ttl_seconds)
+                ).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                return row
+        except sqlite3.Error as e:
+            logger.error(f"Error reading LLM cache: {str(e)}")
+            return None
+
+    def _write(self, key: str, value: str, size: int, now: float) -> None:
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, now, now)
+                )
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            logger.error(f"Error writing LLM cache: {str(e)}")
+
+    async def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            created_at, value = entry
+            if now - created_at <= self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return value
+            del self._memory[key]
+
+        row = await asyncio.to_thread(self._read, key, now) if self.path else None
+        if row is None:
+            self.misses += 1
+            return None
+
+        value, created_at = row
+        self._remember(key, created_at, value)
+        self.disk_hits += 1
+        return value
+
+    async def put(self, key: str, value: str) -> None:
+        now = time.time()
+        self._remember(key, now, value)
+        if not self.path:
+            return
+
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        await asyncio.to_thread(self._write, key, value, size, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evicted = 0
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        logger.info(f"Evicted {evicted} LLM responses from cache")
+
+    def stats(self) -> Dict:
+        entries, total = None, None
+        if self.path and os.path.exists(self.path):
+            try:
+                with self._connect() as conn:
+                    entries, total = conn.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+                    ).fetchone()
+            except sqlite3.Error:
+                pass
+
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "enabled": LLM_CACHE_ENABLED,
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "max_memory_entries": self.memory_entries,
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+
+llm_cache = LLMResponseCache()
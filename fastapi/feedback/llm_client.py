@@ -0,0 +1,200 @@
+import os
+import time
+import logging
+import threading
+from typing import AsyncIterator, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from .llm_cache import LLM_CACHE_ENABLED, llm_cache, llm_cache_key
+from .llm_scheduler import LLM_CONCURRENCY, PRIORITY_INTERACTIVE, estimate_tokens, llm_scheduler
+
+# Load environment variables
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# HTTP connections kept to the API per worker, and how many of them stay open while idle
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "16"))
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "60"))
+# Default seconds allowed for one call, and for opening its connection
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+
+_client = None
+_client_lock = threading.Lock()
+
+# Per-model call counts, token usage and time spent, for comparing prompt strategies
+_usage: Dict[str, Dict] = {}
+
+
+def api_key_configured() -> bool:
+    return bool(os.getenv("Grok_API_KEY"))
+
+
+def get_client():
+    """
+    The async Groq client shared by every module on this worker.
+
+    It is created on first use rather than at import time, so importing the
+    app stays cheap. All calls share one pooled HTTP client, so connections
+    are kept alive and reused across transcription, feedback, answer checking
+    and question generation.
+
+    Raises:
+        ValueError: The API key is not configured
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                api_key = os.getenv("Grok_API_KEY")
+                if not api_key:
+                    raise ValueError("GROQ_API_KEY environment variable is not set")
+
+                import httpx
+                from groq import AsyncGroq
+
+                timeout = httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+                http_client = httpx.AsyncClient(
+                    timeout=timeout,
+                    limits=httpx.Limits(
+                        max_connections=LLM_MAX_CONNECTIONS,
+                        max_keepalive_connections=LLM_MAX_KEEPALIVE,
+                        keepalive_expiry=LLM_KEEPALIVE_SECONDS,
+                    ),
+                )
+                _client = AsyncGroq(
+                    api_key=api_key,
+                    timeout=timeout,
+                    # Retries and 429 backoff are handled by llm_scheduler
+                    max_retries=0,
+                    http_client=http_client,
+                )
+                logger.info(f"Created Groq client ({LLM_MAX_CONNECTIONS} connections, {LLM_CONCURRENCY} concurrent calls)")
+    return _client
+
+
+async def close_client() -> None:
+    """Close the pooled connections; called on shutdown."""
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.close()
+
+
+async def chat_completion(messages: List[Dict], model: str, timeout: Optional[float] = None,
+                          cache: bool = True, priority: int = PRIORITY_INTERACTIVE,
+                          cache_if: Optional[Callable[[str], bool]] = None, **kwargs) -> str:
+    """
+    Run one chat completion and return the message text.
+
+    A response cached for the same model, system prompt, normalized user
+    content and parameters is returned without calling the API, and an
+    identical call already in flight is joined rather than repeated.
+    Otherwise the call goes through llm_scheduler, which holds it until the
+    model's rate budget and a concurrency slot allow it and retries 429s
+    with backoff.
+
+    Args:
+        messages (List[Dict]): Chat messages
+        model (str): Model name
+        timeout (float): Seconds allowed for the upstream call, defaults to LLM_TIMEOUT
+        cache (bool): Serve, store and coalesce the response; turn off for sampled output
+        priority (int): PRIORITY_INTERACTIVE, or PRIORITY_BACKGROUND for work nobody is waiting on
+        cache_if: Only responses for which this returns True are stored
+        **kwargs: Passed to ``chat.completions.create`` (temperature, max_tokens, ...)
+
+    Returns:
+        str: Content of the first choice
+    """
+    cache_key = llm_cache_key(model, messages, **kwargs) if cache else None
+    if cache_key is not None and LLM_CACHE_ENABLED:
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    estimated_tokens = estimate_tokens(messages, kwargs.get("max_tokens"))
+
+    async def request() -> str:
+        started = time.perf_counter()
+        response = await get_client().chat.completions.create(
+            messages=messages,
+            model=model,
+            timeout=timeout or LLM_TIMEOUT,
+            **kwargs
+        )
+        _record_usage(model, response.usage, time.perf_counter() - started)
+        llm_scheduler.settle(model, estimated_tokens, getattr(response.usage, "total_tokens", None))
+
+        content = response.choices[0].message.content
+        if cache_key is not None and LLM_CACHE_ENABLED and content and (cache_if is None or cache_if(content)):
+            await llm_cache.put(cache_key, content)
+        return content
+
+    return await llm_scheduler.call(model, request, tokens=estimated_tokens, priority=priority, key=cache_key)
+
+
+async def chat_completion_stream(messages: List[Dict], model: str, timeout: Optional[float] = None,
+                                 priority: int = PRIORITY_INTERACTIVE, **kwargs) -> AsyncIterator[str]:
+    """
+    Run one streamed chat completion, yielding the message text as it arrives.
+
+    The call holds its llm_scheduler slot until the stream ends. Streamed
+    responses are neither cached nor retried, since part of them may
+    already have been passed on.
+
+    Args:
+        messages (List[Dict]): Chat messages
+        model (str): Model name
+        timeout (float): Seconds allowed for the upstream call, defaults to LLM_TIMEOUT
+        priority (int): PRIORITY_INTERACTIVE, or PRIORITY_BACKGROUND for work nobody is waiting on
+        **kwargs: Passed to ``chat.completions.create`` (temperature, max_tokens, ...)
+
+    Yields:
+        str: Each non-empty content delta
+    """
+    estimated_tokens = estimate_tokens(messages, kwargs.get("max_tokens"))
+
+    async with llm_scheduler.slot(model, tokens=estimated_tokens, priority=priority):
+        started = time.perf_counter()
+        stream = await get_client().chat.completions.create(
+            messages=messages,
+            model=model,
+            timeout=timeout or LLM_TIMEOUT,
+            stream=True,
+            **kwargs
+        )
+
+        usage = None
+        async for chunk in stream:
+            # Groq reports usage on the final chunk under x_groq
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or getattr(chunk, "usage", None) or usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+        _record_usage(model, usage, time.perf_counter() - started)
+        llm_scheduler.settle(model, estimated_tokens, getattr(usage, "total_tokens", None))
+
+
+def _record_usage(model: str, usage, seconds: float) -> None:
+    totals = _usage.setdefault(
+        model, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0}
+    )
+    totals["calls"] += 1
+    totals["seconds"] += seconds
+    if usage is not None:
+        totals["prompt_tokens"] += usage.prompt_tokens or 0
+        totals["completion_tokens"] += usage.completion_tokens or 0
+
+
+def usage_stats() -> Dict[str, Dict]:
+    """Chat completion usage on this worker since it started, per model."""
+    return {
+        model: {
+            **totals,
+            "seconds": round(totals["seconds"], 3),
+            "avg_seconds": round(totals["seconds"] / totals["calls"], 3) if totals["calls"] else 0.0,
+        }
+        for model, totals in _usage.items()
+    }
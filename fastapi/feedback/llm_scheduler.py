@@ -0,0 +1,319 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import itertools
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Upstream calls in flight at once on this worker; the rest queue by priority
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "16"))
+# Budget per model and per worker process; split the provider's limits across workers.
+# A limit of 0 means unlimited.
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "30"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "7000"))
+# Per-model overrides, e.g. "whisper-large-v3=20:0,llama-3.2-3b-preview=30:7000"
+LLM_RATE_LIMITS = os.getenv("LLM_RATE_LIMITS", "")
+# Retries after a 429, and after connection errors, timeouts and 5xx responses
+LLM_RATE_LIMIT_RETRIES = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "4"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_SECONDS = float(os.getenv("LLM_BACKOFF_SECONDS", "1"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "30"))
+
+# Priority classes; lower runs first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+
+def _parse_rate_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    limits = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, values = entry.rpartition("=")
+        requests, _, tokens = values.partition(":")
+        limits[model.strip()] = (float(requests), float(tokens or LLM_TOKENS_PER_MINUTE))
+    return limits
+
+
+def estimate_tokens(messages: List[Dict], max_tokens: Optional[int] = None) -> int:
+    """Rough token cost of a chat call before it is made: ~4 characters per prompt token."""
+    prompt_chars = sum(len(str(message.get("content", ""))) for message in messages)
+    return prompt_chars // 4 + (max_tokens or 512)
+
+
+def _backoff(attempt: int) -> float:
+    delay = min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_SECONDS * 2 ** attempt)
+    return delay * (0.5 + random.random() / 2)
+
+
+def _retry_after(error) -> Optional[float]:
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Refills continuously up to ``per_minute``; 0 means unlimited."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        if self.capacity <= 0:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float, now: float) -> None:
+        if self.capacity > 0:
+            self._refill(now)
+            self.level -= min(amount, self.capacity)
+
+    def adjust(self, amount: float) -> None:
+        """Return (or, when negative, charge) the difference between estimated and actual use."""
+        if self.capacity > 0:
+            self.level = min(self.capacity, self.level + amount)
+
+
+class _ModelBudget:
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.paused_until = 0.0
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        return max(self.paused_until - now, self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+
+    def take(self, tokens: int, now: float) -> None:
+        self.requests.take(1, now)
+        self.tokens.take(tokens, now)
+
+
+class _Waiter:
+    def __init__(self, priority: int, seq: int, model: str, tokens: int, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.model = model
+        self.tokens = tokens
+        self.future = future
+
+
+class LLMScheduler:
+    """
+    Central admission control for upstream model calls.
+
+    Each model has a request and a token budget (token buckets refilled per
+    minute). Calls queue by priority class, then arrival, and start only
+    when the global concurrency limit and their model's budget allow; a
+    model whose head-of-queue call is over budget does not hold up other
+    models. A 429 pauses the whole model for the provider's retry-after (or
+    an exponential backoff) before the call is retried. Calls made with a
+    ``key`` are coalesced: while one is in flight, identical calls wait for
+    its result instead of going upstream.
+    """
+
+    def __init__(self, concurrency: int = LLM_CONCURRENCY, requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = LLM_TOKENS_PER_MINUTE, rate_limits: str = LLM_RATE_LIMITS):
+        self.concurrency = concurrency
+        self.default_limits = (requests_per_minute, tokens_per_minute)
+        self.model_limits = _parse_rate_limits(rate_limits)
+        self._budgets: Dict[str, _ModelBudget] = {}
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flights: Dict[str, asyncio.Future] = {}
+        self.started = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.retried = 0
+
+    def _budget(self, model: str) -> _ModelBudget:
+        budget = self._budgets.get(model)
+        if budget is None:
+            budget = self._budgets[model] = _ModelBudget(*self.model_limits.get(model, self.default_limits))
+        return budget
+
+    def _pump(self) -> None:
+        """Start every queued call that may run now and set a timer for the next one."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        self._waiters = [waiter for waiter in self._waiters if not waiter.future.done()]
+        now = time.monotonic()
+        blocked = set()
+        next_delay = None
+        for waiter in sorted(self._waiters, key=lambda waiter: (waiter.priority, waiter.seq)):
+            if self._in_flight >= self.concurrency:
+                break
+            if waiter.model in blocked:
+                continue
+
+            budget = self._budget(waiter.model)
+            delay = budget.wait_time(waiter.tokens, now)
+            if delay > 0:
+                # Keep priority order within a model: nothing behind this call may overtake it
+                blocked.add(waiter.model)
+                next_delay = delay if next_delay is None else min(next_delay, delay)
+                continue
+
+            budget.take(waiter.tokens, now)
+            self._in_flight += 1
+            self.started += 1
+            self._waiters.remove(waiter)
+            waiter.future.set_result(None)
+
+        if next_delay is not None:
+            self._timer = asyncio.get_running_loop().call_later(next_delay, self._pump)
+
+    async def _acquire(self, model: str, tokens: int, priority: int) -> None:
+        waiter = _Waiter(priority, next(self._seq), model, tokens, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        self._pump()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as the caller gave up; hand the slot back
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._pump()
+
+    def settle(self, model: str, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Correct a model's token budget once the real usage of a call is known."""
+        if actual_tokens is not None:
+            self._budget(model).tokens.adjust(estimated_tokens - actual_tokens)
+
+    async def _call(self, model: str, request: Callable[[], Awaitable], tokens: int, priority: int,
+                    max_retries: int):
+        from groq import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+        attempts = 0
+        rate_limited = 0
+        while True:
+            await self._acquire(model, tokens, priority)
+            try:
+                return await request()
+            except RateLimitError as e:
+                if rate_limited >= LLM_RATE_LIMIT_RETRIES:
+                    raise
+                delay = _retry_after(e) or _backoff(rate_limited)
+                rate_limited += 1
+                self.rate_limited += 1
+                # Everyone queued for this model waits out the limit, not just this call
+                budget = self._budget(model)
+                budget.paused_until = max(budget.paused_until, time.monotonic() + delay)
+                logger.warning(f"Rate limited on {model}, pausing it for {delay:.1f}s")
+            except (APIConnectionError, APITimeoutError, InternalServerError) as e:
+                if attempts >= max_retries:
+                    raise
+                delay = _backoff(attempts)
+                attempts += 1
+                logger.warning(f"{model} call failed ({type(e).__name__}), retrying in {delay:.1f}s")
+            finally:
+                self._release()
+
+            self.retried += 1
+            await asyncio.sleep(delay)
+
+    async def call(self, model: str, request: Callable[[], Awaitable], tokens: int = 0,
+                   priority: int = PRIORITY_INTERACTIVE, key: Optional[str] = None,
+                   max_retries: int = LLM_MAX_RETRIES):
+        """
+        Run ``request()`` once budget and a slot are available.
+
+        Args:
+            model (str): Model the request is billed against
+            request: Zero-argument coroutine function making one upstream call
+            tokens (int): Estimated token cost, see estimate_tokens
+            priority (int): PRIORITY_INTERACTIVE or PRIORITY_BACKGROUND
+            key (str): Identical in-flight calls with the same key share one upstream call
+            max_retries (int): Retries after connection errors, timeouts and 5xx responses
+
+        Returns:
+            Whatever ``request()`` returns
+        """
+        if key is None:
+            return await self._call(model, request, tokens, priority, max_retries)
+
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+        else:
+            # The upstream call runs as its own task, so it outlives a caller that times out
+            flight = asyncio.ensure_future(self._call(model, request, tokens, priority, max_retries))
+            self._flights[key] = flight
+            flight.add_done_callback(lambda done: self._finish_flight(key, done))
+        return await asyncio.shield(flight)
+
+    @asynccontextmanager
+    async def slot(self, model: str, tokens: int = 0, priority: int = PRIORITY_INTERACTIVE):
+        """
+        Hold budget and a concurrency slot for the body of the ``async with``.
+
+        For calls that cannot go through ``call``, such as streamed responses
+        whose tokens are consumed as they arrive. Nothing is retried or
+        coalesced; a 429 still pauses the model for everyone queued behind it.
+        """
+        from groq import RateLimitError
+
+        await self._acquire(model, tokens, priority)
+        try:
+            yield
+        except RateLimitError as e:
+            self.rate_limited += 1
+            budget = self._budget(model)
+            budget.paused_until = max(budget.paused_until, time.monotonic() + (_retry_after(e) or _backoff(0)))
+            raise
+        finally:
+            self._release()
+
+    def _finish_flight(self, key: str, flight: asyncio.Future) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.cancelled():
+            # Mark the exception retrieved even if every caller has already given up
+            flight.exception()
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        return {
+            "in_flight": self._in_flight,
+            "queued": sum(1 for waiter in self._waiters if not waiter.future.done()),
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "rate_limited": self.rate_limited,
+            "retried": self.retried,
+            "models": {
+                model: {
+                    "requests_available": round(budget.requests.level, 1) if budget.requests.capacity else None,
+                    "tokens_available": round(budget.tokens.level) if budget.tokens.capacity else None,
+                    "paused_seconds": round(max(0.0, budget.paused_until - now), 1)
+                }
+                for model, budget in self._budgets.items()
+            }
+        }
+
+
+llm_scheduler = LLMScheduler()
@@ -0,0 +1,100 @@
+import os
+import re
+from typing import List, Tuple
+
+# Longest stretch of audio sent in a single transcription request
+TRANSCRIBE_SEGMENT_SECONDS = float(os.getenv("TRANSCRIBE_SEGMENT_SECONDS", "60"))
+# Audio shared by two neighbouring segments when no pause is available to cut at
+TRANSCRIBE_OVERLAP_SECONDS = float(os.getenv("TRANSCRIBE_OVERLAP_SECONDS", "1.0"))
+
+if not 0 <= TRANSCRIBE_OVERLAP_SECONDS < TRANSCRIBE_SEGMENT_SECONDS:
+    raise ValueError(
+        f"TRANSCRIBE_OVERLAP_SECONDS ({TRANSCRIBE_OVERLAP_SECONDS}) must be at least 0 and shorter than "
+        f"TRANSCRIBE_SEGMENT_SECONDS ({TRANSCRIBE_SEGMENT_SECONDS})"
+    )
+
+# Longest run of repeated words looked for at an overlapping seam
+MAX_SEAM_WORDS = 12
+
+
+def plan_segments(duration: float, cut_points: List[float], max_seconds: float = TRANSCRIBE_SEGMENT_SECONDS,
+                  overlap_seconds: float = TRANSCRIBE_OVERLAP_SECONDS) -> List[Tuple[float, float, bool]]:
+    """
+    Split a recording into segments no longer than ``max_seconds``.
+
+    Each segment ends at the latest pause that keeps it under the limit. If
+    there is no pause in the second half of the window the segment is cut
+    hard at the limit and the next one starts ``overlap_seconds`` earlier, so
+    a word split by the cut is heard whole by at least one segment.
+
+    Args:
+        duration (float): Length of the audio in seconds
+        cut_points (List[float]): Times of pauses where cutting is safe
+        max_seconds (float): Longest allowed segment
+        overlap_seconds (float): Overlap used for hard cuts
+
+    Returns:
+        List[Tuple[float, float, bool]]: (start, end, overlaps_previous) per segment
+
+    Raises:
+        ValueError: If ``overlap_seconds`` is not shorter than ``max_seconds``,
+        which would keep a hard cut from ever moving forward
+    """
+    if not 0 <= overlap_seconds < max_seconds:
+        raise ValueError(
+            f"overlap_seconds ({overlap_seconds}) must be at least 0 and shorter than max_seconds ({max_seconds})"
+        )
+
+    cut_points = sorted(point for point in cut_points if 0 < point < duration)
+    segments = []
+    start = 0.0
+    overlaps_previous = False
+
+    while duration - start > max_seconds:
+        limit = start + max_seconds
+        candidates = [point for point in cut_points if start + max_seconds / 2 <= point <= limit]
+        if candidates:
+            end = candidates[-1]
+            segments.append((start, end, overlaps_previous))
+            start, overlaps_previous = end, False
+        else:
+            segments.append((start, limit, overlaps_previous))
+            start, overlaps_previous = limit - overlap_seconds, True
+
+    segments.append((start, duration, overlaps_previous))
+    return segments
+
+
+def _normalize_word(word: str) -> str:
+    return re.sub(r"[^\w]", "", word.casefold())
+
+
+def seam_overlaps(texts: List[str], overlaps_previous: List[bool]) -> List[int]:
+    """
+    Count the words each segment transcript repeats from the one before it.
+
+    Where a segment overlaps the previous one, this is the longest run of
+    words that ends the transcript so far and also starts this segment;
+    segments that do not overlap repeat nothing.
+    """
+    words: List[str] = []
+    repeated = []
+    for text, overlaps in zip(texts, overlaps_previous):
+        segment_words = [_normalize_word(word) for word in text.split()]
+        size = 0
+        if overlaps and words:
+            for size in range(min(MAX_SEAM_WORDS, len(words), len(segment_words)), -1, -1):
+                if words[len(words) - size:] == segment_words[:size]:
+                    break
+        repeated.append(size)
+        words.extend(segment_words[size:])
+    return repeated
+
+
+def stitch_transcripts(texts: List[str], overlaps_previous: List[bool]) -> str:
+    """Join segment transcripts in order, dropping the words seam_overlaps finds repeated."""
+    return " ".join(
+        word
+        for text, repeated in zip(texts, seam_overlaps(texts, overlaps_previous))
+        for word in text.split()[repeated:]
+    )
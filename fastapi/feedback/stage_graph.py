@@ -0,0 +1,197 @@
+import os
+import time
+import asyncio
+import inspect
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+from .circuit_breaker import CircuitBreaker
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds a stage may take before its fallback result is used instead
+STAGE_TIMEOUT = float(os.getenv("FEEDBACK_STAGE_TIMEOUT", "20"))
+
+
+class StageDegraded(Exception):
+    """Raised by a stage to use its fallback and be reported as degraded for ``reason``."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class Stage:
+    """
+    One step of an analysis.
+
+    ``run`` receives the results of the stages named in ``deps`` as keyword
+    arguments and may be sync or async. If it raises or, when async, takes
+    longer than ``timeout`` seconds, ``fallback()`` supplies the stage's
+    result instead, so one failing stage never fails the whole graph.
+    A stage with a ``breaker`` is skipped while that breaker is open, and
+    its outcome and duration are recorded on it; only errors and its own
+    timeout count as failures, a stage cut short by the budget does not. A
+    stage that raises StageDegraded gets its fallback and is reported as
+    degraded.
+    """
+
+    def __init__(self, name: str, run: Callable, deps: Iterable[str] = (), timeout: Optional[float] = None,
+                 fallback: Callable[[], Any] = lambda: None, breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.run = run
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.fallback = fallback
+        self.breaker = breaker
+
+
+class StageGraph:
+    """
+    Runs stages as soon as their dependencies have finished.
+
+    Independent stages run concurrently, so the graph takes about as long as
+    its slowest chain of dependent stages rather than the sum of all of them.
+    With a ``budget`` the whole graph finishes within that many seconds:
+    async stages still running when it runs out, and stages whose breaker
+    is open, are marked "degraded" and contribute their fallback result.
+    """
+
+    def __init__(self, stages: List[Stage], default_timeout: float = STAGE_TIMEOUT,
+                 budget: Optional[float] = None):
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage: {stage.name}")
+            self.stages[stage.name] = stage
+        self.default_timeout = default_timeout
+        self.budget = budget
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        order, visiting, done = [], set(), set()
+
+        def visit(name, path):
+            if name in done:
+                return
+            if name not in self.stages:
+                raise ValueError(f"Stage {path[-1]} depends on unknown stage {name}")
+            if name in visiting:
+                raise ValueError(f"Stage dependency cycle: {' -> '.join(path + [name])}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep, path + [name])
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name, [])
+        return order
+
+    async def _run_stage(self, stage: Stage, tasks: Dict[str, asyncio.Task], started: float,
+                         report: Dict[str, Dict]) -> Any:
+        dep_results = {dep: await tasks[dep] for dep in stage.deps}
+
+        stage_start = time.perf_counter()
+        timeout = stage.timeout or self.default_timeout
+        remaining = None if self.budget is None else self.budget - (stage_start - started)
+        status = "ok"
+        reason = None
+        if stage.breaker is not None and remaining is not None and remaining <= 0:
+            status, reason = "degraded", "over_budget"
+        elif stage.breaker is not None and not stage.breaker.allow():
+            status, reason = "degraded", "circuit_open"
+        if status == "degraded":
+            logger.warning(f"Stage {stage.name} degraded ({reason}), using fallback")
+            result = stage.fallback()
+        else:
+            try:
+                result = stage.run(**dep_results)
+                if inspect.isawaitable(result):
+                    result = await asyncio.wait_for(
+                        result, timeout if remaining is None else max(0.0, min(timeout, remaining))
+                    )
+            except asyncio.TimeoutError:
+                if remaining is not None and remaining < timeout:
+                    status, reason = "degraded", "over_budget"
+                    logger.warning(f"Stage {stage.name} ran over the latency budget, using fallback")
+                else:
+                    status = "timeout"
+                    logger.warning(f"Stage {stage.name} timed out, using fallback")
+                result = stage.fallback()
+            except asyncio.CancelledError:
+                if stage.breaker is not None:
+                    stage.breaker.abandon()
+                raise
+            except StageDegraded as e:
+                status, reason = "degraded", e.reason
+                logger.warning(f"Stage {stage.name} degraded ({reason}), using fallback")
+                result = stage.fallback()
+            except Exception as e:
+                status = "error"
+                logger.error(f"Stage {stage.name} failed, using fallback: {str(e)}")
+                result = stage.fallback()
+
+            if stage.breaker is not None:
+                if status == "degraded":
+                    # Cut short by the caller's budget or by an upstream stage, not a failure of its own
+                    stage.breaker.abandon()
+                else:
+                    stage.breaker.record(status == "ok", time.perf_counter() - stage_start)
+
+        finished = time.perf_counter()
+        report[stage.name] = {
+            "status": status,
+            "started_at": round(stage_start - started, 3),
+            "seconds": round(finished - stage_start, 3)
+        }
+        if reason is not None:
+            report[stage.name]["reason"] = reason
+        return result
+
+    async def stream(self) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Run every stage, yielding (name, result) as each one finishes.
+
+        Once the iteration is exhausted ``self.report`` holds the timing
+        report. Stages still running when the consumer stops early are
+        cancelled.
+        """
+        started = time.perf_counter()
+        report: Dict[str, Dict] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+        # Dependencies come first in self.order, so their tasks exist when a stage awaits them
+        for name in self.order:
+            tasks[name] = asyncio.create_task(self._run_stage(self.stages[name], tasks, started, report))
+        names = {task: name for name, task in tasks.items()}
+
+        try:
+            pending = set(tasks.values())
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda task: self.order.index(names[task])):
+                    yield names[task], task.result()
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+        total = time.perf_counter() - started
+        logger.info(
+            f"Ran {len(tasks)} stages in {total:.2f}s: "
+            + ", ".join(f"{name} {report[name]['seconds']:.2f}s" for name in self.order)
+        )
+        self.report = {"total_seconds": round(total, 3), "stages": {name: report[name] for name in self.order}}
+        if self.budget is not None:
+            self.report["budget_seconds"] = self.budget
+
+    async def run(self) -> Tuple[Dict[str, Any], Dict]:
+        """
+        Run every stage.
+
+        Returns:
+            tuple: (results by stage name, timing report with total_seconds
+            and each stage's status, start offset and duration)
+        """
+        results = {name: result async for name, result in self.stream()}
+        return {name: results[name] for name in self.order}, self.report
@@ -0,0 +1,317 @@
+import os
+import re
+import ast
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, Field, ValidationError, field_validator, model_validator
+
+from .llm_client import chat_completion
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Ask the provider for a JSON object response where the model supports it
+LLM_JSON_MODE = os.getenv("LLM_JSON_MODE", "true").lower() == "true"
+# Fresh requests made when a response cannot be repaired into the schema
+STRUCTURED_OUTPUT_RETRIES = int(os.getenv("STRUCTURED_OUTPUT_RETRIES", "1"))
+
+# Models that rejected response_format on this worker
+_json_mode_unsupported = set()
+
+FENCE_PATTERN = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.DOTALL)
+TRAILING_COMMA_PATTERN = re.compile(r",\s*([}\]])")
+SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+
+class StructuredOutputError(ValueError):
+    """Raised when a model response holds no object matching the expected schema."""
+
+
+class _ErrorItem(BaseModel):
+    @field_validator("*", mode="before")
+    @classmethod
+    def _as_text(cls, value):
+        return "" if value is None else str(value)
+
+
+class GrammarError(_ErrorItem):
+    word: str = ""
+    suggestion: str = ""
+    explanation: str = ""
+
+
+class PronunciationError(_ErrorItem):
+    word: str = ""
+    phonetic: str = ""
+    explanation: str = ""
+
+
+class _ErrorReport(BaseModel):
+    error_count: int = 0
+    # Set when the response was cut off and only the errors that arrived are listed
+    truncated: bool = False
+
+    @model_validator(mode="after")
+    def _count_errors(self):
+        # Models often get the count wrong; the listed errors are what the user sees
+        self.error_count = len(self.errors)
+        return self
+
+
+class GrammarReport(_ErrorReport):
+    errors: List[GrammarError] = Field(default_factory=list)
+
+
+class PronunciationReport(_ErrorReport):
+    errors: List[PronunciationError] = Field(default_factory=list)
+
+
+class CorrectnessScores(BaseModel):
+    relevance_score: float
+    quality_score: float
+    relevance_feedback: str = ""
+    quality_feedback: str = ""
+
+    @field_validator("relevance_score", "quality_score")
+    @classmethod
+    def _clamp_score(cls, value: float) -> float:
+        return min(50.0, max(0.0, value))
+
+    @field_validator("relevance_feedback", "quality_feedback", mode="before")
+    @classmethod
+    def _as_text(cls, value):
+        return "" if value is None else str(value)
+
+
+class IdealAnswer(BaseModel):
+    ideal_answer: str
+    user_strengths: str = ""
+    areas_for_improvement: str = ""
+    improvement_suggestions: Optional[str] = None
+
+
+def _candidates(text: str) -> List[str]:
+    """Fenced blocks first, then the raw text."""
+    return [match.strip() for match in FENCE_PATTERN.findall(text)] + [text]
+
+
+def _first_object(text: str) -> Optional[Tuple[str, bool]]:
+    """
+    Cut the first balanced JSON object out of ``text``.
+
+    Braces inside strings are ignored. If the text ends while the object is
+    still open (a truncated response), the open string, arrays and objects
+    are closed so the part that did arrive can still be used.
+
+    Returns:
+        tuple: The object's text and whether it had to be closed this way,
+        or None if there is no object
+    """
+    start = text.find("{")
+    if start < 0:
+        return None
+
+    stack = []
+    in_string = None
+    escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == in_string:
+                in_string = None
+            continue
+        if char in "\"'":
+            in_string = char
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if stack and stack[-1] == char:
+                stack.pop()
+            if not stack:
+                return text[start:index + 1], False
+
+    tail = text[start:].rstrip().rstrip(",")
+    return tail + (in_string or "") + "".join(reversed(stack)), True
+
+
+def _load(candidate: str) -> Any:
+    candidate = candidate.translate(SMART_QUOTES)
+    for attempt in (candidate, TRAILING_COMMA_PATTERN.sub(r"\1", candidate)):
+        try:
+            return json.loads(attempt)
+        except json.JSONDecodeError:
+            pass
+        try:
+            # Python-style dicts: single quotes, True/False/None. literal_eval never executes code.
+            return ast.literal_eval(attempt)
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            pass
+    raise StructuredOutputError("No parseable JSON object")
+
+
+def _extract(text: str) -> Tuple[Dict, bool]:
+    if not text:
+        raise StructuredOutputError("Empty response")
+
+    for candidate in _candidates(text):
+        found = _first_object(candidate)
+        if found is None:
+            continue
+        obj, truncated = found
+        try:
+            data = _load(obj)
+        except StructuredOutputError:
+            continue
+        if isinstance(data, dict):
+            return data, truncated
+    raise StructuredOutputError(f"No JSON object in response: {text[:200]!r}")
+
+
+def extract_json(text: str) -> Dict:
+    """
+    Parse the first JSON object in a model response.
+
+    Handles fenced code blocks, prose around the object, smart quotes,
+    trailing commas, Python literals and truncated output.
+
+    Raises:
+        StructuredOutputError: Nothing in the text can be repaired into an object
+    """
+    return _extract(text)[0]
+
+
+def _parse(text: str, schema: Optional[Type[BaseModel]]) -> Tuple[Any, bool]:
+    data, truncated = _extract(text)
+    if schema is None:
+        return data, truncated
+    if truncated and "truncated" not in schema.model_fields:
+        # Only schemas that can say they are partial are accepted from a cut-off response
+        raise StructuredOutputError(f"Response was cut off before {schema.__name__} was complete")
+    try:
+        result = schema.model_validate(data)
+    except ValidationError as e:
+        raise StructuredOutputError(f"Response does not match {schema.__name__}: {e.error_count()} errors") from e
+    if truncated:
+        result.truncated = True
+    return result, truncated
+
+
+def parse_structured(text: str, schema: Optional[Type[BaseModel]] = None):
+    """
+    Extract the first JSON object from ``text`` and validate it.
+
+    A cut-off response is repaired only into schemas with a ``truncated``
+    field, which is then set; without a schema the dict gets a "truncated"
+    key instead.
+
+    Returns:
+        The schema instance, or the plain dict when no schema is given
+
+    Raises:
+        StructuredOutputError: No object could be extracted, it does not fit
+        the schema, or it was cut off and the schema cannot flag that
+    """
+    result, truncated = _parse(text, schema)
+    if truncated and schema is None:
+        result["truncated"] = True
+    return result
+
+
+def validate_section(data: Any, schema: Type[BaseModel]) -> Optional[BaseModel]:
+    """Validate one part of a larger response, or None if it is missing or malformed."""
+    if not isinstance(data, dict):
+        return None
+    try:
+        return schema.model_validate(data)
+    except ValidationError:
+        return None
+
+
+def _is_valid(schema: Optional[Type[BaseModel]]):
+    def check(content: str) -> bool:
+        # Partial results are served once but never cached
+        try:
+            return not _parse(content, schema)[1]
+        except StructuredOutputError:
+            return False
+    return check
+
+
+def _failed_generation(error: Exception) -> Optional[str]:
+    """The invalid output Groq attaches to a json_validate_failed error, or None for other errors."""
+    body = getattr(error, "body", None)
+    if isinstance(body, dict):
+        body = body.get("error", body)
+    if isinstance(body, dict) and body.get("code") == "json_validate_failed":
+        return body.get("failed_generation") or ""
+    return "" if "json_validate_failed" in str(error) else None
+
+
+async def structured_completion(messages: List[Dict], model: str, schema: Optional[Type[BaseModel]] = None,
+                                retries: int = STRUCTURED_OUTPUT_RETRIES, **kwargs):
+    """
+    Run a chat completion whose answer must be a JSON object.
+
+    JSON mode is requested when enabled and supported by the model. The
+    response is repaired and validated locally; only a response that cannot
+    be repaired triggers a fresh, uncached request. When JSON mode rejects
+    the model's output (json_validate_failed), the output carried by the
+    error is repaired the same way, and if that fails the fresh request is
+    made without JSON mode. Responses that fail validation or were cut off
+    are never stored in the LLM cache.
+
+    Args:
+        messages (List[Dict]): Chat messages; the prompt must ask for JSON
+        model (str): Model name
+        schema: Pydantic model to validate against, or None for any object
+        retries (int): Fresh requests allowed after an unrepairable response
+        **kwargs: Passed to chat_completion
+
+    Returns:
+        The schema instance, or the plain dict when no schema is given
+
+    Raises:
+        StructuredOutputError: Every attempt produced unusable output
+    """
+    from groq import BadRequestError
+
+    last_error = None
+    json_mode = LLM_JSON_MODE
+    for attempt in range(retries + 1):
+        options = dict(kwargs)
+        if json_mode and model not in _json_mode_unsupported:
+            options["response_format"] = {"type": "json_object"}
+        if attempt:
+            # The failed response may be cached for these exact inputs; go upstream
+            options["cache"] = False
+
+        try:
+            content = await chat_completion(messages, model, cache_if=_is_valid(schema), **options)
+        except BadRequestError as e:
+            failed_generation = _failed_generation(e) if "response_format" in options else None
+            if failed_generation is not None:
+                # The provider's own JSON check failed; the output is usually repairable anyway
+                logger.warning(f"{model} output failed JSON mode validation, repairing it locally")
+                json_mode = False
+                content = failed_generation
+            elif "response_format" in options and "response_format" in str(e):
+                logger.warning(f"{model} does not support JSON mode, continuing without it")
+                _json_mode_unsupported.add(model)
+                options.pop("response_format")
+                content = await chat_completion(messages, model, cache_if=_is_valid(schema), **options)
+            else:
+                raise
+
+        try:
+            return parse_structured(content, schema)
+        except StructuredOutputError as e:
+            last_error = e
+            logger.warning(f"Unusable {model} response (attempt {attempt + 1}): {str(e)}")
+
+    raise last_error
@@ -0,0 +1,110 @@
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Longest stretch of transcript sent in a single grammar or pronunciation request
+ANALYSIS_CHUNK_CHARS = int(os.getenv("ANALYSIS_CHUNK_CHARS", "1200"))
+
+# Sentence ends: Latin punctuation and the Devanagari/Bengali danda, followed by space or the end
+SENTENCE_END_PATTERN = re.compile(r'[.!?।॥]+["\')\]]*(?=\s|$)|\n+')
+
+
+def split_sentences(text: str) -> List[Tuple[int, int]]:
+    """Spans (start, end) of the sentences in ``text``, trailing whitespace excluded."""
+    spans = []
+    start = 0
+    for match in SENTENCE_END_PATTERN.finditer(text):
+        end = match.end()
+        if text[start:end].strip():
+            spans.append((start, end))
+        start = end
+    if text[start:].strip():
+        spans.append((start, len(text)))
+    return spans
+
+
+def chunk_text(text: str, max_chars: int = ANALYSIS_CHUNK_CHARS) -> List[Tuple[int, str]]:
+    """
+    Split a transcript into chunks of at most ``max_chars`` at sentence boundaries.
+
+    Whole sentences are packed into each chunk; a single sentence longer
+    than the limit is cut at the last space that fits. Returns (offset,
+    chunk) pairs, where offset is where the chunk starts in ``text``, so
+    positions found in a chunk can be mapped back.
+    """
+    if len(text) <= max_chars:
+        return [(0, text)]
+
+    pieces = []
+    for start, end in split_sentences(text):
+        while end - start > max_chars:
+            cut = text.rfind(" ", start + 1, start + max_chars)
+            cut = cut if cut > start else start + max_chars
+            pieces.append((start, cut))
+            start = cut
+        pieces.append((start, end))
+
+    chunks = []
+    chunk_start = chunk_end = None
+    for start, end in pieces:
+        if chunk_start is not None and end - chunk_start > max_chars:
+            chunks.append((chunk_start, chunk_end))
+            chunk_start = None
+        if chunk_start is None:
+            chunk_start = start
+        chunk_end = end
+    if chunk_start is not None:
+        chunks.append((chunk_start, chunk_end))
+
+    result = []
+    for start, end in chunks:
+        chunk = text[start:end]
+        # Keep offsets exact while dropping the whitespace left between sentences
+        stripped = chunk.lstrip()
+        result.append((start + len(chunk) - len(stripped), stripped.rstrip()))
+    return result
+
+
+def _find(chunk: str, word: str) -> Optional[int]:
+    if not word:
+        return None
+    position = chunk.find(word)
+    if position < 0:
+        position = chunk.lower().find(word.lower())
+    return position if position >= 0 else None
+
+
+def merge_chunk_errors(chunks: List[Tuple[int, str]], reports: List[Optional[Dict]],
+                       detail_field: str) -> Dict:
+    """
+    Combine per-chunk error reports into one report for the whole transcript.
+
+    Each error gains a "position": where its word occurs in the original
+    text, or None if the model's word cannot be found in its chunk. Errors
+    repeating the same word and ``detail_field`` (the suggestion or the
+    phonetic spelling) are kept once, at their first position. A chunk
+    whose report is None failed; "failed_chunks" counts them. The result is
+    "truncated" if any chunk failed or its report was cut off, since its
+    errors are then missing from the count.
+    """
+    errors = []
+    seen = set()
+    for (offset, chunk), report in zip(chunks, reports):
+        for error in (report or {}).get("errors", []):
+            key = (" ".join(error.get("word", "").split()).casefold(),
+                   " ".join(error.get(detail_field, "").split()).casefold())
+            if key in seen:
+                continue
+            seen.add(key)
+            position = _find(chunk, error.get("word", ""))
+            errors.append({**error, "position": offset + position if position is not None else None})
+
+    errors.sort(key=lambda error: (error["position"] is None, error["position"] or 0))
+    failed_chunks = sum(1 for report in reports if report is None)
+    truncated = failed_chunks > 0 or any((report or {}).get("truncated", False) for report in reports)
+    return {
+        "error_count": len(errors),
+        "errors": errors,
+        "truncated": truncated,
+        "failed_chunks": failed_chunks
+    }
@@ -0,0 +1,141 @@
+import os
+import bisect
+import logging
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .get_pause import HOP_LENGTH, N_FFT, _find_pause_runs
+
+logging.basicConfig(level=logging.INFO)
+
+# Opt in: compressing silence also remaps every transcript timestamp through a TimeMap
+VAD_ENABLED = os.getenv("VAD_ENABLED", "false").lower() == "true"
+# Non-speech shorter than this is left in the upload untouched
+VAD_MIN_SILENCE_SECONDS = float(os.getenv("VAD_MIN_SILENCE_SECONDS", "0.8"))
+# Silence kept next to speech on each side of a removed span
+VAD_KEEP_SECONDS = float(os.getenv("VAD_KEEP_SECONDS", "0.25"))
+# Frames quieter than this (dB below the loudest frame) can count as non-speech
+VAD_ENERGY_FLOOR_DB = float(os.getenv("VAD_ENERGY_FLOOR_DB", "-35"))
+
+
+class TimeMap:
+    """
+    Maps times in silence-compressed audio back to the original recording.
+
+    ``spans`` holds the (start, end) seconds of the original audio that were
+    kept, in order; the compressed audio is those spans laid end to end.
+    """
+
+    def __init__(self, spans: List[Tuple[float, float]]):
+        self.spans = spans
+        self._compressed_starts = []
+        position = 0.0
+        for start, end in spans:
+            self._compressed_starts.append(position)
+            position += end - start
+        self.compressed_duration = position
+
+    def to_original(self, seconds: float) -> float:
+        """Original-timeline time of a point in the compressed audio."""
+        if not self.spans:
+            return seconds
+        index = max(0, bisect.bisect_right(self._compressed_starts, seconds) - 1)
+        start, end = self.spans[index]
+        return min(end, start + seconds - self._compressed_starts[index])
+
+    def to_compressed(self, seconds: float) -> float:
+        """Compressed-timeline time of an original time; removed audio maps to the seam."""
+        for (start, end), compressed_start in zip(self.spans, self._compressed_starts):
+            if seconds < start:
+                return compressed_start
+            if seconds <= end:
+                return compressed_start + seconds - start
+        return self.compressed_duration
+
+    @property
+    def seams(self) -> List[float]:
+        """Compressed-timeline points where removed silence used to be."""
+        return self._compressed_starts[1:]
+
+    def to_dict(self) -> Dict:
+        return {"spans": [[round(start, 3), round(end, 3)] for start, end in self.spans]}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "TimeMap":
+        return cls([tuple(span) for span in data.get("spans", [])])
+
+
+def find_non_speech(audio, sample_rate, audio_envelope, amplitude_threshold=0.015,
+                    min_silence_seconds=VAD_MIN_SILENCE_SECONDS, energy_floor_db=VAD_ENERGY_FLOOR_DB):
+    """
+    Find spans without speech, as (start_sample, end_sample) pairs.
+
+    A frame is non-speech when the onset envelope used for pause detection is
+    below its threshold and the frame energy is also far below the loudest
+    frame; the energy check keeps sustained vowels, which have little onset
+    flux, from being cut.
+    """
+    import librosa
+
+    rms = librosa.feature.rms(y=audio, frame_length=N_FFT, hop_length=HOP_LENGTH)[0]
+    rms_db = librosa.amplitude_to_db(rms, ref=np.max)
+
+    n_frames = min(len(audio_envelope), len(rms_db))
+    silent = (audio_envelope[:n_frames] < amplitude_threshold) & (rms_db[:n_frames] < energy_floor_db)
+    _, starts, ends = _find_pause_runs(silent)
+
+    min_frames = min_silence_seconds * sample_rate / HOP_LENGTH
+    return [
+        (int(start) * HOP_LENGTH, min(int(end) * HOP_LENGTH, len(audio)))
+        for start, end in zip(starts, ends)
+        if end - start >= min_frames
+    ]
+
+
+def compress_silence(audio, sample_rate, audio_envelope, keep_seconds=VAD_KEEP_SECONDS, **kwargs):
+    """
+    Remove long non-speech spans before transcription.
+
+    Each removed span keeps ``keep_seconds`` of silence next to the speech it
+    borders, so words are not glued together. Leading and trailing silence is
+    trimmed the same way.
+
+    Args:
+        audio (np.ndarray): Mono samples
+        sample_rate (int): Sample rate of ``audio``
+        audio_envelope (np.ndarray): Onset envelope of ``audio`` on the pause-detection frame grid
+        keep_seconds (float): Silence kept beside each stretch of speech
+
+    Returns:
+        tuple: (compressed samples, TimeMap back to the original timeline)
+    """
+    keep = int(keep_seconds * sample_rate)
+    removed = []
+    for start, end in find_non_speech(audio, sample_rate, audio_envelope, **kwargs):
+        cut_start = start if start == 0 else start + keep
+        cut_end = end if end == len(audio) else end - keep
+        if cut_end > cut_start:
+            removed.append((cut_start, cut_end))
+
+    kept = []
+    position = 0
+    for cut_start, cut_end in removed:
+        if cut_start > position:
+            kept.append((position, cut_start))
+        position = cut_end
+    if position < len(audio):
+        kept.append((position, len(audio)))
+
+    if not kept:
+        # Nothing sounded like speech; send everything rather than nothing
+        kept = [(0, len(audio))]
+
+    compressed = np.concatenate([audio[start:end] for start, end in kept])
+    time_map = TimeMap([(start / sample_rate, end / sample_rate) for start, end in kept])
+
+    logging.info(
+        f"VAD kept {len(compressed) / sample_rate:.1f}s of {len(audio) / sample_rate:.1f}s "
+        f"in {len(kept)} spans"
+    )
+    return compressed, time_map
@@ -1,4 +1,29 @@
-from typing import Dict, List, Set
+import os
+import re
+import pickle
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import Counter, deque
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Graded word list, one "word<TAB>level[<TAB>category]" entry per line, e.g. a CEFR A1-C2 list
+VOCAB_LEXICON_PATH = os.getenv("VOCAB_LEXICON_PATH", os.path.join("data", "vocabulary_levels.tsv"))
+# Compiled index, rebuilt whenever the lexicon or the built-in lists change
+VOCAB_INDEX_PATH = os.getenv("VOCAB_INDEX_PATH", os.path.join("cache", "vocabulary_index.pickle"))
+# Words per window for the moving-average type-token ratio
+VOCAB_DIVERSITY_WINDOW = int(os.getenv("VOCAB_DIVERSITY_WINDOW", "50"))
+
+LEVELS = ("A1", "A2", "B1", "B2", "C1", "C2")
+# Graded words at these levels count as advanced even when no category lists them
+ADVANCED_LEVELS = {"C1", "C2"}
+
+TOKEN_PATTERN = re.compile(r"[^\W\d_]+(?:['’-][^\W\d_]+)*")
+VOWELS = set("aeiou")
 
 # Advanced vocabulary words categorized by type
 ADVANCED_VOCABULARY = {
@@ -44,29 +69,212 @@ ADVANCED_VOCABULARY = {
     }
 }
 
-def analyze_vocabulary(text: str) -> Dict:
+def _inflections(lemma: str) -> Set[str]:
+    """Regular English inflections of ``lemma``: plural/third person, past and -ing forms."""
+    if " " in lemma or len(lemma) < 3:
+        return set()
+    last = lemma[-1]
+    if last == "y" and lemma[-2] not in VOWELS:
+        return {lemma[:-1] + "ies", lemma[:-1] + "ied", lemma + "ing"}
+    if last == "e":
+        return {lemma + "s", lemma + "d", lemma + "ing" if lemma.endswith("ee") else lemma[:-1] + "ing"}
+
+    forms = {lemma + "ed", lemma + "ing", lemma + "es" if lemma.endswith(("s", "x", "z", "ch", "sh")) else lemma + "s"}
+    # Consonant-vowel-consonant endings may double: "occur" -> "occurred"
+    if last not in VOWELS | {"w", "x", "y"} and lemma[-2] in VOWELS and lemma[-3] not in VOWELS:
+        forms.update({lemma + last + "ed", lemma + last + "ing"})
+    return forms
+
+
+def _read_lexicon(path: str) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    with open(path, encoding="utf-8") as lexicon:
+        for line in lexicon:
+            fields = [field.strip() for field in line.rstrip("\n").split("\t")]
+            if not fields[0] or fields[0].startswith("#"):
+                continue
+            level = fields[1].upper() if len(fields) > 1 and fields[1] else None
+            category = fields[2].lower() if len(fields) > 2 and fields[2] else None
+            yield fields[0].casefold(), level if level in LEVELS else None, category
+
+
+class VocabularyIndex:
+    """
+    Inverted index from word form to lemma, CEFR level and categories.
+
+    Built once from ADVANCED_VOCABULARY and, when present, the graded
+    lexicon at VOCAB_LEXICON_PATH. Every lemma is also indexed under its
+    regular inflections, so a lookup is one dict access per token. The
+    compiled index is pickled to VOCAB_INDEX_PATH and reloaded on later
+    starts until its sources change.
+    """
+
+    def __init__(self, entries: Dict[str, Tuple[Optional[str], Tuple[str, ...]]], forms: Dict[str, str]):
+        self.entries = entries
+        self.forms = forms
+
+    @classmethod
+    def build(cls, lexicon_path: Optional[str] = None) -> "VocabularyIndex":
+        levels: Dict[str, Optional[str]] = {}
+        categories: Dict[str, Set[str]] = {}
+        for category, words in ADVANCED_VOCABULARY.items():
+            for word in words:
+                levels.setdefault(word, None)
+                categories.setdefault(word, set()).add(category)
+        if lexicon_path:
+            for word, level, category in _read_lexicon(lexicon_path):
+                # Lists repeat words across levels; the lowest level is the one learners meet first
+                if levels.get(word) is None or (level and LEVELS.index(level) < LEVELS.index(levels[word])):
+                    levels[word] = level
+                categories.setdefault(word, set())
+                if category:
+                    categories[word].add(category)
+
+        entries = {word: (levels[word], tuple(sorted(categories[word]))) for word in levels}
+        forms = {}
+        for word in entries:
+            for form in _inflections(word):
+                if form not in entries:
+                    forms.setdefault(form, word)
+        forms.update({word: word for word in entries})
+        return cls(entries, forms)
+
+    def lemma(self, token: str) -> str:
+        """The indexed lemma for a normalized token, or the token itself if it is not indexed."""
+        return self.forms.get(token, token)
+
+    def lookup(self, token: str) -> Optional[Tuple[str, Optional[str], Tuple[str, ...]]]:
+        lemma = self.forms.get(token)
+        if lemma is None:
+            return None
+        level, categories = self.entries[lemma]
+        return lemma, level, categories
+
+
+def _source_signature(lexicon_path: Optional[str]) -> str:
+    signature = hashlib.sha256(repr(sorted((k, sorted(v)) for k, v in ADVANCED_VOCABULARY.items())).encode())
+    if lexicon_path:
+        stat = os.stat(lexicon_path)
+        signature.update(f"{os.path.abspath(lexicon_path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return signature.hexdigest()
+
+
+def load_vocabulary_index(lexicon_path: str = VOCAB_LEXICON_PATH, index_path: str = VOCAB_INDEX_PATH) -> VocabularyIndex:
+    """Load the compiled index from disk, building and saving it first if it is missing or stale."""
+    lexicon_path = lexicon_path if lexicon_path and os.path.exists(lexicon_path) else None
+    signature = _source_signature(lexicon_path)
+
+    if index_path and os.path.exists(index_path):
+        try:
+            with open(index_path, "rb") as stored:
+                saved_signature, entries, forms = pickle.load(stored)
+            if saved_signature == signature:
+                return VocabularyIndex(entries, forms)
+        except (OSError, pickle.UnpicklingError, ValueError, EOFError) as e:
+            logger.warning(f"Ignoring unreadable vocabulary index: {str(e)}")
+
+    index = VocabularyIndex.build(lexicon_path)
+    logger.info(f"Built vocabulary index: {len(index.entries)} lemmas, {len(index.forms)} forms")
+    if index_path:
+        try:
+            directory = os.path.dirname(index_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f"{index_path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as stored:
+                pickle.dump((signature, index.entries, index.forms), stored, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, index_path)
+        except OSError as e:
+            logger.warning(f"Could not save vocabulary index: {str(e)}")
+    return index
+
+
+_index: Optional[VocabularyIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_vocabulary_index() -> VocabularyIndex:
+    """The vocabulary index shared by this worker, loaded on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = load_vocabulary_index()
+    return _index
+
+
+async def load_vocabulary_index_async() -> VocabularyIndex:
+    """get_vocabulary_index for the event loop: a first load, or waiting on the warm-up's, runs on a thread."""
+    return _index if _index is not None else await asyncio.to_thread(get_vocabulary_index)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens; punctuation is dropped, so "Analyze." and "analyze," match."""
+    tokens = [token.replace("’", "'") for token in TOKEN_PATTERN.findall(text.casefold())]
+    return [token[:-2] if token.endswith("'s") else token for token in tokens]
+
+
+def lexical_diversity(lemmas: List[str], window: int = VOCAB_DIVERSITY_WINDOW) -> float:
+    """
+    Moving-average type-token ratio: the mean share of distinct lemmas over
+    every ``window``-word stretch, which unlike a plain ratio does not fall
+    as answers get longer. Shorter texts get their plain type-token ratio.
+    """
+    if not lemmas:
+        return 0.0
+    if len(lemmas) <= window:
+        return len(set(lemmas)) / len(lemmas)
+
+    counts = Counter(lemmas[:window])
+    total = len(counts)
+    for outgoing, incoming in zip(lemmas, lemmas[window:]):
+        counts[outgoing] -= 1
+        if not counts[outgoing]:
+            del counts[outgoing]
+        counts[incoming] += 1
+        total += len(counts)
+    return total / ((len(lemmas) - window + 1) * window)
+
+def analyze_vocabulary(text: str, index: Optional[VocabularyIndex] = None) -> Dict:
     """
     Analyze the vocabulary usage in the given text.
+
+    Built-in ADVANCED_VOCABULARY words count as advanced at any level;
+    words only in the graded lexicon count when their level is one of
+    ADVANCED_LEVELS. Every graded word adds to ``level_counts``.
     
     Args:
         text (str): The text to analyze
+        index (VocabularyIndex): Index to look words up in, the shared one by default
         
     Returns:
         Dict: Dictionary containing vocabulary analysis results
     """
-    # Convert text to lowercase and split into words
-    words = set(text.lower().split())
-    
+    index = index or get_vocabulary_index()
+    lemmas = [index.lemma(token) for token in tokenize(text)]
+
     # Initialize counters
     found_words: Dict[str, List[str]] = {category: [] for category in ADVANCED_VOCABULARY}
+    level_counts = {level: 0 for level in LEVELS}
     total_advanced_words = 0
-    
-    # Check each category
-    for category, word_set in ADVANCED_VOCABULARY.items():
-        for word in word_set:
-            if word in words:
-                found_words[category].append(word)
-                total_advanced_words += 1
+
+    # One lookup per distinct lemma
+    for lemma in dict.fromkeys(lemmas):
+        entry = index.lookup(lemma)
+        if entry is None:
+            continue
+        _, level, categories = entry
+        if level is not None:
+            level_counts[level] += 1
+        builtin = tuple(category for category in categories if lemma in ADVANCED_VOCABULARY.get(category, ()))
+        if builtin:
+            categories = builtin
+        elif level in ADVANCED_LEVELS:
+            categories = categories or ("advanced",)
+        else:
+            continue
+        for category in categories:
+            found_words.setdefault(category, []).append(lemma)
+            total_advanced_words += 1
     
     # Calculate vocabulary score
     # Base score of 50% if no advanced words are used
@@ -86,6 +294,8 @@ def analyze_vocabulary(text: str) -> Dict:
         "total_advanced_words": total_advanced_words,
         "advanced_words_by_category": found_words,
         "unique_advanced_words": list(all_found_words),
+        "level_counts": level_counts,
+        "lexical_diversity": round(lexical_diversity(lemmas), 3),
         "feedback": generate_vocabulary_feedback(total_advanced_words, vocabulary_score)
     }
 
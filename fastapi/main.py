@@ -1,15 +1,31 @@
-from fastapi import FastAPI, UploadFile, File, Body, HTTPException, Form
+from fastapi import FastAPI, UploadFile, File, Body, HTTPException, Form, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from routers import users
 from config.database import init_db
-from feedback.feedback_processor import FeedbackProcessor
+from feedback.feedback_processor import FeedbackProcessor, FEEDBACK_LLM_MODE, MAX_LATENCY_BUDGET
 from feedback.check_correctness import check_answer_correctness
 from feedback.ideal_answer import IdealAnswerGenerator
-from setupGeneration import generate_assessment_questions
+from setupGeneration import generate_assessment_questions, generate_bank_questions
+from questionBank import question_bank
 import logging
 import os
+import json
+import math
+import asyncio
 from audioProcessor import process_audio_file
-from typing import Dict, List
+from feedback.audio_ingest import release_artifact, prune_artifacts
+from feedback.dsp_executor import dsp_executor
+from uploadHandler import save_upload, UploadRejected, UploadLimitMiddleware
+from sessionStore import session_store
+from transcriptCache import transcript_cache
+from startupWarmup import STARTUP_WARM_UP, warm_up
+from feedback.llm_client import api_key_configured, close_client, usage_stats
+from feedback.llm_cache import llm_cache
+from feedback.llm_scheduler import llm_scheduler
+from feedback.circuit_breaker import breaker_stats
+from typing import Dict, List, Optional
 
 from dotenv import load_dotenv
 
@@ -23,13 +39,11 @@ app = FastAPI()
 
 API_FRONTEND_URL = os.getenv("API_FRONTEND_URL")
 
-class TempFileManager:
-    def __init__(self):
-        self.temp_file_path = ""
-
-temp_file_manager = TempFileManager()
 ideal_answer_generator = IdealAnswerGenerator()
 
+# Refuse oversized uploads before FastAPI spools the multipart body; added first so CORS wraps its 413
+app.add_middleware(UploadLimitMiddleware, paths={"/process-audio"})
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[API_FRONTEND_URL, "https://www.harshwardhan.tech", "https://plugin-live-hackathon-public.vercel.app"],
@@ -41,48 +55,142 @@ app.add_middleware(
 # Initialize FeedbackProcessor
 feedback_processor = FeedbackProcessor()
 
+@app.on_event("startup")
+async def start_warm_up():
+    # Spawn the DSP pool and load heavy modules without holding up startup
+    if STARTUP_WARM_UP:
+        app.state.warm_up = asyncio.create_task(asyncio.to_thread(warm_up))
+
+@app.on_event("shutdown")
+async def stop_dsp_workers():
+    dsp_executor.shutdown()
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    await close_client()
+
+@app.on_event("startup")
+async def start_session_sweeper():
+    # Every worker sweeps; deletes are atomic, and each worker drops its own cached artifacts
+    app.state.session_sweeper = asyncio.create_task(
+        session_store.run_sweeper(after_sweep=lambda: prune_artifacts(session_store.exists))
+    )
+
+@app.on_event("shutdown")
+async def stop_session_sweeper():
+    app.state.session_sweeper.cancel()
+
+@app.on_event("startup")
+async def start_question_refiller():
+    # Buckets that run low are topped up here instead of while a user waits; without a
+    # key every refill would fail, so requests fall back to the built-in questions instead
+    app.state.question_refiller = None
+    if api_key_configured():
+        app.state.question_refiller = asyncio.create_task(question_bank.run_refiller(generate_bank_questions))
+    else:
+        logger.warning("No LLM API key configured, question bank refiller not started")
+
+@app.on_event("shutdown")
+async def stop_question_refiller():
+    if app.state.question_refiller is not None:
+        app.state.question_refiller.cancel()
+
 @app.get("/", tags=["root"])
 async def read_root() -> dict:
     return {"message": "Welcome to your new project!"}
 
+@app.get("/cache-stats")
+async def cache_stats() -> dict:
+    # Each stats() counts rows in its sqlite file, so they run off the event loop
+    transcripts, llm, questions = await asyncio.gather(
+        asyncio.to_thread(transcript_cache.stats),
+        asyncio.to_thread(llm_cache.stats),
+        asyncio.to_thread(question_bank.stats)
+    )
+    return {"transcripts": transcripts, "llm": llm, "questions": questions}
+
+@app.get("/llm-stats")
+async def llm_stats() -> dict:
+    # Compare token spend and latency between FEEDBACK_LLM_MODE deployments
+    return {
+        "mode": FEEDBACK_LLM_MODE,
+        "usage": usage_stats(),
+        "scheduler": llm_scheduler.stats(),
+        "breakers": breaker_stats()
+    }
+
 @app.post("/process-audio") 
 async def process_audio(file: UploadFile = File(...), language: str = Form(default="English")):
+    session = None
     try:
-        # Create a temporary directory if it doesn't exist
-
-       
-        temp_dir = "temp_audio"
-        os.makedirs(temp_dir, exist_ok=True)
-        # Save the uploaded file temporarily
-        temp_file_path = os.path.join(temp_dir, file.filename)
+        # Each recording gets its own session directory, referenced later by /analyze-text
+        upload_name = "upload" + os.path.splitext(file.filename or "")[1]
+        session = session_store.create(filename=file.filename, language=language, upload_name=upload_name)
+        temp_file_path = session.upload_path
 
         logger.info(f"Saving audio file to {temp_file_path}")
 
-        
-        temp_file_manager.temp_file_path = temp_file_path
+        # Copy to disk in chunks, rejecting unsupported containers before anything is decoded
+        upload = await save_upload(file, temp_file_path)
 
-        with open(temp_file_path, "wb") as buffer:
-            contents = await file.read()
-            buffer.write(contents)
-        
-        # Process the audio file (now includes fluency analysis)
-        result = await process_audio_file(temp_file_path, language)
-        
-        # Clean up the temporary file
-        # os.remove(temp_file_path)
+        # A cached transcript for the same upload skips decoding; otherwise the recording is
+        # decoded once and transcription and pause analysis both reuse the artifact
+        result = await process_audio_file(
+            temp_file_path, language, recording_id=session.recording_id, content_hash=upload.content_hash
+        )
+
+        # Pauses (original timeline) and word timings stay server-side with the session,
+        # so any worker can serve /analyze-text
+        pauses = result.pop("pauses", None)
+        time_map = result.pop("time_map", None)
+        timing = result.pop("timing", None)
+        session_store.update(
+            session.recording_id,
+            content_hash=upload.content_hash,
+            size=upload.size,
+            pauses=pauses,
+            time_map=time_map,
+            timing=timing
+        )
         
         # Return the processing result (includes transcription and fluency data)
+        result["content_hash"] = upload.content_hash
+        result["recording_id"] = session.recording_id
         return result
+
+    except UploadRejected as e:
+        session_store.delete(session.recording_id)
+        logger.warning(f"Rejected upload {file.filename}: {str(e)}")
+        return JSONResponse(status_code=e.status_code, content={"status": "error", "message": str(e)})
         
     except Exception as e:
+        if session is not None:
+            release_artifact(session.recording_id)
+            session_store.delete(session.recording_id)
         logger.error(f"Error processing audio: {str(e)}")
         return {"status": "error", "message": str(e)}
 
+def parse_latency_budget(value) -> Optional[float]:
+    """The client's latency_budget in seconds, capped at MAX_LATENCY_BUDGET; None keeps the server default."""
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value <= 0:
+        raise HTTPException(
+            status_code=422,
+            detail="latency_budget must be a positive number of seconds"
+        )
+    return min(float(value), MAX_LATENCY_BUDGET)
+
 @app.post("/analyze-text")
 async def analyze_text(text_data: Dict = Body(...)):
+    # Optional seconds the client will wait; FEEDBACK_LATENCY_BUDGET otherwise
+    latency_budget = parse_latency_budget(text_data.get("latency_budget"))
     try:
         text = text_data.get("text", "")
         question = text_data.get("question", "")
+        recording_id = text_data.get("recording_id", "")
+        # Picks the filler lexicon; recordings keep the language they were uploaded with
+        language = text_data.get("language")
 
         logger.info(f"Analyzing text: {question} - {text}")
 
@@ -90,15 +198,30 @@ async def analyze_text(text_data: Dict = Body(...)):
             return {"error": "No text provided"}
         if not question:
             return {"error": "No Question provided"}
-            
-        # Process the text using our feedback processor
-        feedback = await feedback_processor.analyze_text(text,tempFileName=temp_file_manager.temp_file_path,question=question)
 
-        
+        session = session_store.get(recording_id)
+        if session is None:
+            # Without a live recording only the text-based analyses can run
+            logger.warning(f"No live recording session for id {recording_id!r}")
+            feedback = await feedback_processor.analyze_text(
+                text, question=question, latency_budget=latency_budget, language=language
+            )
+        else:
+            with session_store.lease(recording_id):
+                # Process the text using our feedback processor
+                feedback = await feedback_processor.analyze_text(
+                    text,
+                    tempFileName=session.upload_path,
+                    question=question,
+                    recording_id=recording_id,
+                    pause_analysis=session.metadata.get("pauses"),
+                    timing=session.metadata.get("timing"),
+                    latency_budget=latency_budget,
+                    language=language or session.metadata.get("language")
+                )
 
-        os.remove(temp_file_manager.temp_file_path)
-        
-        temp_file_manager.temp_file_path = ""
+            release_artifact(recording_id)
+            session_store.delete(recording_id)
 
         logger.info(f"Feedback: {feedback}")
 
@@ -108,6 +231,65 @@ async def analyze_text(text_data: Dict = Body(...)):
         logger.error(f"Error analyzing text: {str(e)}")
         return {"status": "error", "message": str(e)}
 
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+async def feedback_events(text: str, question: str, recording_id: str, latency_budget: Optional[float] = None,
+                          language: Optional[str] = None):
+    """Yield each feedback section as a server-sent event, then the full feedback as "summary"."""
+    try:
+        session = session_store.get(recording_id)
+        if session is None:
+            logger.warning(f"No live recording session for id {recording_id!r}")
+            async for section, result in feedback_processor.analyze_text_stream(
+                text, question=question, latency_budget=latency_budget, language=language
+            ):
+                yield sse_event(section, result)
+        else:
+            # The lease keeps the sweeper off the session for as long as the stream is open
+            with session_store.lease(recording_id):
+                async for section, result in feedback_processor.analyze_text_stream(
+                    text,
+                    tempFileName=session.upload_path,
+                    question=question,
+                    recording_id=recording_id,
+                    pause_analysis=session.metadata.get("pauses"),
+                    timing=session.metadata.get("timing"),
+                    latency_budget=latency_budget,
+                    language=language or session.metadata.get("language")
+                ):
+                    yield sse_event(section, result)
+
+            release_artifact(recording_id)
+            session_store.delete(recording_id)
+
+    except Exception as e:
+        logger.error(f"Error streaming feedback: {str(e)}")
+        yield sse_event("error", {"status": "error", "message": str(e)})
+
+@app.post("/analyze-text/stream")
+async def analyze_text_stream(text_data: Dict = Body(...)):
+    # Same request as /analyze-text; sections arrive as they finish instead of all at the end
+    text = text_data.get("text", "")
+    question = text_data.get("question", "")
+    recording_id = text_data.get("recording_id", "")
+    latency_budget = parse_latency_budget(text_data.get("latency_budget"))
+    language = text_data.get("language")
+
+    logger.info(f"Streaming analysis: {question} - {text}")
+
+    if not text:
+        return {"error": "No text provided"}
+    if not question:
+        return {"error": "No Question provided"}
+
+    return StreamingResponse(
+        feedback_events(text, question, recording_id, latency_budget, language),
+        media_type="text/event-stream",
+        # Stop proxies from buffering the events until the stream closes
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/check-answer")
 async def check_answer(data: Dict = Body(...)):
     try:
@@ -121,7 +303,7 @@ async def check_answer(data: Dict = Body(...)):
             )
             
         # Check answer correctness and get feedback
-        result = check_answer_correctness(question, answer)
+        result = await check_answer_correctness(question, answer)
         return result
         
     except Exception as e:
@@ -132,9 +314,11 @@ async def check_answer(data: Dict = Body(...)):
         )
 
 @app.post("/generate-questions")
-async def generate_questions(setup_data: Dict = Body(...)) -> Dict[str, List[str]]:
+async def generate_questions(setup_data: Dict = Body(...),
+                             x_user_email: Optional[str] = Header(default=None)) -> Dict[str, List[str]]:
     try:
-        questions = await generate_assessment_questions(setup_data)
+        # The user's email lets the question bank avoid repeating questions they have had
+        questions = await generate_assessment_questions(setup_data, user=x_user_email)
         return {"questions": questions}
         
     except Exception as e:
@@ -167,4 +351,30 @@ async def get_ideal_answer(data: Dict = Body(...)):
             detail=f"Failed to generate ideal answer: {str(e)}"
         )
 
+async def ideal_answer_events(question: str, user_answer: str):
+    """Yield the ideal answer's tokens as server-sent events, then the full result as "done"."""
+    try:
+        async for event, data in ideal_answer_generator.stream_ideal_answer(question, user_answer):
+            yield sse_event(event, data)
+    except Exception as e:
+        logger.error(f"Error streaming ideal answer: {str(e)}")
+        yield sse_event("error", {"status": "error", "message": f"Failed to generate ideal answer: {str(e)}"})
+
+@app.post("/get-ideal-answer/stream")
+async def get_ideal_answer_stream(data: Dict = Body(...)):
+    question = data.get("question", "")
+    user_answer = data.get("answer", "")
+
+    if not question or not user_answer:
+        raise HTTPException(
+            status_code=400,
+            detail="Both question and user answer are required"
+        )
+
+    return StreamingResponse(
+        ideal_answer_events(question, user_answer),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 app.include_router(users.router, prefix="/api/users", tags=["users"])
\ No newline at end of file
@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import random
+import sqlite3
+import asyncio
+import hashlib
+import logging
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+QUESTION_BANK_PATH = os.getenv("QUESTION_BANK_PATH", os.path.join("cache", "question_bank.sqlite3"))
+# A bucket with fewer questions than this is refilled in the background
+QUESTION_BANK_MIN_SIZE = int(os.getenv("QUESTION_BANK_MIN_SIZE", "30"))
+# Buckets stop growing here, even for users who have seen every question
+QUESTION_BANK_MAX_SIZE = int(os.getenv("QUESTION_BANK_MAX_SIZE", "200"))
+# Questions asked of the model per refill request
+QUESTION_BANK_BATCH = int(os.getenv("QUESTION_BANK_BATCH", "10"))
+# Seconds between background checks for low buckets
+QUESTION_BANK_REFILL_INTERVAL = int(os.getenv("QUESTION_BANK_REFILL_INTERVAL", "300"))
+# Only buckets requested within this many seconds are kept topped up
+QUESTION_BANK_ACTIVE_SECONDS = int(os.getenv("QUESTION_BANK_ACTIVE_SECONDS", str(7 * 24 * 60 * 60)))
+
+BUCKET_FIELDS = ("questionType", "topic", "difficulty", "language")
+
+
+def question_bucket_key(setup: Dict) -> str:
+    """Key a bucket by question type, topic, difficulty and language, ignoring case and spacing."""
+    return json.dumps(
+        [" ".join(str(setup.get(field, "")).split()).casefold() for field in BUCKET_FIELDS],
+        ensure_ascii=False
+    )
+
+
+def _user_key(user: str) -> str:
+    """Served history is keyed by a hash, so the bank never stores the client's identifier."""
+    return hashlib.sha256(user.strip().casefold().encode("utf-8")).hexdigest()
+
+
+class QuestionBank:
+    """
+    Persistent bank of generated assessment questions.
+
+    Questions are bucketed by (questionType, topic, difficulty, language)
+    and live in SQLite, shared by every worker on the host. ``sample``
+    serves a user the questions they have not been given yet, then the
+    ones they saw longest ago. Buckets that run low are topped up by
+    ``run_refiller`` in the background, so requests never wait on the
+    model unless their bucket is still empty. Users are recorded only as
+    a hash of their identifier.
+    """
+
+    def __init__(self, path: str = QUESTION_BANK_PATH, min_size: int = QUESTION_BANK_MIN_SIZE,
+                 max_size: int = QUESTION_BANK_MAX_SIZE, batch: int = QUESTION_BANK_BATCH):
+        self.path = path
+        self.min_size = min_size
+        self.max_size = max_size
+        self.batch = batch
+        self.served = 0
+        self.refills = 0
+        self._pending: Dict[str, Dict] = {}
+        self._wake: Optional[asyncio.Event] = None
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS buckets (
+                    key TEXT PRIMARY KEY,
+                    setup TEXT NOT NULL,
+                    last_requested REAL NOT NULL
+                )"""
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS questions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    bucket TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    UNIQUE (bucket, question)
+                )"""
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS served (
+                    user TEXT NOT NULL,
+                    question_id INTEGER NOT NULL,
+                    served_at REAL NOT NULL,
+                    PRIMARY KEY (user, question_id)
+                )"""
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def size(self, setup: Dict) -> int:
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM questions WHERE bucket = ?", (question_bucket_key(setup),)
+            ).fetchone()[0]
+
+    def add(self, setup: Dict, questions: List[str]) -> int:
+        """Store questions in the setup's bucket, skipping ones it already has. Returns how many were new."""
+        key = question_bucket_key(setup)
+        now = time.time()
+        with self._connect() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO questions (bucket, question, created_at) VALUES (?, ?, ?)",
+                [(key, question, now) for question in questions]
+            )
+            return conn.total_changes - before
+
+    async def sample(self, setup: Dict, count: int, user: Optional[str] = None) -> List[str]:
+        """
+        Pick up to ``count`` questions from the setup's bucket.
+
+        With a user, questions they have not been served come first, in
+        random order, followed by the ones served to them longest ago; the
+        picked questions are recorded as served. Without one the pick is
+        uniformly random. A bucket that runs low is queued for a refill.
+        The database work runs on a thread.
+        """
+        questions, low = await asyncio.to_thread(self._sample, setup, count, _user_key(user) if user else None)
+        self.served += len(questions)
+        if low:
+            self.request_refill(setup)
+        return questions
+
+    def _sample(self, setup: Dict, count: int, user: Optional[str]) -> Tuple[List[str], bool]:
+        key = question_bucket_key(setup)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, setup, last_requested) VALUES (?, ?, ?)",
+                (key, json.dumps({field: setup.get(field) for field in BUCKET_FIELDS}, ensure_ascii=False), now)
+            )
+            if user:
+                rows = conn.execute(
+                    """SELECT q.id, q.question, s.served_at IS NULL FROM questions q
+                       LEFT JOIN served s ON s.question_id = q.id AND s.user = ?
+                       WHERE q.bucket = ?
+                       ORDER BY s.served_at IS NOT NULL, s.served_at, RANDOM()""",
+                    (user, key)
+                ).fetchall()
+                picked = rows[:count]
+                conn.executemany(
+                    "INSERT OR REPLACE INTO served (user, question_id, served_at) VALUES (?, ?, ?)",
+                    [(user, question_id, now) for question_id, _, _ in picked]
+                )
+                unseen = sum(1 for _, _, is_unseen in rows[count:] if is_unseen)
+            else:
+                rows = conn.execute("SELECT id, question FROM questions WHERE bucket = ?", (key,)).fetchall()
+                picked = random.sample(rows, min(count, len(rows)))
+                unseen = len(rows)
+
+        # Refill before the bucket, or this user's unseen share of it, runs out
+        low = len(rows) < self.min_size or (unseen < count and len(rows) < self.max_size)
+        return [row[1] for row in picked], low
+
+    def request_refill(self, setup: Dict) -> None:
+        """Queue a bucket for the background refiller; must be called on the event loop."""
+        self._pending[question_bucket_key(setup)] = setup
+        if self._wake is not None:
+            self._wake.set()
+
+    def _low_buckets(self) -> Dict[str, Dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                """SELECT b.key, b.setup FROM buckets b
+                   LEFT JOIN questions q ON q.bucket = b.key
+                   WHERE b.last_requested >= ?
+                   GROUP BY b.key HAVING COUNT(q.id) < ?""",
+                (time.time() - QUESTION_BANK_ACTIVE_SECONDS, self.min_size)
+            ).fetchall()
+        return {key: json.loads(setup) for key, setup in rows}
+
+    async def refill(self, setup: Dict, generate: Callable[[Dict, int], Awaitable[List[str]]]) -> int:
+        """Ask ``generate`` for a batch of questions for one bucket and store them."""
+        if await asyncio.to_thread(self.size, setup) >= self.max_size:
+            return 0
+        questions = await generate(setup, self.batch)
+        added = await asyncio.to_thread(self.add, setup, questions)
+        self.refills += 1
+        logger.info(f"Added {added} of {len(questions)} generated questions to bucket {question_bucket_key(setup)}")
+        return added
+
+    async def run_refiller(self, generate: Callable[[Dict, int], Awaitable[List[str]]],
+                           interval: int = QUESTION_BANK_REFILL_INTERVAL) -> None:
+        """
+        Top up low buckets forever; meant to run as a background task on each worker.
+
+        Wakes when ``request_refill`` queues a bucket and otherwise every
+        ``interval`` seconds to check all recently requested buckets. Each
+        bucket gets at most one batch per pass.
+        """
+        self._wake = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+            try:
+                buckets = await asyncio.to_thread(self._low_buckets)
+            except sqlite3.Error as e:
+                logger.error(f"Error reading question bank: {str(e)}")
+                buckets = {}
+            buckets.update(self._pending)
+            self._pending.clear()
+
+            for setup in buckets.values():
+                try:
+                    await self.refill(setup, generate)
+                except Exception as e:
+                    logger.error(f"Error refilling question bank: {str(e)}")
+
+    def stats(self) -> Dict:
+        try:
+            with self._connect() as conn:
+                buckets, questions = conn.execute(
+                    "SELECT COUNT(DISTINCT bucket), COUNT(*) FROM questions"
+                ).fetchone()
+        except sqlite3.Error:
+            buckets, questions = None, None
+
+        return {
+            "buckets": buckets,
+            "questions": questions,
+            "served": self.served,
+            "refills": self.refills,
+            "pending_refills": len(self._pending),
+            "min_size": self.min_size,
+            "max_size": self.max_size
+        }
+
+
+question_bank = QuestionBank()
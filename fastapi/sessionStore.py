@@ -0,0 +1,202 @@
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SESSION_DIR = os.getenv("SESSION_DIR", "temp_audio")
+# Seconds a recording is kept after its last use
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "1800"))
+SESSION_SWEEP_INTERVAL = int(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+# A lease older than this belongs to a crashed worker and no longer protects a session
+SESSION_LEASE_SECONDS = int(os.getenv("SESSION_LEASE_SECONDS", "600"))
+
+METADATA_FILE = "session.json"
+LEASE_PREFIX = "lease-"
+RECORDING_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class RecordingSession:
+    def __init__(self, recording_id: str, directory: str, metadata: Dict):
+        self.recording_id = recording_id
+        self.directory = directory
+        self.metadata = metadata
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @property
+    def upload_path(self) -> Optional[str]:
+        upload_name = self.metadata.get("upload_name")
+        return self.path(upload_name) if upload_name else None
+
+
+class SessionStore:
+    """
+    Recording sessions shared between /process-audio and /analyze-text.
+
+    Each recording gets its own directory under SESSION_DIR named by a random
+    id, so concurrent users never see each other's audio. All state lives on
+    disk and every mutation is an atomic rename, which keeps the store safe
+    across several uvicorn workers on the same host. A session expires
+    SESSION_TTL_SECONDS after it was last touched; workers hold a lease file
+    while they analyze a recording so the sweeper never deletes audio in use.
+    """
+
+    def __init__(self, root: str = SESSION_DIR, ttl_seconds: int = SESSION_TTL_SECONDS,
+                 lease_seconds: int = SESSION_LEASE_SECONDS):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        os.makedirs(self.root, exist_ok=True)
+
+    def _directory(self, recording_id: str) -> str:
+        if not RECORDING_ID_PATTERN.match(recording_id or ""):
+            raise ValueError(f"Invalid recording id: {recording_id!r}")
+        return os.path.join(self.root, recording_id)
+
+    def _write_metadata(self, directory: str, metadata: Dict) -> None:
+        tmp_path = os.path.join(directory, f".{METADATA_FILE}.{uuid.uuid4().hex}")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(metadata, f)
+        os.replace(tmp_path, os.path.join(directory, METADATA_FILE))
+
+    def create(self, **metadata) -> RecordingSession:
+        recording_id = uuid.uuid4().hex
+        directory = self._directory(recording_id)
+        os.makedirs(directory)
+
+        metadata = {**metadata, "created_at": time.time()}
+        self._write_metadata(directory, metadata)
+        return RecordingSession(recording_id, directory, metadata)
+
+    def update(self, recording_id: str, **fields) -> RecordingSession:
+        session = self.get(recording_id)
+        if session is None:
+            raise KeyError(recording_id)
+
+        session.metadata.update(fields)
+        self._write_metadata(session.directory, session.metadata)
+        return session
+
+    def get(self, recording_id: str) -> Optional[RecordingSession]:
+        """Load a live session and refresh its expiry, or None if missing or expired."""
+        try:
+            directory = self._directory(recording_id)
+        except ValueError:
+            return None
+
+        metadata_path = os.path.join(directory, METADATA_FILE)
+        try:
+            if time.time() - os.path.getmtime(metadata_path) > self.ttl_seconds:
+                return None
+            with open(metadata_path, encoding="utf-8") as f:
+                metadata = json.load(f)
+            os.utime(metadata_path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        return RecordingSession(recording_id, directory, metadata)
+
+    def exists(self, recording_id: str) -> bool:
+        try:
+            return os.path.isdir(self._directory(recording_id))
+        except ValueError:
+            return False
+
+    def delete(self, recording_id: str) -> bool:
+        """Remove a session; safe to race with other workers deleting the same one."""
+        try:
+            directory = self._directory(recording_id)
+        except ValueError:
+            return False
+
+        # Rename first so no other worker can open a half-deleted session
+        trash = os.path.join(self.root, f".trash-{recording_id}-{uuid.uuid4().hex}")
+        try:
+            os.rename(directory, trash)
+        except FileNotFoundError:
+            return False
+        shutil.rmtree(trash, ignore_errors=True)
+        return True
+
+    @contextmanager
+    def lease(self, recording_id: str):
+        """Mark a session as in use for the duration of the block."""
+        lease_path = os.path.join(self._directory(recording_id), f"{LEASE_PREFIX}{uuid.uuid4().hex}")
+        open(lease_path, "w").close()
+        try:
+            yield
+        finally:
+            try:
+                os.remove(lease_path)
+            except FileNotFoundError:
+                pass
+
+    def _is_leased(self, directory: str, now: float) -> bool:
+        for name in os.listdir(directory):
+            if name.startswith(LEASE_PREFIX):
+                try:
+                    if now - os.path.getmtime(os.path.join(directory, name)) < self.lease_seconds:
+                        return True
+                except FileNotFoundError:
+                    continue
+        return False
+
+    def sweep(self) -> List[str]:
+        """
+        Delete expired sessions and leftover trash.
+
+        Returns:
+            List[str]: Recording ids removed by this call
+        """
+        now = time.time()
+        removed = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(".trash-"):
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+            if not RECORDING_ID_PATTERN.match(name) or not os.path.isdir(path):
+                continue
+
+            try:
+                metadata_path = os.path.join(path, METADATA_FILE)
+                last_used = os.path.getmtime(metadata_path) if os.path.exists(metadata_path) else os.path.getmtime(path)
+                if now - last_used <= self.ttl_seconds or self._is_leased(path, now):
+                    continue
+            except FileNotFoundError:
+                continue
+
+            if self.delete(name):
+                removed.append(name)
+
+        if removed:
+            logger.info(f"Swept {len(removed)} expired recording sessions")
+        return removed
+
+    async def run_sweeper(self, interval: int = SESSION_SWEEP_INTERVAL, after_sweep=None) -> None:
+        """Sweep forever; meant to run as a background task on each worker."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.sweep)
+                if after_sweep is not None:
+                    after_sweep()
+            except Exception as e:
+                logger.error(f"Error sweeping sessions: {str(e)}")
+
+
+session_store = SessionStore()
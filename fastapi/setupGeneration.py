@@ -1,10 +1,12 @@
-import os
-import json
+import re
+import asyncio
 import logging
-from typing import Dict, List
-from groq import Groq
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 from dotenv import load_dotenv
+from feedback.llm_client import chat_completion
+from feedback.llm_scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+from questionBank import question_bank
 
 # Load environment variables
 load_dotenv()
@@ -59,8 +61,8 @@ def generate_prompt(setup: AssessmentSetup) -> str:
 
     Only include the numbered questions, one per line. No additional text or formatting."""
 
-def extract_questions_from_text(text: str, num_questions: int) -> List[str]:
-    """Extract questions from text response, handling different formats."""
+def parse_questions(text: str) -> List[str]:
+    """Split a model response into questions, dropping numbering and formatting."""
     # Remove any markdown formatting
     clean_text = text.replace("```", "").strip()
     
@@ -81,80 +83,52 @@ def extract_questions_from_text(text: str, num_questions: int) -> List[str]:
                 r'^Question\s*\d+[:\.]\s*'  # Matches "Question 1:" or "Question 1."
             ]
             for pattern in patterns:
-                import re
                 cleaned = re.sub(pattern, '', cleaned, flags=re.IGNORECASE)
             
             cleaned = cleaned.strip()
             if cleaned:
                 questions.append(cleaned)
     
-    # Ensure we have exactly the number of questions requested
-    questions = questions[:num_questions]
-    while len(questions) < num_questions:
-        questions.append(get_fallback_question(setup.language))
-    
     return questions
 
-def generate_questions(setup: AssessmentSetup) -> List[str]:
-    client = Groq(
-        api_key=os.getenv("Grok_API_KEY"),
-    )
-
+async def request_questions(setup: AssessmentSetup, priority: int = PRIORITY_BACKGROUND) -> str:
+    """Ask the model for setup.numberOfQuestions questions and return its raw response."""
     prompt = generate_prompt(setup)
     
-    try:
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": f"""You are an expert {setup.language} language assessment creator. 
-                    Generate questions that are clear, engaging, and appropriate for the specified level.
-                    All questions must be in {setup.language}.
-                    Each question should be on a new line and numbered.
-                    Do not include any additional text or formatting."""
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            model="llama-3.2-3b-preview",
-            temperature=0.7,
-            max_tokens=2000,
-            top_p=1,
-            stream=False
-        )
-        
-        response_content = chat_completion.choices[0].message.content
-        
-        # Extract questions from the response
-        questions = extract_questions_from_text(response_content, setup.numberOfQuestions)
-        
-        if not questions:
-            logger.warning("No questions extracted, using fallback questions")
-            return get_fallback_questions(setup.numberOfQuestions, setup.language)
-        
-        return questions
-            
-    except Exception as e:
-        logger.error(f"Error generating questions: {str(e)}")
-        return get_fallback_questions(setup.numberOfQuestions, setup.language)
+    return await chat_completion(
+        messages=[
+            {
+                "role": "system",
+                "content": f"""You are an expert {setup.language} language assessment creator. 
+                Generate questions that are clear, engaging, and appropriate for the specified level.
+                All questions must be in {setup.language}.
+                Each question should be on a new line and numbered.
+                Do not include any additional text or formatting."""
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        model="llama-3.2-3b-preview",
+        temperature=0.7,
+        max_tokens=2000,
+        top_p=1,
+        stream=False,
+        # Sampled at temperature 0.7 so users get fresh questions; a cached set would repeat
+        cache=False,
+        priority=priority
+    )
 
-def get_fallback_question(language: str = "English") -> str:
-    fallback_questions = {
-        "English": "Could you describe a challenging situation you've faced and how you handled it?",
-        "Hindi": "क्या आप एक चुनौतीपूर्ण स्थिति का वर्णन कर सकते हैं जिसका आपने सामना किया और आपने इसे कैसे संभाला?",
-        "Bengali": "আপনি এমন একটি চ্যালেঞ্জিং পরিস্থিতির বর্ণনা করতে পারবেন যার সম্মুখীন হয়েছিলেন এবং কীভাবে তা মোকাবেলা করেছিলেন?",
-        "Gujarati": "શું તમે એવી કોઈ પડકારજનક પરિસ્થિતિનું વર્ણન કરી શકશો જેનો તમે સામનો કર્યો હતો અને તેને કેવી રીતે હેન્ડલ કરી હતી?",
-        "Kannada": "ನೀವು ಎದುರಿಸಿದ ಸವಾಲಿನ ಪರಿಸ್ಥಿತಿಯನ್ನು ಮತ್ತು ನೀವು ಅದನ್ನು ಹೇಗೆ ನಿಭಾಯಿಸಿದ್ದೀರಿ ಎಂಬುದನ್ನು ವಿವರಿಸಬಹುದೇ?",
-        "Malayalam": "നിങ്ങൾ നേരിട്ട ഒരു വെല്ലുവിളി നിറഞ്ഞ സാഹചര്യവും അത് എങ്ങനെ കൈകാര്യം ചെയ്തുവെന്നും വിവരിക്കാമോ?",
-        "Marathi": "तुम्ही सामोरे गेलेल्या एखाद्या आव्हानात्मक परिस्थितीचे वर्णन करू शकाल का आणि तुम्ही त्याचे व्यवस्थापन कसे केले?",
-        "Punjabi": "ਕੀ ਤੁਸੀਂ ਕਿਸੇ ਚੁਣੌਤੀਪੂਰਨ ਸਥਿਤੀ ਦਾ ਵਰਣਨ ਕਰ ਸਕਦੇ ਹੋ ਜਿਸਦਾ ਤੁਸੀਂ ਸਾਹਮਣਾ ਕੀਤਾ ਅਤੇ ਇਸ ਨਾਲ ਕਿਵੇਂ ਨਜਿੱਠਿਆ?",
-        "Tamil": "நீங்கள் எதிர்கொண்ட ஒரு சவாலான சூழ்நிலையை விவரிக்க முடியுமா, அதை எப்படி கையாண்டீர்கள்?",
-        "Telugu": "మీరు ఎదుర్కొన్న ఒక సవాలు నిండిన పరిస్థితిని మరియు దానిని మీరు ఎలా నిర్వహించారో వివరించగలరా?"
-        }
-
-    return fallback_questions.get(language, fallback_questions["English"])
+async def generate_bank_questions(setup: Dict, count: int, priority: int = PRIORITY_BACKGROUND) -> List[str]:
+    """
+    Generate questions for the question bank.
+
+    Failures raise and short responses are not padded, so fallback
+    questions never end up in the bank.
+    """
+    bucket_setup = AssessmentSetup(**{**setup, "numberOfQuestions": count})
+    return parse_questions(await request_questions(bucket_setup, priority=priority))[:count]
 
 def get_fallback_questions(count: int, language: str = "English") -> List[str]:
 
@@ -237,11 +211,32 @@ def get_fallback_questions(count: int, language: str = "English") -> List[str]:
     selected_questions = fallback_questions.get(language, fallback_questions["English"])
     return selected_questions[:count]
 
-async def generate_assessment_questions(setup: Dict) -> List[str]:
+async def generate_assessment_questions(setup: Dict, user: Optional[str] = None) -> List[str]:
     """
     Main function to generate assessment questions based on setup parameters.
+
+    Questions are served from the question bank, avoiding ones this user
+    has already been given. The model is only called while the user waits
+    when their bucket does not yet hold enough questions; otherwise the
+    bank's background refiller keeps it topped up.
     """
     assessment_setup = AssessmentSetup(**setup)
-    questions = generate_questions(assessment_setup)
+    bucket_setup = assessment_setup.model_dump()
+    count = assessment_setup.numberOfQuestions
+
+    if await asyncio.to_thread(question_bank.size, bucket_setup) < count:
+        try:
+            await question_bank.refill(
+                bucket_setup,
+                lambda bucket, batch: generate_bank_questions(bucket, max(batch, count), priority=PRIORITY_INTERACTIVE)
+            )
+        except Exception as e:
+            logger.error(f"Error filling question bank: {str(e)}")
+
+    questions = await question_bank.sample(bucket_setup, count, user)
+    if len(questions) < count:
+        logger.warning("Question bank is short, padding with fallback questions")
+        fallback = [q for q in get_fallback_questions(count, assessment_setup.language) if q not in questions]
+        questions += fallback[:count - len(questions)]
     
-    return questions
\ No newline at end of file
+    return questions
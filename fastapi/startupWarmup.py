@@ -0,0 +1,52 @@
+import os
+import time
+import logging
+import importlib
+from dotenv import load_dotenv
+from feedback.dsp_executor import dsp_executor
+from feedback.llm_client import get_client
+from feedback.vocab_check import get_vocabulary_index
+
+# Load environment variables
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Load heavy modules in the background after startup instead of on the first request
+STARTUP_WARM_UP = os.getenv("STARTUP_WARM_UP", "true").lower() == "true"
+
+# Modules the web process itself needs later: numpy and the pause/VAD modules
+# to unpickle artifacts from the DSP pool, librosa for the in-process fallback
+WARM_MODULES = ("numpy", "feedback.get_pause", "feedback.vad", "librosa")
+
+
+def warm_up() -> float:
+    """
+    Do the slow one-off work that importing the app no longer does.
+
+    Spawns the DSP workers, imports the DSP modules in this process, loads
+    the vocabulary index and creates the shared Groq client. Meant to run on
+    a thread once the server is already accepting requests; a request that
+    needs any of these before the warm-up reaches it simply loads it itself.
+
+    Returns:
+        float: Seconds the warm-up took
+    """
+    started = time.perf_counter()
+
+    dsp_executor.start(wait_ready=False)
+    for name in WARM_MODULES:
+        importlib.import_module(name)
+    get_vocabulary_index()
+
+    try:
+        get_client()
+    except ValueError as e:
+        logger.warning(f"Skipping Groq client warm-up: {str(e)}")
+
+    dsp_executor.start()
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Warm-up finished in {elapsed:.2f}s")
+    return elapsed
@@ -0,0 +1,94 @@
+from feedback import circuit_breaker
+from feedback.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def breaker(**kwargs):
+    return CircuitBreaker("test", **{"window": 10, "min_calls": 4, "error_rate": 0.5, "p95_seconds": 5,
+                                     "open_seconds": 30, **kwargs})
+
+
+def trip(b):
+    for _ in range(4):
+        assert b.allow()
+        b.record(False, 0.1)
+
+
+def test_stays_closed_until_enough_calls_fail():
+    b = breaker()
+    for ok in (False, False, True):
+        b.allow()
+        b.record(ok, 0.1)
+    assert b.state == CLOSED
+    b.allow()
+    b.record(False, 0.1)
+    assert b.state == OPEN
+    assert b.trips == 1
+
+
+def test_slow_calls_trip_on_p95():
+    b = breaker()
+    for _ in range(4):
+        b.allow()
+        b.record(True, 6.0)
+    assert b.state == OPEN
+
+
+def test_open_breaker_rejects_until_one_probe_is_allowed(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    b = breaker()
+    trip(b)
+    assert not b.allow()
+    assert b.rejected == 1
+
+    now[0] += 30
+    assert b.allow()
+    assert b.state == HALF_OPEN
+    # Only one probe at a time
+    assert not b.allow()
+
+
+def test_successful_probe_closes_with_a_fresh_window(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    b = breaker()
+    trip(b)
+    now[0] += 30
+    assert b.allow()
+    b.record(True, 0.1)
+    assert b.state == CLOSED
+    assert b.stats()["calls"] == 0
+
+
+def test_failed_probe_opens_again(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    b = breaker()
+    trip(b)
+    now[0] += 30
+    assert b.allow()
+    b.record(False, 0.1)
+    assert b.state == OPEN
+    assert b.trips == 2
+    assert not b.allow()
+
+
+def test_abandoned_probe_lets_another_probe_through(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    b = breaker()
+    trip(b)
+    now[0] += 30
+    assert b.allow()
+    b.abandon()
+    assert b.state == HALF_OPEN
+    assert b.allow()
+
+
+def test_abandon_records_nothing():
+    b = breaker()
+    for _ in range(10):
+        b.allow()
+        b.abandon()
+    assert b.state == CLOSED
+    assert b.stats()["calls"] == 0
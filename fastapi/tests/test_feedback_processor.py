@@ -0,0 +1,21 @@
+import asyncio
+
+import feedback.feedback_processor as feedback_processor
+from feedback.feedback_processor import FeedbackProcessor
+
+
+def test_failed_chunk_marks_the_merged_report_truncated(monkeypatch):
+    monkeypatch.setattr(feedback_processor, "chunk_text", lambda text: [(0, "I goes home."), (13, "He go too.")])
+    processor = FeedbackProcessor()
+
+    async def chunk_errors(chunk, prompt, schema):
+        if chunk.startswith("He"):
+            raise RuntimeError("upstream error")
+        return {"error_count": 1, "errors": [{"word": "goes", "suggestion": "go"}]}
+
+    monkeypatch.setattr(processor, "_chunk_errors", chunk_errors)
+    report = asyncio.run(processor._grammar_report("I goes home. He go too."))
+    assert report["error_count"] == 1
+    assert report["errors"][0]["position"] == 2
+    assert report["truncated"] is True
+    assert report["failed_chunks"] == 1
@@ -0,0 +1,29 @@
+from feedback.fillers import get_filler_matcher, tokenize
+
+
+def fillers(text, language=None):
+    return [text[start:end] for start, end in get_filler_matcher(language).find(tokenize(text), text)]
+
+
+def test_hesitations_match_drawn_out():
+    assert fillers("Ummm I think, uhh, it works", "English") == ["Ummm", "uhh"]
+
+
+def test_phrases_match_word_for_word():
+    assert fillers("It is kind of you know hard", "English") == ["kind of", "you know"]
+
+
+def test_drawn_out_phrase_words_are_not_fillers():
+    assert fillers("That kind off thing, you knoww", "English") == []
+
+
+def test_single_letter_marker_inside_a_sentence_is_not_a_filler():
+    assert fillers("मैं आ गया", "Hindi") == []
+    assert fillers("আমি ম বলেছি", "Bengali") == []
+    assert fillers("நான் ம சொன்னேன்", "Tamil") == []
+
+
+def test_single_letter_marker_counts_set_off_repeated_or_drawn_out():
+    assert fillers("आ, मुझे लगता है", "Hindi") == ["आ"]
+    assert fillers("मुझे आ आ लगता है", "Hindi") == ["आ", "आ"]
+    assert fillers("मुझे आआ लगता है", "Hindi") == ["आआ"]
@@ -0,0 +1,73 @@
+import numpy as np
+
+from feedback.get_pause import HOP_LENGTH, detect_pauses, detect_pauses_batch
+
+SAMPLE_RATE = 22050
+
+
+def loop_pauses(envelope, sample_rate=SAMPLE_RATE, hop_length=HOP_LENGTH, threshold_seconds=0.8,
+                amplitude_threshold=0.015):
+    """The frame-by-frame loop get_pause_count used before it was vectorized."""
+    times = np.arange(len(envelope)) * hop_length / sample_rate
+    pauses = []
+    in_pause = False
+    pause_start = 0
+    for i in range(len(envelope)):
+        if envelope[i] < amplitude_threshold:
+            if not in_pause:
+                pause_start = times[i]
+                in_pause = True
+        elif in_pause:
+            if times[i] - pause_start >= threshold_seconds:
+                pauses.append({'start': pause_start, 'end': times[i], 'duration': times[i] - pause_start})
+            in_pause = False
+    if in_pause and times[-1] - pause_start >= threshold_seconds:
+        pauses.append({'start': pause_start, 'end': times[-1], 'duration': times[-1] - pause_start})
+    return pauses
+
+
+def random_envelope(rng, n_frames):
+    # Alternate loud and quiet stretches of random length so pauses of every size occur
+    envelope = []
+    quiet = rng.random() < 0.5
+    while len(envelope) < n_frames:
+        run = int(rng.integers(1, 120))
+        envelope.extend(rng.uniform(0, 0.01, run) if quiet else rng.uniform(0.02, 1, run))
+        quiet = not quiet
+    return np.array(envelope[:n_frames])
+
+
+def assert_same_pauses(result, expected):
+    assert result['total_pauses'] == len(expected)
+    for pause, reference in zip(result['pause_details'], expected):
+        for field in ('start', 'end', 'duration'):
+            assert np.isclose(pause[field], reference[field])
+    assert np.isclose(result['total_pause_duration'], sum(pause['duration'] for pause in expected))
+
+
+def test_vectorized_pauses_match_the_loop():
+    rng = np.random.default_rng(0)
+    for n_frames in (1, 2, 37, 500, 2000):
+        for _ in range(20):
+            envelope = random_envelope(rng, n_frames)
+            assert_same_pauses(detect_pauses(envelope, SAMPLE_RATE), loop_pauses(envelope))
+
+
+def test_pause_running_to_the_end_is_closed_at_the_last_frame():
+    envelope = np.concatenate([np.ones(10), np.zeros(100)])
+    result = detect_pauses(envelope, SAMPLE_RATE)
+    assert_same_pauses(result, loop_pauses(envelope))
+    assert np.isclose(result['pause_details'][-1]['end'], 109 * HOP_LENGTH / SAMPLE_RATE)
+
+
+def test_empty_envelope_has_no_pauses():
+    assert detect_pauses(np.array([]), SAMPLE_RATE)['total_pauses'] == 0
+
+
+def test_batch_matches_one_at_a_time_for_ragged_envelopes():
+    rng = np.random.default_rng(1)
+    envelopes = [random_envelope(rng, n_frames) for n_frames in (300, 50, 1200, 1200, 7)]
+    results = detect_pauses_batch(envelopes, SAMPLE_RATE)
+    assert len(results) == len(envelopes)
+    for result, envelope in zip(results, envelopes):
+        assert_same_pauses(result, loop_pauses(envelope))
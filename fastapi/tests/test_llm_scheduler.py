@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from feedback.llm_scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, LLMScheduler, TokenBucket
+
+
+def test_token_bucket_refills_continuously_up_to_capacity():
+    bucket = TokenBucket(60)
+    bucket.updated = 0.0
+    assert bucket.wait_time(60, 0.0) == 0.0
+    bucket.take(60, 0.0)
+    assert bucket.wait_time(1, 0.0) == pytest.approx(1.0)
+    assert bucket.wait_time(1, 1.0) == 0.0
+    assert bucket.wait_time(60, 1000.0) == 0.0
+    assert bucket.level == 60
+
+
+def test_token_bucket_caps_requests_larger_than_capacity():
+    bucket = TokenBucket(10)
+    bucket.updated = 0.0
+    bucket.take(100, 0.0)
+    assert bucket.level == 0
+    assert bucket.wait_time(100, 0.0) == pytest.approx(60.0)
+
+
+def test_unlimited_bucket_never_waits():
+    bucket = TokenBucket(0)
+    bucket.take(1000, 0.0)
+    assert bucket.wait_time(1000, 0.0) == 0.0
+
+
+def test_adjust_returns_overestimated_tokens():
+    bucket = TokenBucket(100)
+    bucket.updated = 0.0
+    bucket.take(80, 0.0)
+    bucket.adjust(30)
+    assert bucket.level == pytest.approx(50)
+
+
+def test_identical_keyed_calls_share_one_upstream_call():
+    scheduler = LLMScheduler(concurrency=4, requests_per_minute=0, tokens_per_minute=0)
+    calls = []
+
+    async def request():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def run():
+        return await asyncio.gather(*(scheduler.call("model", request, key="same") for _ in range(5)))
+
+    assert asyncio.run(run()) == ["answer"] * 5
+    assert len(calls) == 1
+    assert scheduler.coalesced == 4
+
+
+def test_queued_calls_start_by_priority_then_arrival():
+    scheduler = LLMScheduler(concurrency=1, requests_per_minute=0, tokens_per_minute=0)
+    order = []
+
+    def request(name):
+        async def call():
+            order.append(name)
+            await asyncio.sleep(0.01)
+        return call
+
+    async def run():
+        first = asyncio.create_task(scheduler.call("model", request("first")))
+        await asyncio.sleep(0)
+        rest = [
+            asyncio.create_task(scheduler.call("model", request("background"), priority=PRIORITY_BACKGROUND)),
+            asyncio.create_task(scheduler.call("model", request("interactive 1"), priority=PRIORITY_INTERACTIVE)),
+            asyncio.create_task(scheduler.call("model", request("interactive 2"), priority=PRIORITY_INTERACTIVE)),
+        ]
+        await asyncio.gather(first, *rest)
+
+    asyncio.run(run())
+    assert order == ["first", "interactive 1", "interactive 2", "background"]
+
+
+def test_call_over_the_request_budget_waits_without_blocking_other_models():
+    scheduler = LLMScheduler(concurrency=4, requests_per_minute=1, tokens_per_minute=0)
+
+    async def request():
+        return "done"
+
+    async def run():
+        assert await scheduler.call("slow", request) == "done"
+        waiting = asyncio.create_task(scheduler.call("slow", request))
+        assert await scheduler.call("other", request) == "done"
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        assert scheduler.stats()["queued"] == 1
+        waiting.cancel()
+
+    asyncio.run(run())
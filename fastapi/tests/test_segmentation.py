@@ -0,0 +1,46 @@
+import pytest
+
+from feedback.segmentation import plan_segments, seam_overlaps, stitch_transcripts
+
+
+def test_seam_drops_only_words_repeated_from_the_previous_segment():
+    texts = ["we saw a big", "A big dog, barking."]
+    assert seam_overlaps(texts, [False, True]) == [0, 2]
+    assert stitch_transcripts(texts, [False, True]) == "we saw a big dog, barking."
+
+
+def test_seam_keeps_a_differently_transcribed_overlap():
+    texts = ["I went to the sto", "the store and left"]
+    assert seam_overlaps(texts, [False, True]) == [0, 0]
+    assert stitch_transcripts(texts, [False, True]) == "I went to the sto the store and left"
+
+
+def test_segments_cut_at_pauses_repeat_nothing():
+    assert seam_overlaps(["so then", "then we left"], [False, False]) == [0, 0]
+
+
+def test_short_recording_is_one_segment():
+    assert plan_segments(30.0, [10.0], max_seconds=60) == [(0.0, 30.0, False)]
+
+
+def test_segments_end_at_the_latest_pause_under_the_limit():
+    segments = plan_segments(130.0, [20.0, 40.0, 55.0, 70.0, 110.0], max_seconds=60, overlap_seconds=1)
+    assert segments == [(0.0, 55.0, False), (55.0, 110.0, False), (110.0, 130.0, False)]
+
+
+def test_hard_cut_without_a_pause_overlaps_the_next_segment():
+    segments = plan_segments(100.0, [], max_seconds=60, overlap_seconds=1)
+    assert segments == [(0.0, 60.0, False), (59.0, 100.0, True)]
+
+
+def test_segments_cover_the_recording_within_the_limit():
+    segments = plan_segments(600.0, [45.0, 170.0, 175.0, 400.0], max_seconds=60, overlap_seconds=2)
+    assert segments[0][0] == 0.0 and segments[-1][1] == 600.0
+    for (start, end, _), (next_start, _, overlaps) in zip(segments, segments[1:]):
+        assert next_start == (end - 2 if overlaps else end)
+    assert all(end - start <= 60 for start, end, _ in segments)
+
+
+def test_overlap_not_shorter_than_the_segment_is_rejected():
+    with pytest.raises(ValueError):
+        plan_segments(100.0, [], max_seconds=5, overlap_seconds=5)
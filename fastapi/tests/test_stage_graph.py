@@ -0,0 +1,65 @@
+import asyncio
+
+from feedback.circuit_breaker import CircuitBreaker
+from feedback.stage_graph import Stage, StageDegraded, StageGraph
+
+
+def run(graph):
+    return asyncio.run(graph.run())
+
+
+def test_independent_stages_run_concurrently_and_deps_get_results():
+    async def slow(value):
+        await asyncio.sleep(0.05)
+        return value
+
+    graph = StageGraph([
+        Stage("a", lambda: slow(1)),
+        Stage("b", lambda: slow(2)),
+        Stage("sum", lambda a, b: a + b, deps=["a", "b"]),
+    ])
+    results, report = run(graph)
+    assert results == {"a": 1, "b": 2, "sum": 3}
+    assert report["total_seconds"] < 0.09
+
+
+def test_failing_stage_uses_its_fallback():
+    def fail():
+        raise RuntimeError("boom")
+
+    results, report = run(StageGraph([Stage("a", fail, fallback=lambda: "fallback")]))
+    assert results["a"] == "fallback"
+    assert report["stages"]["a"]["status"] == "error"
+
+
+def test_stage_degraded_is_reported_with_its_reason():
+    def degrade():
+        raise StageDegraded("rubric_unavailable")
+
+    results, report = run(StageGraph([Stage("a", degrade, fallback=lambda: {})]))
+    assert results["a"] == {}
+    assert report["stages"]["a"] == {**report["stages"]["a"], "status": "degraded", "reason": "rubric_unavailable"}
+
+
+def test_running_over_the_budget_does_not_count_against_the_breaker():
+    breaker = CircuitBreaker("test", min_calls=1, error_rate=0.5)
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    for _ in range(3):
+        _, report = run(StageGraph([Stage("a", slow, breaker=breaker)], budget=0.01))
+        assert report["stages"]["a"]["reason"] == "over_budget"
+    assert breaker.state == "closed"
+    assert breaker.stats()["calls"] == 0
+
+
+def test_stage_timeout_counts_against_the_breaker():
+    breaker = CircuitBreaker("test", min_calls=1, error_rate=0.5)
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    _, report = run(StageGraph([Stage("a", slow, timeout=0.01, breaker=breaker)]))
+    assert report["stages"]["a"]["status"] == "timeout"
+    assert breaker.state == "open"
@@ -0,0 +1,58 @@
+import pytest
+
+from feedback.structured_output import (
+    CorrectnessScores, GrammarReport, StructuredOutputError, extract_json, parse_structured
+)
+
+
+@pytest.mark.parametrize("text", [
+    '{"a": 1}',
+    'Here is the analysis:\n```json\n{"a": 1}\n```\nHope this helps.',
+    'Sure! {"a": 1} Let me know.',
+    '{"a": 1,}',
+    "{'a': 1}",
+    '{“a”: 1}',
+])
+def test_extract_json_repairs_common_model_output(text):
+    assert extract_json(text) == {"a": 1}
+
+
+def test_braces_inside_strings_do_not_end_the_object():
+    assert extract_json('{"word": "}{", "n": 2} trailing') == {"word": "}{", "n": 2}
+
+
+def test_no_object_raises():
+    with pytest.raises(StructuredOutputError):
+        extract_json("I could not find any errors.")
+    with pytest.raises(StructuredOutputError):
+        extract_json("")
+
+
+def test_error_count_follows_the_listed_errors():
+    report = parse_structured('{"error_count": 5, "errors": [{"word": "goes", "suggestion": "go"}]}', GrammarReport)
+    assert report.error_count == 1
+    assert report.truncated is False
+
+
+def test_cut_off_report_keeps_the_errors_that_arrived():
+    text = '{"errors": [{"word": "goes", "suggestion": "go"}, {"word": "he", "suggestion": "th'
+    report = parse_structured(text, GrammarReport)
+    assert report.truncated is True
+    assert [error.word for error in report.errors] == ["goes", "he"]
+    assert report.error_count == 2
+
+
+def test_cut_off_response_is_rejected_by_schemas_that_cannot_flag_it():
+    with pytest.raises(StructuredOutputError):
+        parse_structured('{"relevance_score": 40, "quality_score": 3', CorrectnessScores)
+
+
+def test_cut_off_response_without_a_schema_is_flagged():
+    assert parse_structured('{"grammar": {"errors": [') == {"grammar": {"errors": []}, "truncated": True}
+
+
+def test_scores_are_clamped_and_mismatches_raise():
+    scores = parse_structured('{"relevance_score": 80, "quality_score": -3}', CorrectnessScores)
+    assert (scores.relevance_score, scores.quality_score) == (50.0, 0.0)
+    with pytest.raises(StructuredOutputError):
+        parse_structured('{"relevance": 40}', CorrectnessScores)
@@ -0,0 +1,46 @@
+from feedback.text_chunks import chunk_text, merge_chunk_errors, split_sentences
+
+
+def test_short_text_is_one_chunk():
+    assert chunk_text("I go home.", max_chars=100) == [(0, "I go home.")]
+
+
+def test_chunks_are_whole_sentences_at_their_offsets():
+    text = "First one here.  Second one is longer!\nThird?  Fourth sentence ends it."
+    chunks = chunk_text(text, max_chars=30)
+    assert len(chunks) > 1
+    for offset, chunk in chunks:
+        assert text[offset:offset + len(chunk)] == chunk
+        assert len(chunk) <= 30
+        assert chunk == chunk.strip()
+    assert " ".join(chunk for _, chunk in chunks).split() == text.split()
+
+
+def test_long_sentence_is_cut_at_a_space():
+    text = "word " * 40 + "end."
+    chunks = chunk_text(text, max_chars=50)
+    for offset, chunk in chunks:
+        assert text[offset:offset + len(chunk)] == chunk
+        assert len(chunk) <= 50
+        assert not chunk.startswith("ord")
+
+
+def test_danda_ends_a_sentence():
+    text = "मैं घर गया। फिर सो गया।"
+    first_end = text.index("।") + 1
+    assert split_sentences(text) == [(0, first_end), (first_end, len(text))]
+
+
+def test_merged_errors_get_positions_in_the_full_text_and_are_kept_once():
+    chunks = [(0, "I goes home."), (13, "He goes too.")]
+    reports = [
+        {"errors": [{"word": "goes", "suggestion": "go"}]},
+        {"errors": [{"word": "Goes", "suggestion": "go"}, {"word": "He", "suggestion": "They"},
+                    {"word": "missing", "suggestion": "x"}]},
+    ]
+    report = merge_chunk_errors(chunks, reports, "suggestion")
+    assert [(error["word"], error["position"]) for error in report["errors"]] == [
+        ("goes", 2), ("He", 13), ("missing", None)
+    ]
+    assert report["error_count"] == 3
+    assert report["truncated"] is False
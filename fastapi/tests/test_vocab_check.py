@@ -0,0 +1,44 @@
+import pytest
+
+from feedback.vocab_check import analyze_vocabulary, load_vocabulary_index
+
+
+@pytest.fixture
+def graded_index(tmp_path):
+    lexicon = tmp_path / "levels.tsv"
+    lexicon.write_text(
+        "house\tA1\tnoun\n"
+        "go\tA1\tverb\n"
+        "friend\tA1\tnoun\n"
+        "ubiquitous\tC2\n"
+        "meticulous\tC1\tadjective\n"
+        "data\tA2\tnoun\n",
+        encoding="utf-8"
+    )
+    return load_vocabulary_index(str(lexicon), index_path="")
+
+
+def test_low_level_categorized_words_are_not_advanced(graded_index):
+    result = analyze_vocabulary("I go to my friend's house with my friends.", graded_index)
+
+    assert result["total_advanced_words"] == 0
+    assert result["vocabulary_score"] == 50
+    assert result["unique_advanced_words"] == []
+    assert result["level_counts"]["A1"] == 3
+
+
+def test_advanced_levels_count_with_or_without_a_category(graded_index):
+    result = analyze_vocabulary("A ubiquitous and meticulous house.", graded_index)
+
+    assert result["total_advanced_words"] == 2
+    assert result["advanced_words_by_category"]["advanced"] == ["ubiquitous"]
+    assert result["advanced_words_by_category"]["adjective"] == ["meticulous"]
+
+
+def test_built_in_words_count_at_any_level(graded_index):
+    result = analyze_vocabulary("The data supports it.", graded_index)
+
+    assert result["total_advanced_words"] == 1
+    assert result["advanced_words_by_category"]["academic"] == ["data"]
+    assert "noun" not in result["advanced_words_by_category"]
+    assert result["level_counts"]["A2"] == 1
@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+from contextlib import contextmanager
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_CACHE_PATH = os.getenv("TRANSCRIPT_CACHE_PATH", os.path.join("cache", "transcripts.sqlite3"))
+# Total size of cached transcripts before least recently used entries are evicted
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+
+def transcript_cache_key(content_hash: str, language_code: str, prompt: Optional[str], model: str,
+                         timestamps: str = "none", ingest: str = "") -> str:
+    """Key a transcript by the upload it came from, the ingest settings and everything sent alongside it."""
+    key_source = json.dumps([content_hash, language_code, prompt or "", model, timestamps, ingest], ensure_ascii=False)
+    return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+
+class TranscriptCache:
+    """
+    Persistent, size-bounded cache of transcription results.
+
+    Entries live in SQLite so they survive restarts and are shared by every
+    worker on the host. Each hit refreshes the entry's last access time, and
+    once the stored values exceed ``max_bytes`` the least recently used
+    entries are evicted. Hit and miss counters are kept per process.
+    """
+
+    def __init__(self, path: str = TRANSCRIPT_CACHE_PATH, max_bytes: int = TRANSCRIPT_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS transcripts (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS transcripts_last_access ON transcripts (last_access)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[Dict]:
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT value FROM transcripts WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE transcripts SET last_access = ? WHERE key = ?", (time.time(), key))
+        except sqlite3.Error as e:
+            logger.error(f"Error reading transcript cache: {str(e)}")
+            row = None
+
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Dict) -> None:
+        encoded = json.dumps(value, ensure_ascii=False)
+        size = len(encoded.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO transcripts (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                    (key, encoded, size, time.time())
+                )
+                self._evict(conn)
+        except sqlite3.Error as e:
+            logger.error(f"Error writing transcript cache: {str(e)}")
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evicted = 0
+        for key, size in conn.execute("SELECT key, size FROM transcripts ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM transcripts WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        logger.info(f"Evicted {evicted} transcripts from cache")
+
+    def stats(self) -> Dict:
+        try:
+            with self._connect() as conn:
+                entries, total = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcripts"
+                ).fetchone()
+        except sqlite3.Error:
+            entries, total = None, None
+
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes
+        }
+
+
+transcript_cache = TranscriptCache()
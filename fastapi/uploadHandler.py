@@ -0,0 +1,184 @@
+import os
+import hashlib
+import logging
+from typing import Iterable, Optional
+from fastapi import UploadFile
+from fastapi.responses import JSONResponse
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bytes read from the upload per iteration; this bounds memory per request
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+# Largest upload accepted, enforced while the bytes arrive
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+# Room for the multipart boundaries and form fields around the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadRejected(Exception):
+    """Raised when an upload is refused before it has been fully written."""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class SavedUpload:
+    def __init__(self, path: str, size: int, content_hash: str, container: str):
+        self.path = path
+        self.size = size
+        self.content_hash = content_hash
+        self.container = container
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware enforcing MAX_UPLOAD_BYTES before the request body is parsed.
+
+    FastAPI receives and spools the whole multipart body before an endpoint
+    runs, so by the time save_upload sees the file it has already arrived.
+    Here a request to one of ``paths`` declaring a larger Content-Length is
+    answered with 413 before any of its body is read, and one without a
+    length (chunked) is answered as soon as the bytes received pass the
+    limit; the rest of its body is never read.
+    """
+
+    def __init__(self, app, paths: Iterable[str], max_bytes: int = MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES):
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        declared = dict(scope["headers"]).get(b"content-length", b"")
+        if declared.isdigit() and int(declared) > self.max_bytes:
+            logger.warning(f"Rejected {declared.decode()} byte request to {scope['path']} before reading it")
+            await self._reject(scope, receive, send)
+            return
+
+        received = 0
+        started = False
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes and not rejected:
+                    rejected = True
+                    logger.warning(f"Rejected request to {scope['path']} after {received} bytes")
+                    if not started:
+                        await self._reject(scope, receive, send)
+                    raise UploadRejected(self._message(), status_code=413)
+            return message
+
+        async def tracked_send(message):
+            nonlocal started
+            # Once the 413 is out, whatever error response the app builds is dropped
+            if rejected:
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except UploadRejected:
+            if not rejected:
+                raise
+
+    def _message(self) -> str:
+        return f"Upload exceeds the {MAX_UPLOAD_BYTES} byte limit"
+
+    async def _reject(self, scope, receive, send) -> None:
+        response = JSONResponse(status_code=413, content={"status": "error", "message": self._message()})
+        await response(scope, receive, send)
+
+
+def sniff_container(head: bytes) -> Optional[str]:
+    """
+    Identify the container from the first bytes of an upload.
+
+    Returns:
+        str: Container name, or None if it is not one the decoder handles
+    """
+    if head[4:8] == b"ftyp":
+        return "mp4"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "webm"
+    if head.startswith(b"OggS"):
+        return "ogg"
+    if head.startswith(b"RIFF") and head[8:12] == b"WAVE":
+        return "wav"
+    if head.startswith(b"fLaC"):
+        return "flac"
+    if head.startswith(b"ID3") or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return "mp3"
+    return None
+
+
+async def save_upload(file: UploadFile, dest_path: str) -> SavedUpload:
+    """
+    Copy a received upload to disk in chunks.
+
+    The container is checked on the first chunk and the SHA-256 of the
+    content is computed on the way through, so no more than one chunk is
+    held in memory at a time. By now the request body has already been
+    received and spooled, so these checks keep unsupported or oversized
+    files away from the decoder; UploadLimitMiddleware is what stops an
+    oversized upload while it is still arriving.
+
+    Args:
+        file (UploadFile): The incoming upload
+        dest_path (str): Where to write it
+
+    Returns:
+        SavedUpload: Path, size, content hash and container of the upload
+
+    Raises:
+        UploadRejected: Unsupported container (415) or too large (413)
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    container = None
+
+    try:
+        with open(dest_path, "wb") as buffer:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+
+                if container is None:
+                    container = sniff_container(chunk)
+                    if container is None:
+                        raise UploadRejected("Unsupported audio container", status_code=415)
+
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise UploadRejected(
+                        f"Upload exceeds the {MAX_UPLOAD_BYTES} byte limit", status_code=413
+                    )
+
+                hasher.update(chunk)
+                buffer.write(chunk)
+
+        if container is None:
+            raise UploadRejected("Empty upload", status_code=400)
+    except Exception:
+        # Never leave a partial or rejected upload behind
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+
+    logger.info(f"Saved {size} byte {container} upload to {dest_path}")
+    return SavedUpload(dest_path, size, hasher.hexdigest(), container)
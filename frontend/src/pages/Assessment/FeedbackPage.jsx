@@ -58,7 +58,7 @@ const FeedbackPage = () => {
       let parsedData;
       try {
         console.log("Ideal answer response:", result.data);
-        parsedData = JSON.parse(result.data);
+        parsedData = typeof result.data === 'string' ? JSON.parse(result.data) : result.data;
 
       } catch (e) {
         parsedData = {
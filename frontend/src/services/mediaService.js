@@ -36,7 +36,8 @@ export const sendMediaToServer = async (mediaBlob, questionIndex, currentQuestio
       const feedbackData = await getFeedbackAnalysis(
         response.data.text,
         currentQuestion,
-        language
+        language,
+        response.data.recording_id
       );
 
       return {
@@ -52,12 +53,13 @@ export const sendMediaToServer = async (mediaBlob, questionIndex, currentQuestio
   }
 };
 
-export const getFeedbackAnalysis = async (text, question, language = "English") => {
+export const getFeedbackAnalysis = async (text, question, language = "English", recordingId = null) => {
   try {
     const response = await fastApi.post("/analyze-text", {
       text,
       question,
-      language
+      language,
+      recording_id: recordingId
     });
 
     if (response.data.status === "error") {
@@ -6,10 +6,14 @@ export const fetchQuestions = async (setupData) => {
     throw new Error('Assessment setup data is required');
   }
 
+  const userEmail = JSON.parse(localStorage.getItem("currUser"))?.email;
+
   const response = await fetch(`${API_FASTAPI_URL}/generate-questions`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
+      // Lets the server avoid repeating questions this user has already had
+      ...(userEmail && { 'x-user-email': userEmail }),
     },
     body: JSON.stringify(setupData),
   });